@@ -0,0 +1,60 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_bench_codec.py - Compares encoding a 5000 file insertFiles body and decoding a large history
+page across the JSON codecs, against the per-file dicts the client used to build.
+Run with: python -m pytest benchmarks/test_bench_codec.py
+"""
+
+from snowflake.ingest import StagedFile
+from snowflake.ingest.utils.codec import CODECS
+from snowflake.ingest.utils.codec import get_codec
+import json
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+STAGED_FILES = [StagedFile('data/2024/01/01/file_{}.csv.gz'.format(i), 1024 + i) for i in range(5000)]
+HISTORY_PAGE = json.dumps({
+    'pipe': 'DB.SCHEMA.PIPE',
+    'completeResult': True,
+    'nextBeginMark': '1_5000',
+    'files': [{'path': 'data/2024/01/01/file_{}.csv.gz'.format(i), 'stageLocation': 's3://bucket/',
+               'fileSize': 1024 + i, 'timeReceived': '2024-01-01T00:00:00.000Z',
+               'lastInsertTime': '2024-01-01T00:00:00.000Z', 'rowsInserted': 10, 'rowsParsed': 10,
+               'errorsSeen': 0, 'errorLimit': 1, 'complete': True, 'status': 'LOADED'} for i in range(5000)],
+}).encode('utf-8')
+
+
+def codec_names():
+    names = []
+    for name in CODECS:
+        try:
+            get_codec(name)
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+
+def encode_with_dicts(staged_files):
+    # what requests did with json=payload
+    return json.dumps({'files': [x._asdict() for x in staged_files]}).encode('utf-8')
+
+
+@pytest.mark.benchmark(group='encode-insert-files')
+def test_encode_with_dicts(benchmark):
+    assert benchmark(encode_with_dicts, STAGED_FILES)
+
+
+@pytest.mark.benchmark(group='encode-insert-files')
+@pytest.mark.parametrize('name', codec_names())
+def test_encode_files(benchmark, name):
+    codec = get_codec(name)
+    assert json.loads(benchmark(codec.encode_files, STAGED_FILES)) == json.loads(encode_with_dicts(STAGED_FILES))
+
+
+@pytest.mark.benchmark(group='decode-history')
+@pytest.mark.parametrize('name', codec_names())
+def test_decode_history(benchmark, name):
+    codec = get_codec(name)
+    assert len(benchmark(codec.loads, HISTORY_PAGE)['files']) == 5000
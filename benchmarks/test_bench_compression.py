@@ -0,0 +1,78 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_bench_compression.py - Measures bytes on the wire and end-to-end ingest_files latency of a
+5000 file request with and without gzip, against a local stub server that limits its read
+bandwidth to emulate a slow egress link.
+Run with: python -m pytest benchmarks/test_bench_compression.py -s
+"""
+
+from snowflake.ingest import SimpleIngestManager
+from snowflake.ingest import StagedFile
+from snowflake.ingest.utils.network import SnowflakeRestful
+from cryptography.hazmat.primitives.asymmetric import rsa
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+import gzip
+import json
+import time
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+# emulated link speed in bytes per second, about 80 Mbit/s
+BANDWIDTH = 10 * 1024 * 1024
+STAGED_FILES = [StagedFile('landing/events/region=eu-west-1/date=2024-01-01/hour=00/'
+                           'part-{:05d}-3f1c9a7e-5d2b-4c8e-9a61-7b0e2d4f8c13.snappy.parquet'.format(i), 8 * 1024 * 1024)
+                for i in range(5000)]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(len(body) / BANDWIDTH)
+        self.received.append(len(body))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        assert len(json.loads(body)['files']) == len(STAGED_FILES)
+
+        payload = b'{"requestId": "1", "responseCode": "SUCCESS"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(scope='module')
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def make_manager(server, private_key, compress_threshold):
+    restful = SnowflakeRestful(compress_threshold=compress_threshold)
+    return SimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key, scheme='http',
+                               host='127.0.0.1', port=server.server_port, restful=restful)
+
+
+@pytest.mark.benchmark(group='ingest-files-wire')
+@pytest.mark.parametrize('compress_threshold', [None, 64 * 1024], ids=['plain', 'gzip'])
+def test_ingest_files_latency(benchmark, server, private_key, compress_threshold):
+    manager = make_manager(server, private_key, compress_threshold)
+    _StubHandler.received = []
+
+    assert benchmark(manager.ingest_files, STAGED_FILES)['responseCode'] == 'SUCCESS'
+    print('\n{}: {} bytes on the wire per request'.format('gzip' if compress_threshold else 'plain',
+                                                          _StubHandler.received[-1]))
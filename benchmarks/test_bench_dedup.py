@@ -0,0 +1,57 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_bench_dedup.py - Measures ingest_files of 5000 files, half of them re-emitted paths, with and
+without IngestDeduplicator against the mock Snowpipe server, and the cost of filtering alone.
+Run with: python -m pytest benchmarks/test_bench_dedup.py
+"""
+
+from snowflake.ingest import IngestDeduplicator
+from snowflake.ingest import SimpleIngestManager
+from snowflake.ingest import StagedFile
+from snowflake.ingest.testing import MockSnowpipeServer
+from snowflake.ingest.utils.path_index import LRUPathIndex
+from snowflake.ingest.utils.path_index import BloomPathIndex
+from cryptography.hazmat.primitives.asymmetric import rsa
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+PIPE = 'BENCHDB.BENCHSCHEMA.BENCHPIPE'
+SEEN_FILES = [StagedFile('landing/date=2024-01-01/part-{:05d}.snappy.parquet'.format(i), 1024) for i in range(2500)]
+STAGED_FILES = SEEN_FILES + [StagedFile('landing/date=2024-01-02/part-{:05d}.snappy.parquet'.format(i), 1024)
+                             for i in range(2500)]
+INDEXES = {'lru': LRUPathIndex, 'bloom': BloomPathIndex}
+
+
+@pytest.fixture(scope='module')
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.mark.benchmark(group='ingest-files-duplicates')
+def test_ingest_files_with_duplicates(benchmark, private_key):
+    with MockSnowpipeServer() as server, server.make_manager(PIPE, private_key) as manager:
+        assert benchmark(manager.ingest_files, STAGED_FILES)['responseCode'] == 'SUCCESS'
+
+
+@pytest.mark.benchmark(group='ingest-files-duplicates')
+@pytest.mark.parametrize('index', sorted(INDEXES))
+def test_ingest_files_deduplicated(benchmark, private_key, index):
+    with MockSnowpipeServer() as server, server.make_manager(PIPE, private_key) as manager:
+        def setup():
+            # only the files of the day before are known, so every round sends the new ones again
+            deduplicator = IngestDeduplicator(manager, index=INDEXES[index]())
+            deduplicator.remember(staged_file.path for staged_file in SEEN_FILES)
+            return (deduplicator, STAGED_FILES), {}
+
+        response = benchmark.pedantic(IngestDeduplicator.ingest_files, setup=setup, rounds=20)
+        assert response['responseCode'] == 'SUCCESS'
+
+
+@pytest.mark.benchmark(group='dedup-filter')
+@pytest.mark.parametrize('index', sorted(INDEXES))
+def test_filter(benchmark, private_key, index):
+    manager = SimpleIngestManager('testaccount', 'snowman', PIPE, private_key)
+    deduplicator = IngestDeduplicator(manager, index=INDEXES[index]())
+    deduplicator.remember(staged_file.path for staged_file in SEEN_FILES)
+    assert benchmark(deduplicator.filter, STAGED_FILES)[1] == len(SEEN_FILES)
@@ -0,0 +1,33 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_bench_journal.py - Measures the overhead IngestJournal adds to a 500 file ingest_files call,
+with commits fsynced once per checkpoint (NORMAL) and once per commit (FULL).
+Run with: python -m pytest benchmarks/test_bench_journal.py
+"""
+
+from snowflake.ingest import IngestJournal
+from snowflake.ingest import StagedFile
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+STAGED_FILES = [StagedFile('data/file_{}.csv.gz'.format(i), 1024) for i in range(500)]
+
+
+class FakeManager(object):
+    pipe = 'DB.SCHEMA.PIPE'
+
+    def ingest_files(self, staged_files, request_id=None, **kwargs):
+        return {'requestId': str(request_id), 'responseCode': 'SUCCESS'}
+
+
+@pytest.mark.benchmark(group='ingest-files-journal')
+def test_ingest_files_unjournaled(benchmark):
+    assert benchmark(FakeManager().ingest_files, STAGED_FILES)['responseCode'] == 'SUCCESS'
+
+
+@pytest.mark.benchmark(group='ingest-files-journal')
+@pytest.mark.parametrize('synchronous', ['NORMAL', 'FULL'])
+def test_ingest_files_journaled(benchmark, tmp_path, synchronous):
+    with IngestJournal(FakeManager(), str(tmp_path / 'journal.db'), synchronous=synchronous) as journal:
+        assert benchmark(journal.ingest_files, STAGED_FILES)['responseCode'] == 'SUCCESS'
@@ -0,0 +1,74 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_bench_logging.py - Measures the per-call logging overhead of ingest_files with logging at the
+default WARNING level, against the eager logging the client used to do.
+Run with: python -m pytest benchmarks/test_bench_logging.py
+"""
+
+from snowflake.ingest import SimpleIngestManager
+from snowflake.ingest import StagedFile
+from snowflake.ingest.utils.log_sampling import LogSampler
+from snowflake.ingest.utils.codec import JsonCodec
+from cryptography.hazmat.primitives.asymmetric import rsa
+from logging import getLogger
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+# a large insertFiles response, as returned for a request of 5000 files
+RESPONSE_BODY = {
+    'requestId': 'a4d8f4e5-7b8b-4bd5-9ff7-3b4d39b0c1ef',
+    'responseCode': 'SUCCESS',
+    'files': [{'path': 'data/file_{}.csv.gz'.format(i), 'size': 1024} for i in range(5000)],
+}
+STAGED_FILES = [StagedFile('data/file_0.csv.gz', 1024)]
+
+
+class FakeRestful(object):
+    codec = JsonCodec()
+
+    def post(self, url, headers=None, **kwargs):
+        return RESPONSE_BODY
+
+    def close(self):
+        pass
+
+
+class EagerLoggingIngestManager(SimpleIngestManager):
+    """
+    ingest_files as it used to log: url at INFO and the response stringified before the level check
+    """
+    def ingest_files(self, staged_files, request_id=None, retry_policy=None, deadline=None):
+        logger = getLogger('snowflake.ingest.simple_ingest_manager')
+        target_url = self.url_engine.make_ingest_url(self.pipe, request_id)
+        logger.info('Ingest file request url: %s', target_url)
+        payload = {"files": [x._asdict() for x in staged_files]}
+        response_body = self.restful.post(target_url, json=payload, headers=self._get_headers())
+        logger.debug('Ingest response: %s', str(response_body))
+        return response_body
+
+
+@pytest.fixture(scope='module')
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.mark.benchmark(group='ingest-files-logging')
+def test_ingest_files_eager_logging(benchmark, private_key):
+    manager = EagerLoggingIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key,
+                                        restful=FakeRestful())
+    assert benchmark(manager.ingest_files, STAGED_FILES) is RESPONSE_BODY
+
+
+@pytest.mark.benchmark(group='ingest-files-logging')
+def test_ingest_files_guarded_logging(benchmark, private_key):
+    manager = SimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key,
+                                  restful=FakeRestful())
+    assert benchmark(manager.ingest_files, STAGED_FILES) is RESPONSE_BODY
+
+
+@pytest.mark.benchmark(group='ingest-files-logging')
+def test_ingest_files_sampled_logging(benchmark, private_key):
+    manager = SimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key,
+                                  restful=FakeRestful(), request_log_sampler=LogSampler(max_per_second=1))
+    assert benchmark(manager.ingest_files, STAGED_FILES) is RESPONSE_BODY
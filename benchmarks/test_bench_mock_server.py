@@ -0,0 +1,148 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_bench_mock_server.py - Measures SimpleIngestManager against the in-process MockSnowpipeServer, so
+that client performance can be tracked without network access or a Snowflake account: request rate,
+p50/p99 latency, the cost of retries, history paging, token signing and URL building.
+p50/p99 and requests per second are stored in the extra_info of each benchmark.
+Run with: python -m pytest benchmarks/test_bench_mock_server.py
+"""
+
+from snowflake.ingest import StagedFile
+from snowflake.ingest.testing import MockSnowpipeServer
+from snowflake.ingest.utils import InMemoryMetricsCollector
+from snowflake.ingest.utils import SecurityManager
+from snowflake.ingest.utils.network import SnowflakeRestful
+from snowflake.ingest.utils.retry import RetryPolicy
+from cryptography.hazmat.primitives.asymmetric import rsa
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from uuid import uuid4
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+PIPE = 'BENCHDB.BENCHSCHEMA.BENCHPIPE'
+STAGED_FILES = [StagedFile('landing/date=2024-01-01/part-{:05d}.snappy.parquet'.format(i), 1024 * 1024)
+                for i in range(100)]
+CONCURRENT_REQUESTS = 200
+FAST_RETRY = RetryPolicy(base_backoff=0.001, max_backoff=0.01, max_retries=10)
+
+
+@pytest.fixture(scope='module')
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def server():
+    with MockSnowpipeServer(seed=42) as server:
+        yield server
+
+
+def record_percentiles(benchmark):
+    """
+    Stores the p50 and p99 round time in milliseconds next to the statistics pytest-benchmark reports
+    """
+    if benchmark.stats is None:
+        # --benchmark-disable runs every benchmark once without timing it
+        return
+    data = sorted(benchmark.stats.stats.data)
+    benchmark.extra_info['p50_ms'] = round(data[int(0.50 * (len(data) - 1))] * 1000, 3)
+    benchmark.extra_info['p99_ms'] = round(data[int(0.99 * (len(data) - 1))] * 1000, 3)
+
+
+@pytest.mark.benchmark(group='mock-server-latency')
+def test_ingest_files_latency(benchmark, server, private_key):
+    with server.make_manager(PIPE, private_key) as manager:
+        assert benchmark(manager.ingest_files, STAGED_FILES)['responseCode'] == 'SUCCESS'
+    record_percentiles(benchmark)
+
+
+@pytest.mark.benchmark(group='mock-server-latency')
+def test_get_history_latency(benchmark, server, private_key):
+    with server.make_manager(PIPE, private_key) as manager:
+        manager.ingest_files(STAGED_FILES)
+        assert len(benchmark(manager._get_history)['files']) == len(STAGED_FILES)
+    record_percentiles(benchmark)
+
+
+@pytest.mark.benchmark(group='mock-server-throughput')
+@pytest.mark.parametrize('workers', [1, 8])
+def test_ingest_files_throughput(benchmark, server, private_key, workers):
+    restful = SnowflakeRestful(pool_maxsize=workers)
+    with server.make_manager(PIPE, private_key, restful=restful) as manager, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        def send_all():
+            return list(executor.map(lambda _: manager.ingest_files(STAGED_FILES[:10]), range(CONCURRENT_REQUESTS)))
+
+        assert len(benchmark(send_all)) == CONCURRENT_REQUESTS
+    if benchmark.stats is not None:
+        benchmark.extra_info['requests_per_second'] = round(CONCURRENT_REQUESTS / benchmark.stats.stats.mean)
+
+
+@pytest.mark.benchmark(group='mock-server-retries')
+@pytest.mark.parametrize('throttle_rate', [0, 0.2], ids=['no-throttling', 'throttle-20pct'])
+def test_ingest_files_with_retries(benchmark, server, private_key, throttle_rate):
+    server.throttle_rate = throttle_rate
+    server.retry_after = None
+    metrics = InMemoryMetricsCollector()
+    with server.make_manager(PIPE, private_key, retry_policy=FAST_RETRY,
+                             restful=SnowflakeRestful(observer=metrics)) as manager:
+        assert benchmark(manager.ingest_files, STAGED_FILES)['responseCode'] == 'SUCCESS'
+
+    insert_files = metrics.snapshot()['endpoints']['insertFiles']
+    if benchmark.stats is not None:
+        benchmark.extra_info['retries_per_call'] = round(insert_files['retries'] / benchmark.stats.stats.rounds, 3)
+    record_percentiles(benchmark)
+
+
+@pytest.mark.benchmark(group='mock-server-history')
+def test_page_through_history(benchmark, private_key):
+    with MockSnowpipeServer(page_size=1000) as server, server.make_manager(PIPE, private_key) as manager:
+        for _ in range(100):
+            manager.ingest_files(STAGED_FILES)
+
+        def page_all():
+            begin_mark, records = None, 0
+            while True:
+                page = manager._get_history(begin_mark=begin_mark)
+                if not page['files']:
+                    return records
+                records += len(page['files'])
+                begin_mark = page['nextBeginMark']
+
+        assert benchmark(page_all) == 100 * len(STAGED_FILES)
+
+
+@pytest.mark.benchmark(group='mock-server-latency')
+def test_injected_latency(benchmark, private_key):
+    # the client overhead on top of a 5ms service
+    with MockSnowpipeServer(latency=0.005) as server, server.make_manager(PIPE, private_key) as manager:
+        assert benchmark(manager.ingest_files, STAGED_FILES)['responseCode'] == 'SUCCESS'
+    record_percentiles(benchmark)
+
+
+@pytest.mark.benchmark(group='client-cpu')
+def test_token_signing(benchmark, private_key):
+    sec_manager = SecurityManager('testaccount', 'snowman', private_key, renewal_delay=timedelta(seconds=0))
+    sec_manager.get_token()
+
+    def sign():
+        with sec_manager._renew_lock:
+            return sec_manager._renew_token(force=True)
+
+    assert benchmark(sign)
+
+
+@pytest.mark.benchmark(group='client-cpu')
+def test_url_building(benchmark, server, private_key):
+    with server.make_manager(PIPE, private_key) as manager:
+        request_id = uuid4()
+        assert benchmark(manager.url_engine.make_ingest_url, manager.pipe, request_id).startswith('http://')
+
+
+@pytest.mark.benchmark(group='client-cpu')
+def test_cached_token(benchmark, private_key):
+    sec_manager = SecurityManager('testaccount', 'snowman', private_key)
+    token = sec_manager.get_token()
+    assert benchmark(sec_manager.get_token) == token
@@ -0,0 +1,87 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_bench_process_driver.py - Measures how ProcessIngestDriver throughput scales with the number of
+worker processes, sending 80000 files of 4 pipes in requests of 1000 files to a stub server that runs
+in its own process and only acknowledges the requests. Files per second are stored in extra_info.
+Worker counts above the number of CPUs are skipped.
+Run with: python -m pytest benchmarks/test_bench_process_driver.py
+"""
+
+from snowflake.ingest import StagedFile
+from snowflake.ingest.process_driver import ProcessIngestDriver
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives import serialization
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+import os
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+PIPES = ['BENCHDB.BENCHSCHEMA.PIPE{}'.format(i) for i in range(4)]
+FILES_PER_PIPE = 20000
+CPUS = os.cpu_count() or 1
+WORK = [(pipe, StagedFile('landing/date=2024-01-01/part-{:05d}-3f1c9a7e.snappy.parquet'.format(i), 8 * 1024 * 1024))
+        for i in range(FILES_PER_PIPE) for pipe in PIPES]
+
+
+class _AckHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        payload = b'{"requestId": "1", "responseCode": "SUCCESS"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(ports):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _AckHandler)
+    server.daemon_threads = True
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+@pytest.fixture(scope='module')
+def server_port():
+    context = get_context('spawn')
+    ports = context.Queue()
+    process = context.Process(target=_serve, args=(ports,), daemon=True)
+    process.start()
+    yield ports.get(timeout=30)
+    process.terminate()
+    process.join()
+
+
+@pytest.fixture(scope='module')
+def private_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                             serialization.NoEncryption())
+
+
+@pytest.mark.benchmark(group='process-driver-scaling')
+@pytest.mark.parametrize('processes', [
+    # more workers than CPUs only measures the scheduler
+    pytest.param(processes, marks=pytest.mark.skipif(processes > CPUS, reason='needs {} CPUs'.format(processes)))
+    for processes in [1, 2, 4]
+])
+def test_process_driver_throughput(benchmark, server_port, private_key, processes):
+    with ProcessIngestDriver('testaccount', 'snowman', private_key, processes=processes, max_files=1000,
+                             max_bytes=None, scheme='http', host='127.0.0.1', port=server_port) as driver:
+        # start the workers and sign their tokens before measuring
+        list(driver.ingest(WORK[:processes * len(PIPES)]))
+
+        def run():
+            return sum(len(result.staged_files) for result in driver.ingest(WORK))
+
+        assert benchmark.pedantic(run, rounds=5) == len(WORK)
+    if benchmark.stats is not None:
+        benchmark.extra_info['files_per_second'] = round(len(WORK) / benchmark.stats.stats.mean)
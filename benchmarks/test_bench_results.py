@@ -0,0 +1,78 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_bench_results.py - Compares memory and field access of HistoryPage/FileLoadStatus against
+the decoded dicts of a large history window.
+Run with: python -m pytest benchmarks/test_bench_results.py -s
+"""
+
+from snowflake.ingest.results import HistoryPage
+from snowflake.ingest.utils.codec import get_codec
+import json
+import tracemalloc
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+RECORDS = 20000
+# files of a history window arrive in batches, so records share their timestamps
+HISTORY_PAGE = json.dumps({
+    'nextBeginMark': '1_{}'.format(RECORDS),
+    'files': [{'path': 'data/2024/01/01/file_{}.csv.gz'.format(i), 'stageLocation': 's3://bucket/data/',
+               'fileSize': 1024 + i, 'timeReceived': '2024-01-01T00:{:02d}:00.000Z'.format(i // 500 % 60),
+               'lastInsertTime': '2024-01-01T00:{:02d}:30.000Z'.format(i // 500 % 60), 'rowsInserted': 10,
+               'rowsParsed': 10, 'errorsSeen': 0, 'errorLimit': 1, 'complete': True, 'status': 'LOADED'}
+              for i in range(RECORDS)],
+}).encode('utf-8')
+
+
+def retained_bytes(load):
+    tracemalloc.start()
+    try:
+        result = load()
+        return tracemalloc.get_traced_memory()[0], result
+    finally:
+        tracemalloc.stop()
+
+
+def load_dicts():
+    return get_codec().loads(HISTORY_PAGE)['files']
+
+
+def load_typed():
+    return HistoryPage.from_response(get_codec().loads(HISTORY_PAGE)).files
+
+
+def test_memory_per_record():
+    dict_bytes, _ = retained_bytes(load_dicts)
+    typed_bytes, _ = retained_bytes(load_typed)
+    print('\nbytes per record: dict {:.0f}, FileLoadStatus {:.0f}'.format(dict_bytes / RECORDS,
+                                                                          typed_bytes / RECORDS))
+    assert typed_bytes * 2 < dict_bytes
+
+
+def read_statuses_dict(records):
+    return sum(1 for record in records if record['status'] == 'LOADED' and record['rowsInserted'])
+
+
+def read_statuses_typed(records):
+    return sum(1 for record in records if record.status == 'LOADED' and record.rows_inserted)
+
+
+@pytest.mark.benchmark(group='field-access')
+def test_field_access_dict(benchmark):
+    assert benchmark(read_statuses_dict, load_dicts()) == RECORDS
+
+
+@pytest.mark.benchmark(group='field-access')
+def test_field_access_typed(benchmark):
+    assert benchmark(read_statuses_typed, load_typed()) == RECORDS
+
+
+@pytest.mark.benchmark(group='decode')
+def test_decode_dicts(benchmark):
+    assert len(benchmark(load_dicts)) == RECORDS
+
+
+@pytest.mark.benchmark(group='decode')
+def test_decode_typed(benchmark):
+    assert len(benchmark(load_typed)) == RECORDS
@@ -0,0 +1,70 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_bench_stage_scanner.py - Measures discovering and ingesting a 240 directory, 4800 file stage whose
+listings take 5ms each, as from an object store: a sequential walk against the concurrent scan_stage,
+and listing everything before ingesting against feeding the scan straight into ingest_files_in_batches.
+Run with: python -m pytest benchmarks/test_bench_stage_scanner.py
+"""
+
+from snowflake.ingest.stage_scanner import LocalDirectoryLister
+from snowflake.ingest.stage_scanner import scan_stage
+from snowflake.ingest.testing import MockSnowpipeServer
+from cryptography.hazmat.primitives.asymmetric import rsa
+import time
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+PIPE = 'BENCHDB.BENCHSCHEMA.BENCHPIPE'
+LIST_LATENCY = 0.005
+DIRECTORIES = 240
+FILES_PER_DIRECTORY = 20
+
+
+class SlowLister(LocalDirectoryLister):
+    def list_dir(self, prefix):
+        time.sleep(LIST_LATENCY)
+        return super().list_dir(prefix)
+
+
+@pytest.fixture(scope='module')
+def stage(tmp_path_factory):
+    root = tmp_path_factory.mktemp('stage')
+    for i in range(DIRECTORIES):
+        directory = root / 'day={}'.format(i // 24) / 'hour={}'.format(i % 24)
+        directory.mkdir(parents=True)
+        for j in range(FILES_PER_DIRECTORY):
+            (directory / 'part-{:05d}.parquet'.format(j)).write_bytes(b'x' * j)
+    return str(root)
+
+
+@pytest.fixture(scope='module')
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.mark.benchmark(group='stage-listing')
+@pytest.mark.parametrize('max_workers', [1, 8, 32])
+def test_scan_stage(benchmark, stage, max_workers):
+    count = benchmark(lambda: sum(1 for _ in scan_stage(SlowLister(stage), max_workers=max_workers)))
+    assert count == DIRECTORIES * FILES_PER_DIRECTORY
+
+
+@pytest.mark.benchmark(group='stage-ingest')
+def test_list_then_ingest(benchmark, stage, private_key):
+    with MockSnowpipeServer(latency=0.02) as server, server.make_manager(PIPE, private_key) as manager:
+        def run():
+            staged_files = list(scan_stage(SlowLister(stage), max_workers=1))
+            return manager.ingest_files_in_batches(staged_files, max_files=500)
+
+        assert len(benchmark.pedantic(run, rounds=3)) == DIRECTORIES * FILES_PER_DIRECTORY
+
+
+@pytest.mark.benchmark(group='stage-ingest')
+def test_pipelined_ingest(benchmark, stage, private_key):
+    with MockSnowpipeServer(latency=0.02) as server, server.make_manager(PIPE, private_key) as manager:
+        def run():
+            return manager.ingest_files_in_batches(scan_stage(SlowLister(stage), max_workers=8), max_files=500,
+                                                   max_workers=2)
+
+        assert len(benchmark.pedantic(run, rounds=3)) == DIRECTORIES * FILES_PER_DIRECTORY
@@ -0,0 +1,69 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_bench_uris.py - Compares URLGenerator against building the same URLs with furl.
+Run with: python -m pytest benchmarks/test_bench_uris.py
+"""
+
+from snowflake.ingest.utils.uris import URLGenerator
+from snowflake.ingest.utils.uris import INGEST_ENDPOINT_FORMAT
+from snowflake.ingest.utils.uris import HISTORY_ENDPOINT_FORMAT
+from uuid import uuid4
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+HOST = 'testaccount.snowflakecomputing.com'
+PIPE = 'TESTDB.TESTSCHEMA.TESTPIPE'
+
+
+def furl_history_url(pipe, recent_seconds, begin_mark, uuid):
+    from furl import furl
+    builder = furl()
+    builder.host = HOST
+    builder.port = 443
+    builder.scheme = 'https'
+    builder.args['requestId'] = str(uuid)
+    builder.path = HISTORY_ENDPOINT_FORMAT.format(pipe)
+    builder.args['recentSeconds'] = str(recent_seconds)
+    builder.args['beginMark'] = str(begin_mark)
+    return builder.url
+
+
+def furl_ingest_url(pipe, uuid):
+    from furl import furl
+    builder = furl()
+    builder.host = HOST
+    builder.port = 443
+    builder.scheme = 'https'
+    builder.args['requestId'] = str(uuid)
+    builder.path = INGEST_ENDPOINT_FORMAT.format(pipe)
+    return builder.url
+
+
+@pytest.mark.benchmark(group='ingest-url')
+def test_ingest_url(benchmark):
+    generator = URLGenerator(HOST)
+    request_id = uuid4()
+    assert benchmark(generator.make_ingest_url, PIPE, request_id)
+
+
+@pytest.mark.benchmark(group='ingest-url')
+def test_ingest_url_furl(benchmark):
+    pytest.importorskip('furl')
+    request_id = uuid4()
+    assert benchmark(furl_ingest_url, PIPE, request_id) == URLGenerator(HOST).make_ingest_url(PIPE, request_id)
+
+
+@pytest.mark.benchmark(group='history-url')
+def test_history_url(benchmark):
+    generator = URLGenerator(HOST)
+    request_id = uuid4()
+    assert benchmark(generator.make_history_url, PIPE, 600, '1_1234', request_id)
+
+
+@pytest.mark.benchmark(group='history-url')
+def test_history_url_furl(benchmark):
+    pytest.importorskip('furl')
+    request_id = uuid4()
+    assert benchmark(furl_history_url, PIPE, 600, '1_1234', request_id) == \
+        URLGenerator(HOST).make_history_url(PIPE, 600, '1_1234', request_id)
@@ -11,7 +11,6 @@ from sys import version_info, exit
 # Define our list of installation dependencies
 DEPENDS = ["pyjwt",
            "snowflake-connector-python>=3.12.0", 
-           "furl",
            "cryptography",
            "requests<=2.33.0"]
 
@@ -74,6 +73,12 @@ setup(
     ],
     # Now we describe the dependencies
     install_requires=DEPENDS,
+    # Optional dependencies, e.g. pip install snowflake-ingest[async]
+    extras_require={
+        "async": ["aiohttp"],
+        "prometheus": ["prometheus_client"],
+        "orjson": ["orjson"],
+    },
     # At last we set the test suite
     test_suite="setup.test_suite"
 )
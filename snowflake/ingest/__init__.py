@@ -1,2 +1,29 @@
 from .simple_ingest_manager import SimpleIngestManager, StagedFile
-__all__ = [SimpleIngestManager, StagedFile]
+from .ingest_client import IngestClient
+from .ingest_buffer import IngestBuffer
+from .load_tracker import LoadTracker
+from .dedup import IngestDeduplicator
+from .results import IngestResponse, HistoryPage, FileLoadStatus
+__all__ = ['SimpleIngestManager', 'StagedFile', 'AsyncSimpleIngestManager', 'IngestClient', 'IngestBuffer',
+           'LoadTracker', 'IngestJournal', 'IngestDeduplicator', 'IngestResponse', 'HistoryPage', 'FileLoadStatus']
+
+# Loaded on first access, so that importing snowflake.ingest does not pay for asyncio and sqlite3
+_LAZY_MODULES = {
+    'AsyncSimpleIngestManager': '.async_ingest_manager',
+    'IngestJournal': '.journal',
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+    from importlib import import_module
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_MODULES))
@@ -0,0 +1,230 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+async_ingest_manager - Creates an asyncio ingest manager that sends requests to the
+Snowflake Ingest service without blocking the event loop
+"""
+
+from .utils import SecurityManager
+from .utils import URLGenerator
+from .utils.async_network import AsyncSnowflakeRestful
+from .utils.network import DEFAULT_POOL_MAXSIZE
+from .utils.network import DEFAULT_CONNECT_TIMEOUT
+from .utils.network import DEFAULT_READ_TIMEOUT
+from .utils.retry import RetryPolicy
+from .utils.instrumentation import IngestObserver
+from .utils.log_sampling import LogSampler
+from .utils.history import RecordDeduplicator
+from .utils.history import PollBackoff
+from .utils.history import DEFAULT_POLL_INTERVAL
+from .utils.history import DEFAULT_MAX_POLL_INTERVAL
+from .utils.history import DEFAULT_SEEN_CAPACITY
+from .utils.uris import DEFAULT_HOST_FMT
+from .utils.uris import DEFAULT_PORT
+from .utils.uris import DEFAULT_SCHEME
+from .simple_ingest_manager import StagedFile
+from .results import IngestResponse
+from .results import HistoryPage
+from .simple_ingest_manager import AUTH_HEADER
+from .simple_ingest_manager import BEARER_FORMAT
+from .simple_ingest_manager import USER_AGENT_HEADER
+from .simple_ingest_manager import SNOWPIPE_SDK_USER_AGENT
+
+from uuid import UUID
+import asyncio
+
+from logging import getLogger, DEBUG
+logger = getLogger(__name__)
+
+from typing import Dict, Any, AsyncIterator, Callable, Union
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+
+class AsyncSimpleIngestManager(object):
+    """
+    AsyncSimpleIngestManager - the asyncio flavour of SimpleIngestManager. Every call is a coroutine,
+    retries back off with asyncio.sleep and requests go through an aiohttp connection pool, so many
+    pipes can be driven from a single event loop. Requires the optional aiohttp dependency.
+    """
+
+    def __init__(self, account: Text, user: Text, pipe: Text, private_key: Union[Text, bytes, Any],
+                 scheme: Text = DEFAULT_SCHEME, host: Text = None, port: int = DEFAULT_PORT,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE, restful: AsyncSnowflakeRestful = None,
+                 private_key_passphrase: bytes = None, retry_policy: RetryPolicy = None,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 observer: IngestObserver = None, request_log_sampler: LogSampler = None,
+                 typed_results: bool = False):
+        """
+        Simply instantiates all of our local state
+        :param account: the name of the account who is loading
+        :param user: the name of the user who is loading
+        :param pipe: the name of the pipe which we want to use for ingesting
+        :param private_key: the private key we use for token signature, PEM text or bytes or a loaded key object
+        :param private_key_passphrase: the passphrase of an encrypted PEM private key
+        :param pool_maxsize: maximum number of keep-alive connections per host
+        :param restful: an optional shared AsyncSnowflakeRestful, close() leaves it open
+        :param retry_policy: how requests of this manager are retried, defaults to the policy of the restful
+        :param connect_timeout: seconds to wait for a connection to be established, None to wait forever
+        :param read_timeout: seconds to wait between bytes of the response, None to wait forever
+        :param observer: receives the request and token renewal events of this manager, the events of a shared
+                         restful go to the restful's own observer
+        :param request_log_sampler: thins out the per-request debug logs, None to log every request
+        :param typed_results: return IngestResponse and HistoryPage objects instead of the decoded dicts
+        """
+        self.sec_manager = SecurityManager(account, user, private_key,
+                                           private_key_passphrase=private_key_passphrase,
+                                           observer=observer)
+        self.url_engine = URLGenerator(scheme=scheme,
+                                       host=host if host is not None else DEFAULT_HOST_FMT.format(account),
+                                       port=port)
+        self.pipe = pipe
+        self._next_begin_mark = None
+        self.retry_policy = retry_policy
+        self.request_log_sampler = request_log_sampler
+        self.typed_results = typed_results
+        self._owns_restful = restful is None
+        self.restful = restful if restful is not None else AsyncSnowflakeRestful(pool_maxsize=pool_maxsize,
+                                                                                 connect_timeout=connect_timeout,
+                                                                                 read_timeout=read_timeout,
+                                                                                 observer=observer)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """
+        close - releases the pooled connections of this manager, unless the pool was shared with us
+        """
+        if self._owns_restful:
+            await self.restful.close()
+
+    def _should_log_request(self) -> bool:
+        """
+        _should_log_request - see SimpleIngestManager._should_log_request
+        """
+        return logger.isEnabledFor(DEBUG) and \
+            (self.request_log_sampler is None or self.request_log_sampler.should_log())
+
+    async def _get_headers(self) -> Dict[Text, Text]:
+        """
+        _get_headers - get all required SDK headers to be sent to the service. Signing a new token is CPU bound
+        and may wait for the renewal lock, so it runs in the default executor instead of on the event loop
+        :return: Array of headers to be sent
+        """
+        token = self.sec_manager.get_cached_token()
+        if token is None:
+            token = await asyncio.get_running_loop().run_in_executor(None, self.sec_manager.get_token)
+        return {AUTH_HEADER: BEARER_FORMAT.format(token),
+                USER_AGENT_HEADER: SNOWPIPE_SDK_USER_AGENT}
+
+    async def ingest_files(self, staged_files: [StagedFile], request_id: UUID = None,
+                           retry_policy: RetryPolicy = None, deadline: float = None) -> Dict[Text, Any]:
+        """
+        ingest_files - Informs Snowflake about the files to be ingested into a table through this pipe
+        :param staged_files: a list of files we want to ingest
+        :param request_id: an optional request uuid to label this request
+        :param retry_policy: overrides the retry policy for this call
+        :param deadline: seconds the call may take, retries included, None for no deadline
+        :return: the deserialized response from the service
+        """
+        target_url = self.url_engine.make_ingest_url(self.pipe, request_id)
+        log_request = self._should_log_request()
+        if log_request:
+            logger.debug('Ingest file request url: %s', target_url)
+
+        # Encode the files straight into the request body
+        data = self.restful.codec.encode_files(staged_files)
+
+        response_body = await self.restful.post(target_url, data=data, headers=await self._get_headers(),
+                                                retry_policy=retry_policy or self.retry_policy, deadline=deadline)
+        if log_request:
+            logger.debug('Ingest response: %s', response_body)
+
+        return IngestResponse.from_response(response_body) if self.typed_results else response_body
+
+    async def get_history(self, recent_seconds: int = None, request_id: UUID = None,
+                          retry_policy: RetryPolicy = None, deadline: float = None) -> Dict[Text, Any]:
+        """
+        get_history - returns the currently cached ingest history from the service
+        :param request_id: an optional request UUID to label this
+        :param recent_seconds: an optional argument that specify the time range that history can be seen
+        :param retry_policy: overrides the retry policy for this call
+        :param deadline: seconds the call may take, retries included, None for no deadline
+        :return: the deserialized response from the service
+        """
+        response_body = await self._get_history(recent_seconds, self._next_begin_mark, request_id, retry_policy,
+                                                deadline)
+
+        self._next_begin_mark = response_body['nextBeginMark']
+
+        return response_body
+
+    async def _get_history(self, recent_seconds: int = None, begin_mark: Text = None,
+                           request_id: UUID = None, retry_policy: RetryPolicy = None,
+                           deadline: float = None) -> Dict[Text, Any]:
+        """
+        _get_history - fetches one insertReport page from the given cursor, without touching the manager's cursor
+        """
+        target_url = self.url_engine.make_history_url(self.pipe, recent_seconds, begin_mark, request_id)
+        if self._should_log_request():
+            logger.debug('Get history request url: %s', target_url)
+
+        response_body = await self.restful.get(target_url, headers=await self._get_headers(),
+                                               retry_policy=retry_policy or self.retry_policy, deadline=deadline)
+
+        return HistoryPage.from_response(response_body) if self.typed_results else response_body
+
+    async def iter_history(self, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                           stop_when: Callable[[], bool] = None, recent_seconds: int = None,
+                           max_poll_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+                           seen_capacity: int = DEFAULT_SEEN_CAPACITY) -> AsyncIterator[Dict[Text, Any]]:
+        """
+        iter_history - asynchronously streams the ingest history one file record at a time, see
+        SimpleIngestManager.iter_history
+        """
+        begin_mark = None
+        deduplicator = RecordDeduplicator(seen_capacity)
+        backoff = PollBackoff(poll_interval, max_poll_interval)
+
+        while stop_when is None or not stop_when():
+            response_body = await self._get_history(recent_seconds, begin_mark)
+            begin_mark = response_body.get('nextBeginMark', begin_mark)
+
+            found_new = False
+            for record in response_body.get('files', ()):
+                if deduplicator.is_new(record):
+                    found_new = True
+                    yield record
+
+            if stop_when is not None and stop_when():
+                return
+            await asyncio.sleep(backoff.next_sleep_time(found_new))
+
+    async def get_history_range(self, start_time_inclusive: Text, end_time_exclusive: Text = None,
+                                request_id: UUID = None, retry_policy: RetryPolicy = None,
+                           deadline: float = None) -> Dict[Text, Any]:
+        """
+        get_history_range - returns the ingest history between two points in time
+        :param request_id: an optional request UUID to label this
+        :param retry_policy: overrides the retry policy for this call
+        :param deadline: seconds the call may take, retries included, None for no deadline
+        :param start_time_inclusive: Timestamp in ISO-8601 format. Start of the time range to retrieve load history data.
+        :param end_time_exclusive: Timestamp in ISO-8601 format. End of the time range to retrieve load history data.
+                                    If omitted, then CURRENT_TIMESTAMP() is used as the end of the range.
+        :return: the deserialized response from the service
+        """
+        target_url = self.url_engine.make_history_range_url(self.pipe, start_time_inclusive, end_time_exclusive,
+                                                            request_id)
+        if self._should_log_request():
+            logger.debug('Get history range request url: %s', target_url)
+
+        response_body = await self.restful.get(target_url, headers=await self._get_headers(),
+                                               retry_policy=retry_policy or self.retry_policy, deadline=deadline)
+
+        return HistoryPage.from_response(response_body) if self.typed_results else response_body
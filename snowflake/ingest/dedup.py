@@ -0,0 +1,122 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+dedup - Leaves files that were already ingested out of insertFiles requests
+"""
+
+from .simple_ingest_manager import SimpleIngestManager
+from .simple_ingest_manager import StagedFile
+from .utils.path_index import LRUPathIndex
+from .utils.instrumentation import IngestObserver
+
+from uuid import UUID
+import threading
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from typing import Any, Iterable, List, Tuple
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+# File statuses of history records after which Snowpipe will not load the path again
+SKIPPABLE_STATUSES = frozenset(['LOADED', 'PARTIALLY_LOADED', 'LOAD_IN_PROGRESS'])
+
+
+class IngestDeduplicator(object):
+    """
+    IngestDeduplicator - filters the files of ingest_files against an index of the paths recently submitted
+    through it or seen loaded in the history, and sends only the rest. Snowpipe would ignore those files
+    anyway, since it never loads the same path of a pipe twice, so this only saves the request payload.
+    The index is an LRUPathIndex by default, a BloomPathIndex remembers far more paths in the same memory
+    at the price of skipping a new file now and then, at its error rate. Use one index per pipe
+    """
+
+    def __init__(self, manager: SimpleIngestManager, index: Any = None, observer: IngestObserver = None):
+        """
+        :param manager: the ingest manager used to send requests
+        :param index: the set of known paths, e.g. an LRUPathIndex or a BloomPathIndex
+        :param observer: told how many files each call skipped, defaults to the observer of the manager's restful
+        """
+        self.manager = manager
+        self.index = index if index is not None else LRUPathIndex()
+        self.observer = observer if observer is not None else manager.restful.observer
+        self.skipped = 0  # files skipped so far
+        self._skipped_lock = threading.Lock()
+
+    def filter(self, staged_files: Iterable[StagedFile]) -> Tuple[List[StagedFile], int]:
+        """
+        filter - drops the files whose path is known, or that repeat a path earlier in staged_files
+        :param staged_files: the files we want to ingest
+        :return: the files left and the number of files dropped
+        """
+        index = self.index
+        new_files = []
+        batch_paths = set()
+        skipped = 0
+
+        for staged_file in staged_files:
+            path = staged_file.path
+            if path in batch_paths or path in index:
+                skipped += 1
+                continue
+            batch_paths.add(path)
+            new_files.append(staged_file)
+
+        return new_files, skipped
+
+    def ingest_files(self, staged_files: Iterable[StagedFile], request_id: UUID = None, **kwargs) -> Any:
+        """
+        ingest_files - sends the files that are not known yet and remembers them once the request succeeded
+        :param staged_files: the files we want to ingest
+        :param request_id: an optional request uuid to label this request
+        :param kwargs: passed on to SimpleIngestManager.ingest_files, e.g. retry_policy or deadline
+        :return: the response of the manager, None if every file was skipped and no request was sent
+        """
+        new_files, skipped = self.filter(staged_files)
+
+        if skipped:
+            with self._skipped_lock:
+                self.skipped += skipped
+            logger.debug('Skipped %d files already ingested through %s', skipped, self.manager.pipe)
+            self.observer.on_files_skipped(self.manager.pipe, skipped)
+
+        if not new_files:
+            return None
+
+        response = self.manager.ingest_files(new_files, request_id, **kwargs)
+        self.remember(staged_file.path for staged_file in new_files)
+        return response
+
+    def remember(self, paths: Iterable[Text]):
+        """
+        remember - adds paths to the index, e.g. the files of a previous run
+        """
+        add = self.index.add
+        for path in paths:
+            add(path)
+
+    def observe_history(self, records: Iterable[Any]):
+        """
+        observe_history - adds the paths Snowpipe will not load again from history records
+        :param records: insertReport or loadHistoryScan file records, dicts or FileLoadStatus objects
+        """
+        self.remember(record.get('path') for record in records if record.get('status') in SKIPPABLE_STATUSES)
+
+    def get_history(self, *args, **kwargs) -> Any:
+        """
+        get_history - SimpleIngestManager.get_history, feeding the files of the response into the index
+        """
+        response_body = self.manager.get_history(*args, **kwargs)
+        self.observe_history(response_body.get('files') or ())
+        return response_body
+
+    def get_history_range(self, *args, **kwargs) -> Any:
+        """
+        get_history_range - SimpleIngestManager.get_history_range, feeding the files of the response into the index
+        """
+        response_body = self.manager.get_history_range(*args, **kwargs)
+        self.observe_history(response_body.get('files') or ())
+        return response_body
@@ -1,11 +1,15 @@
 # Copyright (c) 2012-2023 Snowflake Computing Inc. All rights reserved.
-from requests import Response
+from .errorcode import ERR_REQUEST_TIMEOUT
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from requests import Response
 
 class IngestResponseError(Exception):
     """
         Error thrown when rest request failed
     """
-    def __init__(self, response: Response):
+    def __init__(self, response: 'Response'):
         self.http_error_code = response.status_code
 
         try:
@@ -31,6 +35,16 @@ class IngestResponseError(Exception):
     def __str__(self):
         return self.message
 
+    def __reduce__(self):
+        # rebuilt from the parsed attributes so the error can cross process boundaries, the response is not kept
+        return _restore_error, (type(self), self.__dict__)
+
+
+def _restore_error(cls, state):
+    error = cls.__new__(cls)
+    error.__dict__.update(state)
+    return error
+
 
 class IngestClientError(Exception):
     """
@@ -43,3 +57,12 @@ class IngestClientError(Exception):
     def __str__(self):
         return 'Vendor Code: {}, Message: {}'\
             .format(self.code, self.message)
+
+
+class IngestTimeoutError(IngestClientError):
+    """
+        Error thrown when a request did not complete within its deadline
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault('code', ERR_REQUEST_TIMEOUT)
+        super().__init__(**kwargs)
@@ -1,3 +1,6 @@
 # Copyright (c) 2012-2023 Snowflake Computing Inc. All rights reserved.
 
 ERR_INVALID_PRIVATE_KEY = 290001
+ERR_REQUEST_TIMEOUT = 290002
+ERR_CIRCUIT_OPEN = 290003
+ERR_INCOMPLETE_HISTORY = 290004
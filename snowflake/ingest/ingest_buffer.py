@@ -0,0 +1,209 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+ingest_buffer - Collects staged files from many threads and sends them to the Snowflake
+Ingest service in a few large insertFiles requests
+"""
+
+from .simple_ingest_manager import SimpleIngestManager
+from .simple_ingest_manager import StagedFile
+from .utils.batching import estimate_file_entry_bytes
+from .utils.batching import MAX_FILES_PER_REQUEST
+from .utils.batching import MAX_REQUEST_BYTES
+from .utils.batching import PAYLOAD_OVERHEAD
+
+from concurrent.futures import Future, InvalidStateError
+from queue import Queue, Empty, Full
+import threading
+import time
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from typing import Any
+
+# default number of seconds a file may wait in the buffer before it is flushed
+DEFAULT_MAX_AGE = 1.0
+# default number of files that may wait in the buffer before submit blocks
+DEFAULT_MAX_PENDING = 4 * MAX_FILES_PER_REQUEST
+
+
+class IngestBuffer(object):
+    """
+    IngestBuffer - a thread safe micro-batcher in front of a SimpleIngestManager. Files submitted from any
+    thread are queued and a background thread sends them with a single insertFiles request as soon as the
+    file count, payload size or age threshold is reached. Each submit returns a future resolving to the
+    file's slice of the response of the request that carried it. When max_pending files are queued, submit
+    blocks until the background thread catches up.
+    """
+
+    def __init__(self, manager: SimpleIngestManager, max_files: int = MAX_FILES_PER_REQUEST,
+                 max_bytes: int = MAX_REQUEST_BYTES, max_age: float = DEFAULT_MAX_AGE,
+                 max_pending: int = DEFAULT_MAX_PENDING):
+        """
+        :param manager: the ingest manager used to send requests
+        :param max_files: the number of files that triggers a flush
+        :param max_bytes: the estimated payload size that triggers a flush, None for no size limit
+        :param max_age: the number of seconds the oldest buffered file waits before a flush
+        :param max_pending: the number of queued files after which submit blocks
+        """
+        self.manager = manager
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._queue = Queue(maxsize=max_pending)
+        self._carry = None  # an item that did not fit into the previous batch
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name='IngestBuffer', daemon=True)
+        self._worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, staged_file: StagedFile, timeout: float = None) -> Future:
+        """
+        submit - queues a file for ingestion
+        :param staged_file: the file we want to ingest
+        :param timeout: the number of seconds to wait for queue space, None to wait forever
+        :return: a future resolving to the file's slice of the insertFiles response that carried it,
+                 {'requestId': ..., 'responseCode': ..., 'file': {'path': ..., 'size': ...}}
+        """
+        future = Future()
+        self._put((staged_file, future, time.monotonic()), timeout)
+        return future
+
+    def flush(self, timeout: float = None):
+        """
+        flush - sends every file queued so far, without waiting for a threshold
+        :param timeout: the number of seconds to wait for the flush to complete
+        """
+        done = Future()
+        try:
+            self._put((None, done, time.monotonic()), timeout)
+        except RuntimeError:
+            # closing flushed everything already
+            return
+        done.result(timeout)
+
+    def close(self):
+        """
+        close - flushes the remaining files and stops the background thread, the manager is left open
+        """
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        # no file is queued after this sentinel, _put checks _closed under the same lock
+        self._queue.put(None)
+        self._worker.join()
+
+    def _put(self, item, timeout: float = None):
+        # the closed check and the put happen under the close lock, so nothing is queued behind the
+        # sentinel of close, where the background thread would never pick it up
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._close_lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise Full
+        try:
+            if self._closed:
+                raise RuntimeError('cannot submit files to a closed IngestBuffer')
+            self._queue.put(item, timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+        finally:
+            self._close_lock.release()
+
+    def _next_item(self, timeout: float = None):
+        if self._carry is not None:
+            item, self._carry = self._carry, None
+            return item
+        return self._queue.get(timeout=timeout)
+
+    def _run(self):
+        while True:
+            item = self._next_item()
+            if item is None:
+                return
+
+            batch = []
+            batch_bytes = PAYLOAD_OVERHEAD
+            deadline = item[2] + self.max_age
+            flush_markers = []
+            closing = False
+
+            try:
+                while item is not None:
+                    staged_file, future, _ = item
+
+                    if staged_file is None:
+                        flush_markers.append(future)
+                        break
+
+                    entry_bytes = estimate_file_entry_bytes(staged_file)
+                    if batch and self.max_bytes is not None and batch_bytes + entry_bytes > self.max_bytes:
+                        self._carry = item
+                        break
+
+                    batch.append((staged_file, future))
+                    batch_bytes += entry_bytes
+                    if len(batch) >= self.max_files:
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._next_item(timeout=remaining)
+                    except Empty:
+                        break
+
+                    if item is None:
+                        # closing, send what we have and then stop
+                        closing = True
+                        break
+
+                self._send(batch)
+            except Exception as e:
+                # the thread must survive, otherwise no later submit, flush or close would ever complete
+                logger.exception('Failed to process a batch of %d files', len(batch))
+                for _, future in batch:
+                    _complete(future, exception=e)
+
+            for marker in flush_markers:
+                _complete(marker)
+            if closing:
+                return
+
+    def _send(self, batch):
+        # files whose future was cancelled while they were queued are not sent
+        batch = [(staged_file, future) for staged_file, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            response_body = self.manager.ingest_files([staged_file for staged_file, _ in batch])
+        except Exception as e:
+            logger.error('Failed to ingest a batch of %d files: %s', len(batch), e)
+            for _, future in batch:
+                _complete(future, exception=e)
+            return
+
+        request_id = response_body.get('requestId')
+        response_code = response_body.get('responseCode')
+        for staged_file, future in batch:
+            _complete(future, {'requestId': request_id, 'responseCode': response_code,
+                               'file': {'path': staged_file.path, 'size': staged_file.size}})
+
+
+def _complete(future: Future, result: Any = None, exception: BaseException = None):
+    """
+    _complete - resolves a future unless it is already done, e.g. cancelled by the caller
+    """
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        logger.debug('Not resolving a future that is already done', exc_info=True)
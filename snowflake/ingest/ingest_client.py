@@ -0,0 +1,159 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+ingest_client - One account identity and connection pool shared by the ingest managers of
+many pipes
+"""
+
+from .simple_ingest_manager import SimpleIngestManager
+from .simple_ingest_manager import StagedFile
+from .utils import SecurityManager
+from .utils import URLGenerator
+from .utils.network import SnowflakeRestful
+from .utils.network import DEFAULT_POOL_CONNECTIONS
+from .utils.network import DEFAULT_POOL_MAXSIZE
+from .utils.network import DEFAULT_CONNECT_TIMEOUT
+from .utils.network import DEFAULT_READ_TIMEOUT
+from .utils.retry import RetryPolicy
+from .utils.instrumentation import IngestObserver
+from .utils.log_sampling import LogSampler
+from .utils.uris import DEFAULT_HOST_FMT
+from .utils.uris import DEFAULT_PORT
+from .utils.uris import DEFAULT_SCHEME
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+import threading
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from typing import Dict, Any, Iterable, Mapping, Union
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+# default number of pipes ingest_files_to_pipes sends to concurrently
+DEFAULT_MAX_WORKERS = 8
+
+
+class IngestClient(object):
+    """
+    IngestClient - holds one token generator, one url generator and one connection pool for an account and
+    user, and hands out a lightweight SimpleIngestManager per pipe on top of them. Loading into hundreds of
+    pipes then parses the key and signs tokens once, and every pipe reuses the same pooled connections.
+    """
+
+    def __init__(self, account: Text, user: Text, private_key: Union[Text, bytes, Any],
+                 scheme: Text = DEFAULT_SCHEME, host: Text = None, port: int = DEFAULT_PORT,
+                 pool_connections: int = DEFAULT_POOL_CONNECTIONS, pool_maxsize: int = None,
+                 restful: SnowflakeRestful = None, private_key_passphrase: bytes = None,
+                 retry_policy: RetryPolicy = None, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT, observer: IngestObserver = None,
+                 request_log_sampler: LogSampler = None, typed_results: bool = False,
+                 max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        :param account: the name of the account who is loading
+        :param user: the name of the user who is loading
+        :param private_key: the private key we use for token signature, PEM text or bytes or a loaded key object
+        :param private_key_passphrase: the passphrase of an encrypted PEM private key
+        :param pool_connections: number of host connection pools to cache
+        :param pool_maxsize: maximum number of keep-alive connections per host, defaults to enough for max_workers
+        :param restful: an optional shared SnowflakeRestful, close() leaves it open
+        :param retry_policy: how requests of the pipes are retried, defaults to the policy of the restful
+        :param connect_timeout: seconds to wait for a connection to be established, None to wait forever
+        :param read_timeout: seconds to wait between bytes of the response, None to wait forever
+        :param observer: receives the request and token renewal events of every pipe
+        :param request_log_sampler: thins out the per-request debug logs of every pipe
+        :param typed_results: whether the pipes return IngestResponse and HistoryPage objects
+        :param max_workers: the default number of pipes ingest_files_to_pipes sends to concurrently
+        """
+        self.sec_manager = SecurityManager(account, user, private_key,
+                                           private_key_passphrase=private_key_passphrase,
+                                           observer=observer)
+        self.url_engine = URLGenerator(scheme=scheme,
+                                       host=host if host is not None else DEFAULT_HOST_FMT.format(account),
+                                       port=port)
+        if pool_maxsize is None:
+            pool_maxsize = max(DEFAULT_POOL_MAXSIZE, max_workers)
+        self._owns_restful = restful is None
+        self.restful = restful if restful is not None else SnowflakeRestful(pool_connections=pool_connections,
+                                                                            pool_maxsize=pool_maxsize,
+                                                                            connect_timeout=connect_timeout,
+                                                                            read_timeout=read_timeout,
+                                                                            observer=observer)
+        self.retry_policy = retry_policy
+        self.request_log_sampler = request_log_sampler
+        self.typed_results = typed_results
+        self.max_workers = max_workers
+        self._pipes = {}  # pipe name -> SimpleIngestManager
+        self._pipes_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        close - releases the pooled connections, unless the pool was shared with us
+        """
+        if self._owns_restful:
+            self.restful.close()
+
+    def pipe(self, pipe: Text) -> SimpleIngestManager:
+        """
+        pipe - returns the manager of a pipe, the same one on every call for the same name. Its history
+        cursor is per pipe, everything else is shared with the client
+        :param pipe: the fully qualified name of the pipe
+        :return: a SimpleIngestManager for the pipe
+        """
+        with self._pipes_lock:
+            manager = self._pipes.get(pipe)
+            if manager is None:
+                manager = SimpleIngestManager.from_shared(pipe, self.sec_manager, self.url_engine, self.restful,
+                                                          retry_policy=self.retry_policy,
+                                                          request_log_sampler=self.request_log_sampler,
+                                                          typed_results=self.typed_results)
+                self._pipes[pipe] = manager
+        return manager
+
+    def ingest_files_to_pipes(self, files_by_pipe: Mapping[Text, Iterable[StagedFile]], max_workers: int = None,
+                              return_exceptions: bool = False) -> Dict[Text, Any]:
+        """
+        ingest_files_to_pipes - sends one insertFiles request per pipe, to several pipes at a time. The files of
+        each pipe must fit in one request, see SimpleIngestManager.ingest_files_in_batches otherwise
+        :param files_by_pipe: a mapping from each pipe name to the files we want to ingest through it
+        :param max_workers: the number of requests in flight at once, defaults to the client's max_workers
+        :param return_exceptions: put the error of a failed pipe in the result instead of raising it. Otherwise
+                                  no more pipes are started after the first failure and the error is re-raised
+        :return: a mapping from each pipe name to the deserialized response, or the error, of its request
+        """
+        max_workers = max_workers if max_workers is not None else self.max_workers
+        # Resolve the handles up front so the token is signed once, before the requests fan out
+        self.sec_manager.get_token()
+        managers = [(pipe, self.pipe(pipe), list(staged_files)) for pipe, staged_files in files_by_pipe.items()]
+        results = {}
+
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            futures = {executor.submit(manager.ingest_files, staged_files): pipe
+                       for pipe, manager, staged_files in managers}
+
+            if not return_exceptions:
+                done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in not_done:
+                    future.cancel()
+
+            for future, pipe in futures.items():
+                if future.cancelled():
+                    continue
+                error = future.exception()
+                if error is not None:
+                    if not return_exceptions:
+                        raise error
+                    results[pipe] = error
+                else:
+                    results[pipe] = future.result()
+
+        return results
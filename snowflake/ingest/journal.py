@@ -0,0 +1,211 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+journal - A durable local record of the files sent through ingest_files, so that a process restarting
+after a crash knows which files were submitted without scanning the load history
+"""
+
+from .simple_ingest_manager import SimpleIngestManager
+from .simple_ingest_manager import StagedFile
+from .load_tracker import TERMINAL_STATUSES
+
+from datetime import timedelta
+from uuid import UUID, uuid4
+import sqlite3
+import threading
+import time
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from typing import Dict, Any, Iterable, List, Union
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+# Journal states of a file, once loaded a file takes the status of its history record instead,
+# one of load_tracker.TERMINAL_STATUSES
+PENDING = 'PENDING'  # journaled, the insertFiles request may or may not have reached the service
+SUBMITTED = 'SUBMITTED'  # the insertFiles request carrying the file succeeded
+
+# sqlite synchronous modes, NORMAL survives a crash of the process, FULL a crash of the machine as well
+SYNCHRONOUS_MODES = frozenset(['OFF', 'NORMAL', 'FULL', 'EXTRA'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_journal (
+    pipe TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER,
+    request_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (pipe, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ingest_journal_state ON ingest_journal (pipe, state, request_id);
+"""
+
+
+class IngestJournal(object):
+    """
+    IngestJournal - an append mostly sqlite journal around SimpleIngestManager.ingest_files. Every file is
+    journaled as PENDING with the request id before the request is sent and marked SUBMITTED once it
+    succeeded, in one transaction per request. After a crash, recover() sends the PENDING files again with
+    their original request id, and submitted() hands the files still waiting for their load status to a
+    LoadTracker. The database runs in WAL mode, so a commit only appends to the write-ahead log and with
+    the default NORMAL synchronous mode the log is fsynced once per checkpoint rather than once per commit.
+    """
+
+    def __init__(self, manager: SimpleIngestManager, path: Text, synchronous: Text = 'NORMAL'):
+        """
+        :param manager: the ingest manager used to send requests, files are journaled under its pipe
+        :param path: the sqlite database file, created if missing. Several journals may share it
+        :param synchronous: the sqlite synchronous mode, NORMAL loses nothing when the process crashes,
+                            FULL fsyncs every commit to survive power loss as well
+        """
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError('Unknown synchronous mode: {}'.format(synchronous))
+
+        self.manager = manager
+        self.pipe = manager.pipe
+        self.path = path
+        self._lock = threading.Lock()
+        # autocommit mode, the transactions are begun explicitly
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous={}'.format(synchronous))
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        close - closes the database, the manager is left open
+        """
+        with self._lock:
+            self._connection.close()
+
+    def ingest_files(self, staged_files: Iterable[StagedFile], request_id: UUID = None, **kwargs) -> Any:
+        """
+        ingest_files - journals the files as PENDING, sends them through the manager and marks them SUBMITTED.
+        When the request fails the files stay PENDING and the error is re-raised
+        :param staged_files: a list of files we want to ingest
+        :param request_id: the request uuid, generated when missing so that a resend can reuse it
+        :param kwargs: passed on to SimpleIngestManager.ingest_files, e.g. retry_policy or deadline
+        :return: the response of the manager
+        """
+        staged_files = list(staged_files)
+        request_id = request_id if request_id is not None else uuid4()
+        now = time.time()
+        self._write('INSERT OR REPLACE INTO ingest_journal (pipe, path, size, request_id, state, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    [(self.pipe, staged_file.path, staged_file.size, str(request_id), PENDING, now)
+                     for staged_file in staged_files])
+
+        response = self.manager.ingest_files(staged_files, request_id, **kwargs)
+
+        self._mark_submitted(request_id)
+        return response
+
+    def record_history(self, records: Iterable[Any]) -> int:
+        """
+        record_history - stores the final load status of journaled files, e.g. from the futures of a LoadTracker
+        :param records: insertReport or loadHistoryScan file records, dicts or FileLoadStatus objects
+        :return: the number of records with a terminal status
+        """
+        now = time.time()
+        rows = [(record.get('status'), now, self.pipe, record.get('path'))
+                for record in records if record.get('status') in TERMINAL_STATUSES]
+        self._write('UPDATE ingest_journal SET state = ?, updated_at = ? WHERE pipe = ? AND path = ?', rows)
+        return len(rows)
+
+    def pending(self) -> Dict[Text, List[StagedFile]]:
+        """
+        pending - the files whose request may not have reached the service, for instance because the process
+        crashed while sending it
+        :return: a mapping from each request id, as the text it was journaled with, to its files
+        """
+        requests = {}
+        for path, size, request_id in self._read('SELECT path, size, request_id FROM ingest_journal '
+                                                 'WHERE pipe = ? AND state = ? ORDER BY request_id',
+                                                 (self.pipe, PENDING)):
+            requests.setdefault(request_id, []).append(StagedFile(path, size))
+        return requests
+
+    def submitted(self) -> List[StagedFile]:
+        """
+        submitted - the files accepted by the service whose load status has not been recorded yet
+        """
+        return [StagedFile(path, size)
+                for path, size in self._read('SELECT path, size FROM ingest_journal WHERE pipe = ? AND state = ?',
+                                             (self.pipe, SUBMITTED))]
+
+    def state(self, path: Text) -> Text:
+        """
+        :return: the journal state of a file, None if it was never journaled
+        """
+        rows = self._read('SELECT state FROM ingest_journal WHERE pipe = ? AND path = ?', (self.pipe, path))
+        return rows[0][0] if rows else None
+
+    def counts(self) -> Dict[Text, int]:
+        """
+        :return: the number of journaled files of the pipe per state
+        """
+        return dict(self._read('SELECT state, COUNT(*) FROM ingest_journal WHERE pipe = ? GROUP BY state',
+                               (self.pipe,)))
+
+    def recover(self, **kwargs) -> int:
+        """
+        recover - sends the PENDING files again, each request with its original request id. Snowpipe skips
+        files it has already loaded, so a request that did reach the service before the crash is harmless
+        :param kwargs: passed on to SimpleIngestManager.ingest_files, e.g. retry_policy or deadline
+        :return: the number of files sent
+        """
+        sent = 0
+        for request_id, staged_files in self.pending().items():
+            logger.info('Resending %d journaled files of request %s', len(staged_files), request_id)
+            self.manager.ingest_files(staged_files, request_id, **kwargs)
+            self._mark_submitted(request_id)
+            sent += len(staged_files)
+        return sent
+
+    def prune(self, older_than: timedelta) -> int:
+        """
+        prune - forgets the files that reached a terminal status more than older_than ago
+        :return: the number of files removed
+        """
+        statuses = sorted(TERMINAL_STATUSES)
+        cutoff = time.time() - older_than.total_seconds()
+        with self._lock:
+            cursor = self._connection.execute(
+                'DELETE FROM ingest_journal WHERE pipe = ? AND updated_at < ? AND state IN ({})'.format(
+                    ','.join('?' * len(statuses))),
+                [self.pipe, cutoff] + statuses)
+            return cursor.rowcount
+
+    def _mark_submitted(self, request_id: Union[UUID, Text]):
+        self._write('UPDATE ingest_journal SET state = ?, updated_at = ? '
+                    'WHERE pipe = ? AND request_id = ? AND state = ?',
+                    [(SUBMITTED, time.time(), self.pipe, str(request_id), PENDING)])
+
+    def _write(self, statement: Text, rows: List[tuple]):
+        # all rows go into one transaction and hence one commit
+        if not rows:
+            return
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._connection.executemany(statement, rows)
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            self._connection.execute('COMMIT')
+
+    def _read(self, statement: Text, parameters: tuple) -> List[tuple]:
+        with self._lock:
+            return self._connection.execute(statement, parameters).fetchall()
@@ -0,0 +1,251 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+load_tracker - Follows submitted files through the load history until each one is
+loaded, partially loaded or failed
+"""
+
+from .simple_ingest_manager import SimpleIngestManager
+from .simple_ingest_manager import StagedFile
+from .utils.history import PollBackoff
+from .utils.history import format_timestamp
+from .utils.history import DEFAULT_POLL_INTERVAL
+from .utils.history import DEFAULT_MAX_POLL_INTERVAL
+
+from concurrent.futures import Future, wait
+from datetime import datetime, timedelta
+from itertools import islice
+from uuid import UUID
+import threading
+import time
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from typing import Dict, Any, Iterable, Union
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+# File statuses after which a file will not change anymore
+TERMINAL_STATUSES = frozenset(['LOADED', 'LOAD_FAILED', 'PARTIALLY_LOADED'])
+# insertReport only keeps about 10 minutes of history, older files are looked up with loadHistoryScan
+DEFAULT_SCAN_AFTER = timedelta(minutes=8)
+# minimum time between two loadHistoryScan fallbacks
+DEFAULT_SCAN_INTERVAL = timedelta(minutes=1)
+# slack subtracted from submit times to absorb clock skew with the service
+SCAN_CLOCK_SKEW = timedelta(minutes=1)
+# number of loadHistoryScan records matched against the pending files at once
+SCAN_RESOLVE_CHUNK = 1000
+
+
+class _PendingFile(object):
+    __slots__ = ('future', 'submitted_at')
+
+    def __init__(self, future: Future, submitted_at: datetime):
+        self.future = future
+        self.submitted_at = submitted_at
+
+
+class LoadTracker(object):
+    """
+    LoadTracker - waits for submitted files to reach a terminal load status. Pending files are indexed by
+    path, so each history record is matched in constant time no matter how many files are in flight. Each
+    poll reads the next insertReport page from the tracker's own cursor, and files that have been pending
+    longer than insertReport keeps history are looked up with loadHistoryScan instead.
+    """
+
+    def __init__(self, manager: SimpleIngestManager, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 max_poll_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+                 scan_after: timedelta = DEFAULT_SCAN_AFTER, scan_interval: timedelta = DEFAULT_SCAN_INTERVAL):
+        """
+        :param manager: the ingest manager of the pipe the files were submitted to
+        :param poll_interval: the number of seconds between polls that resolve files
+        :param max_poll_interval: the upper bound of the poll interval while nothing resolves
+        :param scan_after: how long a file may be pending before it is looked up with loadHistoryScan
+        :param scan_interval: minimum time between two loadHistoryScan lookups
+        """
+        self.manager = manager
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.scan_after = scan_after
+        self.scan_interval = scan_interval
+        self._pending = {}  # path -> _PendingFile
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._begin_mark = None
+        self._last_scan = None
+        self._scan_mark = None  # where the last completed loadHistoryScan ended
+        self._poller = None
+        self._stop_polling = threading.Event()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def register(self, staged_files: Iterable[Union[StagedFile, Text]],
+                 submitted_at: datetime = None) -> Dict[Text, Future]:
+        """
+        register - starts tracking files that were submitted with ingest_files
+        :param staged_files: the submitted files or their paths
+        :param submitted_at: when the files were submitted (UTC), defaults to now
+        :return: a mapping from each path to a future resolving to its final history record, cancelling a future
+                 stops tracking its file
+        """
+        submitted_at = submitted_at if submitted_at is not None else datetime.utcnow()
+        futures = {}
+
+        with self._lock:
+            for staged_file in staged_files:
+                path = staged_file if isinstance(staged_file, str) else staged_file.path
+                pending = self._pending.get(path)
+                if pending is None:
+                    pending = _PendingFile(Future(), submitted_at)
+                    self._pending[path] = pending
+                futures[path] = pending.future
+
+        return futures
+
+    def ingest_files(self, staged_files: Iterable[StagedFile], request_id: UUID = None) -> Dict[Text, Future]:
+        """
+        ingest_files - submits files through the manager and tracks them
+        :param staged_files: a list of files we want to ingest
+        :param request_id: an optional request uuid to label this request
+        :return: a mapping from each path to a future resolving to its final history record
+        """
+        staged_files = list(staged_files)
+        submitted_at = datetime.utcnow()
+        self.manager.ingest_files(staged_files, request_id)
+        return self.register(staged_files, submitted_at)
+
+    def poll(self) -> int:
+        """
+        poll - reads the next page of load history, plus a loadHistoryScan for old files when due
+        :return: the number of files resolved by this poll
+        """
+        with self._poll_lock:
+            self._forget_cancelled()
+            if not self._pending:
+                return 0
+
+            response_body = self.manager._get_history(begin_mark=self._begin_mark)
+            self._begin_mark = response_body.get('nextBeginMark', self._begin_mark)
+            resolved = self._resolve(response_body.get('files', ()))
+
+            now = datetime.utcnow()
+            if self._last_scan is None or now - self._last_scan >= self.scan_interval:
+                oldest = self._oldest_submit_time()
+                if oldest is not None and now - oldest >= self.scan_after:
+                    self._last_scan = now
+                    resolved += self._scan(oldest, now)
+
+            return resolved
+
+    def wait_all(self, timeout: float = None) -> bool:
+        """
+        wait_all - polls until every registered file reached a terminal status
+        :param timeout: the maximum number of seconds to wait, None to wait forever
+        :return: True if no file is pending anymore, False if the timeout elapsed first
+        """
+        if self._poller is not None:
+            # the background poller resolves the futures, just wait for them
+            with self._lock:
+                futures = [pending.future for pending in self._pending.values()]
+            return not wait(futures, timeout)[1]
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        backoff = PollBackoff(self.poll_interval, self.max_poll_interval)
+
+        while True:
+            resolved = self.poll()
+            if not self._pending:
+                return True
+
+            sleep_time = backoff.next_sleep_time(resolved > 0)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                sleep_time = min(sleep_time, remaining)
+            time.sleep(sleep_time)
+
+    def start(self):
+        """
+        start - polls from a daemon thread so the futures resolve without calling poll or wait_all
+        """
+        if self._poller is not None:
+            return
+
+        self._stop_polling.clear()
+        self._poller = threading.Thread(target=self._poll_loop, name='LoadTracker', daemon=True)
+        self._poller.start()
+
+    def stop(self):
+        """
+        stop - stops the background poller, pending futures stay pending
+        """
+        if self._poller is None:
+            return
+
+        self._stop_polling.set()
+        self._poller.join()
+        self._poller = None
+
+    def _poll_loop(self):
+        backoff = PollBackoff(self.poll_interval, self.max_poll_interval)
+
+        while not self._stop_polling.is_set():
+            try:
+                resolved = self.poll()
+            except Exception:
+                logger.warning('Failed to poll the load history', exc_info=True)
+                resolved = 0
+            self._stop_polling.wait(backoff.next_sleep_time(resolved > 0))
+
+    def _scan(self, oldest: datetime, now: datetime) -> int:
+        # every scan starts where the previous one ended, less the clock skew, so a file that never resolves
+        # does not make each scan read all the history since it was submitted
+        start = oldest - SCAN_CLOCK_SKEW
+        if self._scan_mark is not None:
+            start = max(start, self._scan_mark - SCAN_CLOCK_SKEW)
+
+        # scan_history_range pages through the range, the records are resolved a chunk at a time as they arrive
+        records = self.manager.scan_history_range(format_timestamp(start), format_timestamp(now))
+        resolved = 0
+        while True:
+            chunk = list(islice(records, SCAN_RESOLVE_CHUNK))
+            if not chunk:
+                break
+            resolved += self._resolve(chunk)
+
+        self._scan_mark = now
+        return resolved
+
+    def _forget_cancelled(self):
+        # a cancelled future means the caller is no longer interested in the file
+        with self._lock:
+            for path in [path for path, pending in self._pending.items() if pending.future.cancelled()]:
+                del self._pending[path]
+
+    def _oldest_submit_time(self) -> datetime:
+        with self._lock:
+            return min((pending.submitted_at for pending in self._pending.values()), default=None)
+
+    def _resolve(self, records: Iterable[Dict[Text, Any]]) -> int:
+        resolved = []
+
+        with self._lock:
+            for record in records:
+                if record.get('status') not in TERMINAL_STATUSES:
+                    continue
+                pending = self._pending.pop(record.get('path'), None)
+                if pending is not None:
+                    resolved.append((pending.future, record))
+
+        # Complete the futures outside of the lock, callbacks may register more files. A future the caller
+        # cancelled is skipped, the others still resolve
+        for future, record in resolved:
+            if future.set_running_or_notify_cancel():
+                future.set_result(record)
+
+        return len(resolved)
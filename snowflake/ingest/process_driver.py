@@ -0,0 +1,135 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+process_driver - Spreads ingest requests over worker processes, so that encoding request bodies,
+decoding responses and signing tokens use more than the one core the GIL allows a single process
+"""
+
+from .ingest_client import IngestClient
+from .simple_ingest_manager import StagedFile
+from .utils.batching import iter_batches_by_pipe
+from .utils.batching import MAX_FILES_PER_REQUEST
+from .utils.batching import MAX_REQUEST_BYTES
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import get_context
+import os
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from typing import Any, Iterable, Iterator, List, Tuple, Union
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+# The outcome of one insertFiles request, error is None when it succeeded
+BatchResult = namedtuple('BatchResult', ['pipe', 'staged_files', 'response', 'error'])
+
+# The client of each worker process, created by the pool initializer
+_worker_client = None
+
+
+def _init_worker(account: Text, user: Text, private_key: Union[Text, bytes], client_kwargs):
+    global _worker_client
+    _worker_client = IngestClient(account, user, private_key, **client_kwargs)
+
+
+def _ingest_batch(pipe: Text, staged_files: List[StagedFile]) -> Any:
+    return _worker_client.pipe(pipe).ingest_files(staged_files)
+
+
+def _portable_private_key(private_key: Union[Text, bytes, Any]) -> Union[Text, bytes]:
+    """
+    Loaded key objects cannot be sent to other processes, they are passed on as unencrypted PKCS8 PEM instead
+    """
+    if isinstance(private_key, (str, bytes)):
+        return private_key
+
+    from cryptography.hazmat.primitives.serialization import Encoding
+    from cryptography.hazmat.primitives.serialization import PrivateFormat
+    from cryptography.hazmat.primitives.serialization import NoEncryption
+    return private_key.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption())
+
+
+class ProcessIngestDriver(object):
+    """
+    ProcessIngestDriver - partitions a stream of (pipe, StagedFile) pairs into per pipe insertFiles batches and
+    sends them from a pool of worker processes. Every worker keeps one IngestClient for its whole life, that is
+    one signed token and one connection pool shared by the pipes it serves. The results come back to the
+    calling process over the pool's result channel as the requests complete.
+    Workers are started with the spawn method by default, forking a process that runs threads is unsafe
+    """
+
+    def __init__(self, account: Text, user: Text, private_key: Union[Text, bytes, Any], processes: int = None,
+                 max_files: int = MAX_FILES_PER_REQUEST, max_bytes: int = MAX_REQUEST_BYTES,
+                 max_in_flight: int = None, mp_context: Any = None, **client_kwargs):
+        """
+        :param account: the name of the account who is loading
+        :param user: the name of the user who is loading
+        :param private_key: the private key tokens are signed with, PEM text or bytes or a loaded key object
+        :param processes: the number of worker processes, defaults to the number of CPUs
+        :param max_files: the maximum number of files per request
+        :param max_bytes: the maximum estimated payload size per request, None to only limit the file count
+        :param max_in_flight: the number of requests queued or running at once, defaults to twice the processes
+        :param mp_context: the multiprocessing context the workers are started with, defaults to spawn
+        :param client_kwargs: passed on to the IngestClient of every worker, e.g. host, retry_policy or
+                              private_key_passphrase. They must be picklable, so observers are not supported
+        """
+        self.processes = processes if processes is not None else os.cpu_count() or 1
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_in_flight = max_in_flight if max_in_flight is not None else 2 * self.processes
+        private_key = _portable_private_key(private_key)
+        self._executor = ProcessPoolExecutor(max_workers=self.processes,
+                                             mp_context=mp_context if mp_context is not None else get_context('spawn'),
+                                             initializer=_init_worker,
+                                             initargs=(account, user, private_key, client_kwargs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        close - waits for the running requests and stops the worker processes
+        """
+        self._executor.shutdown(wait=True)
+
+    def ingest(self, work: Iterable[Tuple[Text, StagedFile]],
+               return_exceptions: bool = False) -> Iterator[BatchResult]:
+        """
+        ingest - sends the files of any number of pipes, at most max_in_flight requests at a time. The stream is
+        consumed lazily, only the batches in flight and one partial batch per pipe are held in memory
+        :param work: any iterable or generator of (pipe name, StagedFile) pairs
+        :param return_exceptions: yield failed requests with their error instead of raising it. Otherwise
+                                  no more requests are sent after the first failure and the error is re-raised
+        :return: an iterator over the result of every request, in completion order
+        """
+        in_flight = {}  # future -> (pipe, staged files)
+
+        try:
+            for pipe, staged_files in iter_batches_by_pipe(work, max_files=self.max_files, max_bytes=self.max_bytes):
+                if len(in_flight) >= self.max_in_flight:
+                    yield from self._collect(in_flight, return_exceptions)
+                in_flight[self._executor.submit(_ingest_batch, pipe, staged_files)] = (pipe, staged_files)
+
+            while in_flight:
+                yield from self._collect(in_flight, return_exceptions)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    @staticmethod
+    def _collect(in_flight, return_exceptions: bool) -> Iterator[BatchResult]:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            pipe, staged_files = in_flight.pop(future)
+            error = future.exception()
+            if error is not None and not return_exceptions:
+                raise error
+            yield BatchResult(pipe, staged_files, future.result() if error is None else None, error)
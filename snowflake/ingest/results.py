@@ -0,0 +1,224 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+results - Compact typed views of insertFiles, insertReport and loadHistoryScan responses.
+They use __slots__ instead of one dict per record, intern the strings that repeat across
+records and parse timestamps only when they are read. Item access with the JSON keys,
+e.g. record['status'] or page.get('nextBeginMark'), keeps working as on the decoded dicts.
+Responses keep the top-level keys they do not map, so to_dict returns what was received.
+"""
+
+from .utils.history import parse_timestamp
+
+from datetime import datetime
+from sys import intern
+
+from typing import Dict, Any, List
+try:
+    from typing import Text
+except ImportError:
+    from typing_extensions import Text
+
+_MISSING = object()
+
+
+class _Result(object):
+    """
+    Base of the result classes, maps the JSON keys of the response onto the slots
+    """
+    __slots__ = ()
+    _KEYS = {}  # JSON key -> attribute name
+
+    def get(self, key: Text, default: Any = None) -> Any:
+        """
+        :param key: a JSON key of the response, e.g. lastInsertTime
+        :return: the value as it was in the response, default if the key is unknown or the value missing
+        """
+        attribute = self._KEYS.get(key)
+        if attribute is None:
+            # only the responses keep their unmapped keys, the file records have no _extra
+            extra = getattr(self, '_extra', None)
+            return extra.get(key, default) if extra else default
+        value = getattr(self, attribute)
+        return default if value is None else value
+
+    def __getitem__(self, key: Text) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: Text) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def to_dict(self) -> Dict[Text, Any]:
+        """
+        :return: the response as a plain dict, without the keys that were missing
+        """
+        result = {}
+        for key in self._KEYS:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                result[key] = [item.to_dict() for item in value] if key == 'files' else value
+        extra = getattr(self, '_extra', None)
+        if extra:
+            result.update(extra)
+        return result
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.to_dict())
+
+
+class IngestResponse(_Result):
+    """
+    IngestResponse - the response of an insertFiles request
+    """
+    __slots__ = ('request_id', 'response_code', '_extra')
+    _KEYS = {'requestId': 'request_id', 'responseCode': 'response_code'}
+
+    def __init__(self, request_id: Text = None, response_code: Text = None, extra: Dict[Text, Any] = None):
+        """
+        :param request_id: the request id the service echoed
+        :param response_code: e.g. SUCCESS
+        :param extra: any other top-level keys of the response
+        """
+        self.request_id = request_id
+        self.response_code = intern(response_code) if response_code is not None else None
+        self._extra = extra or None
+
+    @classmethod
+    def from_response(cls, response_body: Dict[Text, Any]) -> 'IngestResponse':
+        """
+        :param response_body: the decoded insertFiles response
+        """
+        return cls(response_body.get('requestId'), response_body.get('responseCode'),
+                   _unmapped(response_body, cls._KEYS))
+
+
+class FileLoadStatus(_Result):
+    """
+    FileLoadStatus - the load state of one file, a record of an insertReport or loadHistoryScan response.
+    The timestamps are kept as received and parsed into naive UTC datetimes on first access. Unknown
+    keys of the record are dropped
+    """
+    __slots__ = ('path', 'stage_location', 'file_size', '_time_received', '_last_insert_time', 'rows_inserted',
+                 'rows_parsed', 'errors_seen', 'error_limit', 'complete', 'status', 'first_error',
+                 'first_error_line_num', 'first_error_character_pos', 'first_error_column_name', 'system_error',
+                 '_parsed_time_received', '_parsed_last_insert_time')
+    _KEYS = {
+        'path': 'path',
+        'stageLocation': 'stage_location',
+        'fileSize': 'file_size',
+        'timeReceived': '_time_received',
+        'lastInsertTime': '_last_insert_time',
+        'rowsInserted': 'rows_inserted',
+        'rowsParsed': 'rows_parsed',
+        'errorsSeen': 'errors_seen',
+        'errorLimit': 'error_limit',
+        'complete': 'complete',
+        'status': 'status',
+        'firstError': 'first_error',
+        'firstErrorLineNum': 'first_error_line_num',
+        'firstErrorCharacterPos': 'first_error_character_pos',
+        'firstErrorColumnName': 'first_error_column_name',
+        'systemError': 'system_error',
+    }
+
+    @classmethod
+    def from_record(cls, record: Dict[Text, Any]) -> 'FileLoadStatus':
+        """
+        :param record: a decoded file record
+        """
+        self = cls.__new__(cls)
+        get = record.get
+        self.path = get('path')
+        stage_location = get('stageLocation')
+        self.stage_location = intern(stage_location) if stage_location is not None else None
+        self.file_size = get('fileSize')
+        # files submitted or loaded together share their timestamps, keep one copy of each
+        time_received = get('timeReceived')
+        self._time_received = intern(time_received) if time_received is not None else None
+        last_insert_time = get('lastInsertTime')
+        self._last_insert_time = intern(last_insert_time) if last_insert_time is not None else None
+        self.rows_inserted = get('rowsInserted')
+        self.rows_parsed = get('rowsParsed')
+        self.errors_seen = get('errorsSeen')
+        self.error_limit = get('errorLimit')
+        self.complete = get('complete')
+        status = get('status')
+        self.status = intern(status) if status is not None else None
+        self.first_error = get('firstError')
+        self.first_error_line_num = get('firstErrorLineNum')
+        self.first_error_character_pos = get('firstErrorCharacterPos')
+        self.first_error_column_name = get('firstErrorColumnName')
+        self.system_error = get('systemError')
+        self._parsed_time_received = None
+        self._parsed_last_insert_time = None
+        return self
+
+    # the parsed timestamps are cached next to the strings as received, which item access and to_dict return
+
+    @property
+    def time_received(self) -> datetime:
+        value = self._parsed_time_received
+        if value is None and self._time_received is not None:
+            value = self._parsed_time_received = parse_timestamp(self._time_received)
+        return value
+
+    @property
+    def last_insert_time(self) -> datetime:
+        value = self._parsed_last_insert_time
+        if value is None and self._last_insert_time is not None:
+            value = self._parsed_last_insert_time = parse_timestamp(self._last_insert_time)
+        return value
+
+
+class HistoryPage(_Result):
+    """
+    HistoryPage - an insertReport or loadHistoryScan response. The file records are turned into
+    FileLoadStatus objects the first time files is read
+    """
+    __slots__ = ('pipe', 'complete_result', 'next_begin_mark', 'start_time_inclusive', 'end_time_exclusive',
+                 'range_start_time', 'range_end_time', 'statistics', '_files', '_extra')
+    _KEYS = {
+        'pipe': 'pipe',
+        'completeResult': 'complete_result',
+        'nextBeginMark': 'next_begin_mark',
+        'startTimeInclusive': 'start_time_inclusive',
+        'endTimeExclusive': 'end_time_exclusive',
+        'rangeStartTime': 'range_start_time',
+        'rangeEndTime': 'range_end_time',
+        'statistics': 'statistics',
+        'files': 'files',
+    }
+
+    @classmethod
+    def from_response(cls, response_body: Dict[Text, Any]) -> 'HistoryPage':
+        """
+        :param response_body: the decoded insertReport or loadHistoryScan response
+        """
+        self = cls.__new__(cls)
+        get = response_body.get
+        self.pipe = get('pipe')
+        self.complete_result = get('completeResult')
+        self.next_begin_mark = get('nextBeginMark')
+        self.start_time_inclusive = get('startTimeInclusive')
+        self.end_time_exclusive = get('endTimeExclusive')
+        self.range_start_time = get('rangeStartTime')
+        self.range_end_time = get('rangeEndTime')
+        self.statistics = get('statistics')
+        self._files = get('files')
+        self._extra = _unmapped(response_body, cls._KEYS)
+        return self
+
+    @property
+    def files(self) -> List[FileLoadStatus]:
+        files = self._files
+        if files and not isinstance(files[0], FileLoadStatus):
+            files = self._files = [FileLoadStatus.from_record(record) for record in files]
+        return files
+
+
+def _unmapped(response_body: Dict[Text, Any], keys: Dict[Text, Text]) -> Dict[Text, Any]:
+    # the top-level keys of a response that have no slot, None when there are none
+    extra = {key: value for key, value in response_body.items() if key not in keys}
+    return extra or None
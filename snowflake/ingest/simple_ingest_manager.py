@@ -10,10 +10,33 @@ from .utils import SecurityManager
 # This will manage our URL generation
 from .utils import URLGenerator
 from .utils.network import SnowflakeRestful
+from .utils.network import DEFAULT_POOL_CONNECTIONS
+from .utils.network import DEFAULT_POOL_MAXSIZE
+from .utils.network import DEFAULT_CONNECT_TIMEOUT
+from .utils.network import DEFAULT_READ_TIMEOUT
+from .utils.retry import RetryPolicy
+from .utils.instrumentation import IngestObserver
+from .utils.log_sampling import LogSampler
+from .utils.batching import iter_batches
+from .utils.batching import MAX_FILES_PER_REQUEST
+from .utils.batching import MAX_REQUEST_BYTES
+from .utils.history import RecordDeduplicator
+from .utils.history import PollBackoff
+from .utils.history import DEFAULT_POLL_INTERVAL
+from .utils.history import DEFAULT_MAX_POLL_INTERVAL
+from .utils.history import DEFAULT_SEEN_CAPACITY
+from .utils.history import DEFAULT_SCAN_WINDOW
+from .utils.history import parse_timestamp
+from .utils.history import format_timestamp
+from .utils.history import split_time_range
 from .utils.uris import DEFAULT_HOST_FMT
 from .utils.uris import DEFAULT_PORT
 from .utils.uris import DEFAULT_SCHEME
 from .version import __version__
+from .results import IngestResponse
+from .results import HistoryPage
+from .error import IngestClientError
+from .errorcode import ERR_INCOMPLETE_HISTORY
 
 # We use a named tuple to represent remote files
 from collections import namedtuple
@@ -21,13 +44,20 @@ from collections import namedtuple
 # UUID for typing formation
 from uuid import UUID
 
+from collections import deque
+from datetime import datetime, timedelta
+
+# Used to send batches of files concurrently
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
 import sys
 import platform
+import time
 
-from logging import getLogger
+from logging import getLogger, DEBUG
 logger = getLogger(__name__)
 
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator, Callable, Union
 try:
     from typing import Text
 except ImportError:
@@ -62,22 +92,89 @@ class SimpleIngestManager(object):
     get a response *or* we successfully hear back from the server.
     """
 
-    def __init__(self, account: Text, user: Text, pipe: Text, private_key: Text,
-                 scheme: Text = DEFAULT_SCHEME, host: Text = None, port: int = DEFAULT_PORT):
+    def __init__(self, account: Text, user: Text, pipe: Text, private_key: Union[Text, bytes, Any],
+                 scheme: Text = DEFAULT_SCHEME, host: Text = None, port: int = DEFAULT_PORT,
+                 pool_connections: int = DEFAULT_POOL_CONNECTIONS, pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 restful: SnowflakeRestful = None, private_key_passphrase: bytes = None,
+                 retry_policy: RetryPolicy = None, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 observer: IngestObserver = None, request_log_sampler: LogSampler = None,
+                 typed_results: bool = False):
         """
         Simply instantiates all of our local state
         :param account: the name of the account who is loading
         :param user: the name of the user who is loading
         :param pipe: the name of the pipe which we want to use for ingesting
-        :param private_key: the private key we use for token signature
+        :param private_key: the private key we use for token signature, PEM text or bytes or a loaded key object
+        :param private_key_passphrase: the passphrase of an encrypted PEM private key
+        :param pool_connections: number of host connection pools to cache
+        :param pool_maxsize: maximum number of keep-alive connections per host
+        :param restful: an optional shared SnowflakeRestful, e.g. one pool for several managers of the
+                        same account host. The pool settings are ignored and close() leaves it open
+        :param retry_policy: how requests of this manager are retried, defaults to the policy of the restful
+        :param connect_timeout: seconds to wait for a connection to be established, None to wait forever
+        :param read_timeout: seconds to wait between bytes of the response, None to wait forever
+        :param observer: receives the request and token renewal events of this manager, the events of a shared
+                         restful go to the restful's own observer
+        :param request_log_sampler: thins out the per-request debug logs, None to log every request
+        :param typed_results: return IngestResponse and HistoryPage objects instead of the decoded dicts
         """
-        self.sec_manager = SecurityManager(account, user, private_key)  # Create the token generator
+        # Create the token generator
+        self.sec_manager = SecurityManager(account, user, private_key,
+                                           private_key_passphrase=private_key_passphrase,
+                                           observer=observer)
         self.url_engine = URLGenerator(scheme=scheme,
                                        host=host if host is not None else DEFAULT_HOST_FMT.format(account),
                                        port=port)
+        self._owns_restful = restful is None
+        self.restful = restful if restful is not None else SnowflakeRestful(pool_connections=pool_connections,
+                                                                            pool_maxsize=pool_maxsize,
+                                                                            connect_timeout=connect_timeout,
+                                                                            read_timeout=read_timeout,
+                                                                            observer=observer)
+        self._init_pipe_state(pipe, retry_policy, request_log_sampler, typed_results)
+
+    @classmethod
+    def from_shared(cls, pipe: Text, sec_manager: SecurityManager, url_engine: URLGenerator,
+                    restful: SnowflakeRestful, retry_policy: RetryPolicy = None,
+                    request_log_sampler: LogSampler = None, typed_results: bool = False) -> 'SimpleIngestManager':
+        """
+        from_shared - creates a manager for a pipe on top of the token, url and connection state of an existing
+        account identity, without parsing the key again or opening a pool of its own. close() leaves them open
+        :param pipe: the name of the pipe which we want to use for ingesting
+        :param sec_manager: the shared token generator
+        :param url_engine: the shared url generator of the account host
+        :param restful: the shared connection pool
+        :return: a manager as cheap as a handful of attributes
+        """
+        manager = cls.__new__(cls)
+        manager.sec_manager = sec_manager
+        manager.url_engine = url_engine
+        manager._owns_restful = False
+        manager.restful = restful
+        manager._init_pipe_state(pipe, retry_policy, request_log_sampler, typed_results)
+        return manager
+
+    def _init_pipe_state(self, pipe: Text, retry_policy: RetryPolicy, request_log_sampler: LogSampler,
+                         typed_results: bool):
         self.pipe = pipe
         self._next_begin_mark = None
-        self.restful = SnowflakeRestful()
+        self.retry_policy = retry_policy
+        self.request_log_sampler = request_log_sampler
+        self.typed_results = typed_results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        close - releases the pooled connections of this manager, unless the pool was shared with us
+        """
+        if self._owns_restful:
+            self.restful.close()
 
     def _get_auth_header(self) -> Dict[Text, Text]:
         """
@@ -95,6 +192,15 @@ class SimpleIngestManager(object):
         """
         return {USER_AGENT_HEADER: SNOWPIPE_SDK_USER_AGENT}
 
+    def _should_log_request(self) -> bool:
+        """
+        _should_log_request - checks once per request whether its debug lines are emitted, so that neither
+        the log records nor their arguments are built when they would be dropped anyway
+        :return: whether to log the current request
+        """
+        return logger.isEnabledFor(DEBUG) and \
+            (self.request_log_sampler is None or self.request_log_sampler.should_log())
+
     def _get_headers(self) -> Dict[Text, Text]:
         """
         _get_headers - get all required SDK headers to be sent to the service
@@ -104,53 +210,167 @@ class SimpleIngestManager(object):
         headers.update(self._get_user_agent_header())
         return headers
 
-    def ingest_files(self, staged_files: [StagedFile], request_id: UUID = None) -> Dict[Text, Any]:
+    def ingest_files(self, staged_files: [StagedFile], request_id: UUID = None,
+                     retry_policy: RetryPolicy = None, deadline: float = None) -> Dict[Text, Any]:
         """
         ingest_files - Informs Snowflake about the files to be ingested into a table through this pipe
         :param staged_files: a list of files we want to ingest
         :param request_id: an optional request uuid to label this request
+        :param retry_policy: overrides the retry policy for this call
+        :param deadline: seconds the call may take, retries included, None for no deadline
         :return: the deserialized response from the service
         """
         # Generate the target url
         target_url = self.url_engine.make_ingest_url(self.pipe, request_id)
-        logger.info('Ingest file request url: %s', target_url)
+        log_request = self._should_log_request()
+        if log_request:
+            logger.debug('Ingest file request url: %s', target_url)
 
-        # Make our message payload
-        payload = {
-            "files": [x._asdict() for x in staged_files]
-        }
+        # Encode the files straight into the request body
+        data = self.restful.codec.encode_files(staged_files)
 
         # Send our request!
         headers = self._get_headers()
-        response_body = self.restful.post(target_url, json=payload, headers=headers)
-        logger.debug('Ingest response: %s', str(response_body))
+        response_body = self.restful.post(target_url, data=data, headers=headers,
+                                          retry_policy=retry_policy or self.retry_policy, deadline=deadline)
+        if log_request:
+            logger.debug('Ingest response: %s', response_body)
 
-        return response_body
+        return IngestResponse.from_response(response_body) if self.typed_results else response_body
+
+    def ingest_files_in_batches(self, staged_files: Iterable[StagedFile],
+                                max_files: int = MAX_FILES_PER_REQUEST, max_bytes: int = MAX_REQUEST_BYTES,
+                                max_workers: int = 1) -> Dict[Text, Dict[Text, Any]]:
+        """
+        ingest_files_in_batches - Informs Snowflake about an arbitrarily long stream of files by splitting it
+        into as many insertFiles requests as needed. At most max_workers requests are in flight at once and
+        only those batches are held in memory. Stops submitting batches and re-raises on the first failure.
+        :param staged_files: any iterable or generator of files we want to ingest
+        :param max_files: the maximum number of files per request
+        :param max_bytes: the maximum estimated payload size per request, None to only limit the file count
+        :param max_workers: the number of requests sent concurrently
+        :return: a mapping from each file path to the deserialized response of the request that carried it
+        """
+        results = {}
+
+        def record(batch, response_body):
+            for staged_file in batch:
+                results[staged_file.path] = response_body
+
+        batches = iter_batches(staged_files, max_files=max_files, max_bytes=max_bytes)
+
+        if max_workers <= 1:
+            for batch in batches:
+                record(batch, self.ingest_files(batch))
+            return results
 
-    def get_history(self, recent_seconds: int = None, request_id: UUID = None) -> Dict[Text, Any]:
+        def collect(done):
+            for future in done:
+                record(*future.result())
+
+        def send(batch):
+            return batch, self.ingest_files(batch)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            in_flight = set()
+            try:
+                for batch in batches:
+                    if len(in_flight) >= max_workers:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    in_flight.add(executor.submit(send, batch))
+
+                collect(wait(in_flight)[0])
+            except BaseException:
+                for future in in_flight:
+                    future.cancel()
+                raise
+
+        return results
+
+    def get_history(self, recent_seconds: int = None, request_id: UUID = None,
+                    retry_policy: RetryPolicy = None, deadline: float = None) -> Dict[Text, Any]:
         """
         get_history - returns the currently cached ingest history from the service
         :param request_id: an optional request UUID to label this
         :param recent_seconds: an optional argument that specify the time range that history can be seen
+        :param retry_policy: overrides the retry policy for this call
+        :param deadline: seconds the call may take, retries included, None for no deadline
+        :return: the deserialized response from the service
+        """
+        response_body = self._get_history(recent_seconds, self._next_begin_mark, request_id, retry_policy,
+                                          deadline)
+
+        self._next_begin_mark = response_body['nextBeginMark']
+
+        return response_body
+
+    def _get_history(self, recent_seconds: int = None, begin_mark: Text = None,
+                     request_id: UUID = None, retry_policy: RetryPolicy = None,
+            deadline: float = None) -> Dict[Text, Any]:
+        """
+        _get_history - fetches one insertReport page from the given cursor, without touching the manager's cursor
+        :param recent_seconds: an optional argument that specify the time range that history can be seen
+        :param begin_mark: the nextBeginMark of a previous page, None to start from the oldest cached record
+        :param request_id: an optional request UUID to label this
+        :param retry_policy: overrides the retry policy for this call
+        :param deadline: seconds the call may take, retries included, None for no deadline
         :return: the deserialized response from the service
         """
         # generate our history endpoint url
-        target_url = self.url_engine.make_history_url(self.pipe, recent_seconds, self._next_begin_mark, request_id)
-        logger.info('Get history request url: %s', target_url)
+        target_url = self.url_engine.make_history_url(self.pipe, recent_seconds, begin_mark, request_id)
+        if self._should_log_request():
+            logger.debug('Get history request url: %s', target_url)
 
         # Send out our request!
         headers = self._get_headers()
-        response_body = self.restful.get(target_url, headers=headers)
+        response_body = self.restful.get(target_url, headers=headers, retry_policy=retry_policy or self.retry_policy,
+                                         deadline=deadline)
 
-        self._next_begin_mark = response_body['nextBeginMark']
-        
-        return response_body
+        return HistoryPage.from_response(response_body) if self.typed_results else response_body
+
+    def iter_history(self, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                     stop_when: Callable[[], bool] = None, recent_seconds: int = None,
+                     max_poll_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+                     seen_capacity: int = DEFAULT_SEEN_CAPACITY) -> Iterator[Dict[Text, Any]]:
+        """
+        iter_history - streams the ingest history one file record at a time by following nextBeginMark.
+        The generator keeps its own cursor, so several can run next to get_history or each other. Records
+        already yielded are dropped and the poll interval doubles, up to max_poll_interval, while polls
+        come back with nothing new.
+        :param poll_interval: the number of seconds between polls that return new records
+        :param stop_when: an optional callable checked before every poll, the generator ends once it returns True
+        :param recent_seconds: an optional argument that specify the time range that history can be seen
+        :param max_poll_interval: the upper bound of the poll interval
+        :param seen_capacity: the number of recent records remembered to drop duplicates
+        :return: an iterator over the file records of the history
+        """
+        begin_mark = None
+        deduplicator = RecordDeduplicator(seen_capacity)
+        backoff = PollBackoff(poll_interval, max_poll_interval)
+
+        while stop_when is None or not stop_when():
+            response_body = self._get_history(recent_seconds, begin_mark)
+            begin_mark = response_body.get('nextBeginMark', begin_mark)
+
+            found_new = False
+            for record in response_body.get('files', ()):
+                if deduplicator.is_new(record):
+                    found_new = True
+                    yield record
+
+            if stop_when is not None and stop_when():
+                return
+            time.sleep(backoff.next_sleep_time(found_new))
 
     def get_history_range(self, start_time_inclusive: Text, end_time_exclusive: Text = None,
-            request_id: UUID = None) -> Dict[Text, Any]:
+            request_id: UUID = None, retry_policy: RetryPolicy = None,
+            deadline: float = None) -> Dict[Text, Any]:
         """
         get_history_range - returns the ingest history between two points in time
         :param request_id: an optional request UUID to label this
+        :param retry_policy: overrides the retry policy for this call
+        :param deadline: seconds the call may take, retries included, None for no deadline
         :param start_time_inclusive: Timestamp in ISO-8601 format. Start of the time range to retrieve load history data.
         :param end_time_exclusive: Timestamp in ISO-8601 format. End of the time range to retrieve load history data.
                                     If omitted, then CURRENT_TIMESTAMP() is used as the end of the range.
@@ -158,11 +378,82 @@ class SimpleIngestManager(object):
         """
         # generate our history endpoint url
         target_url = self.url_engine.make_history_range_url(self.pipe, start_time_inclusive, end_time_exclusive, request_id)
-        logger.info('Get history range request url: %s', target_url)
+        if self._should_log_request():
+            logger.debug('Get history range request url: %s', target_url)
 
         # Send out our request!
         headers = self._get_headers()
-        response = self.restful.get(target_url, headers=headers)
+        response = self.restful.get(target_url, headers=headers, retry_policy=retry_policy or self.retry_policy,
+                                    deadline=deadline)
+
+        return HistoryPage.from_response(response) if self.typed_results else response
+
+    def scan_history_range(self, start_time_inclusive: Text, end_time_exclusive: Text = None,
+                           window: timedelta = DEFAULT_SCAN_WINDOW, max_workers: int = 4,
+                           window_retries: int = 2) -> Iterator[Dict[Text, Any]]:
+        """
+        scan_history_range - streams the ingest history between two points in time. The range is split into
+        windows that are fetched concurrently with loadHistoryScan, a failed window is retried on its own. A window
+        whose response is incomplete is fetched again from the rangeEndTime of the response until it is complete.
+        Records come out in time order without duplicates, and at most max_workers windows are held in memory.
+        :param start_time_inclusive: Timestamp in ISO-8601 format. Start of the time range to retrieve load history data.
+        :param end_time_exclusive: Timestamp in ISO-8601 format. End of the time range to retrieve load history data.
+                                    If omitted, then the current time is used as the end of the range.
+        :param window: the length of the time range fetched by one loadHistoryScan request
+        :param max_workers: the number of windows fetched concurrently
+        :param window_retries: how many times a failed window is fetched again before giving up
+        :return: an iterator over the file records of the history
+        """
+        start = parse_timestamp(start_time_inclusive)
+        end = parse_timestamp(end_time_exclusive) if end_time_exclusive is not None else datetime.utcnow()
+        deduplicator = RecordDeduplicator()
+
+        def fetch_page(page_start, window_end):
+            attempt = 0
+            while True:
+                try:
+                    return self.get_history_range(format_timestamp(page_start), format_timestamp(window_end))
+                except Exception as e:
+                    if attempt >= window_retries:
+                        raise
+                    attempt += 1
+                    logger.warning('Retrying history window %s - %s after error: %s', page_start, window_end, e)
+
+        def fetch(window_start, window_end):
+            # one response holds a limited number of records, the rest of the window starts at its rangeEndTime
+            records = []
+            page_start = window_start
+            while True:
+                response_body = fetch_page(page_start, window_end)
+                records.extend(response_body.get('files', ()))
+                if response_body.get('completeResult', True):
+                    break
+
+                range_end_time = response_body.get('rangeEndTime')
+                next_start = parse_timestamp(range_end_time) if range_end_time is not None else None
+                if next_start is None or next_start <= page_start:
+                    raise IngestClientError(code=ERR_INCOMPLETE_HISTORY,
+                                            message='The load history from {} to {} is incomplete and cannot be '
+                                                    'paged further'.format(format_timestamp(page_start),
+                                                                           format_timestamp(window_end)))
+                page_start = next_start
+
+            # the records at the page boundaries repeat, new_records drops them
+            return sorted(records, key=lambda record: record.get('lastInsertTime') or '')
+
+        def new_records(future):
+            return (record for record in future.result() if deduplicator.is_new(record))
 
-        return response
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            in_flight = deque()
+            try:
+                for window_start, window_end in split_time_range(start, end, window):
+                    in_flight.append(executor.submit(fetch, window_start, window_end))
+                    if len(in_flight) >= max_workers:
+                        yield from new_records(in_flight.popleft())
 
+                while in_flight:
+                    yield from new_records(in_flight.popleft())
+            finally:
+                for future in in_flight:
+                    future.cancel()
@@ -0,0 +1,110 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+stage_scanner - Discovers the files of a stage by listing its directories concurrently and streams
+them as StagedFile objects with their sizes. The stream feeds straight into batched ingest requests,
+so listing the stage and submitting the files overlap:
+
+    files = scan_stage(LocalDirectoryLister('/mnt/landing'), 'events/')
+    manager.ingest_files_in_batches(files, max_workers=4)
+"""
+
+from .simple_ingest_manager import StagedFile
+
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import os
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from typing import Callable, Iterator, List, Tuple
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+# default number of directories listed at once
+DEFAULT_LIST_WORKERS = 8
+
+
+class StageLister(ABC):
+    """
+    StageLister - lists one directory of a stage at a time. Subclasses adapt a storage layout, e.g. an object
+    store listed with a delimiter, where each common prefix is a directory. Must be safe to call from
+    several threads at once
+    """
+
+    @abstractmethod
+    def list_dir(self, prefix: Text) -> Tuple[List[Text], List[StagedFile]]:
+        """
+        list_dir - lists the direct children of a directory
+        :param prefix: the directory relative to the stage location, '' for the stage root, otherwise ending in '/'
+        :return: the prefixes of the subdirectories and the files, with paths relative to the stage location
+        """
+
+
+class LocalDirectoryLister(StageLister):
+    """
+    LocalDirectoryLister - lists a local directory tree, e.g. a mounted bucket or the staging area of a test
+    """
+
+    def __init__(self, root: Text, sizes: bool = True, follow_symlinks: bool = False):
+        """
+        :param root: the directory the stage location points at
+        :param sizes: whether to stat every file for its size, otherwise the sizes are None
+        :param follow_symlinks: whether symbolic links to directories are descended into
+        """
+        self.root = root
+        self.sizes = sizes
+        self.follow_symlinks = follow_symlinks
+
+    def list_dir(self, prefix: Text) -> Tuple[List[Text], List[StagedFile]]:
+        sub_prefixes = []
+        staged_files = []
+
+        with os.scandir(os.path.join(self.root, prefix)) as entries:
+            for entry in entries:
+                path = prefix + entry.name
+                if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                    sub_prefixes.append(path + '/')
+                elif entry.is_file():
+                    size = entry.stat().st_size if self.sizes else None
+                    staged_files.append(StagedFile(path, size))
+
+        return sub_prefixes, staged_files
+
+
+def scan_stage(lister: StageLister, prefix: Text = '', max_workers: int = DEFAULT_LIST_WORKERS,
+               include: Callable[[Text], bool] = None) -> Iterator[StagedFile]:
+    """
+    scan_stage - lazily walks a stage, listing up to max_workers directories at a time. The files of each
+    directory are yielded as soon as its listing completes, in no particular order across directories.
+    While the caller works on them the next directories are already being listed
+    :param lister: lists the directories, e.g. a LocalDirectoryLister
+    :param prefix: the directory to start from, '' for the whole stage
+    :param max_workers: the number of directories listed concurrently
+    :param include: an optional filter on the file paths, e.g. lambda path: path.endswith('.parquet')
+    :return: an iterator over the files below prefix
+    """
+    pending = deque([prefix])
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='StageScan') as executor:
+        in_flight = set()
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < max_workers:
+                    in_flight.add(executor.submit(lister.list_dir, pending.popleft()))
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    sub_prefixes, staged_files = future.result()
+                    pending.extend(sub_prefixes)
+                    for staged_file in staged_files:
+                        if include is None or include(staged_file.path):
+                            yield staged_file
+        finally:
+            # the caller stopped early or a listing failed, drop the listings that did not start yet
+            for future in in_flight:
+                future.cancel()
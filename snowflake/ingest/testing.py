@@ -0,0 +1,325 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+testing - An in-process stand-in for the Snowpipe REST api, to test and benchmark the client without
+a Snowflake account. It serves insertFiles, insertReport and loadHistoryScan over plain http on a local
+port, keeps the history of every pipe in memory and pages insertReport with nextBeginMark. Latency,
+5xx and 429 responses can be injected to exercise the retry path.
+
+    with MockSnowpipeServer(throttle_rate=0.1) as server:
+        manager = server.make_manager('DB.SCHEMA.PIPE', private_key)
+        manager.ingest_files([StagedFile('data/file.csv.gz', 1024)])
+"""
+
+from .simple_ingest_manager import SimpleIngestManager
+from .utils.history import format_timestamp
+from .utils.history import parse_timestamp
+from .utils.uris import REQUEST_ID_PARAMETER
+from .utils.uris import RECENT_HISTORY_IN_SECONDS_PARAMETER
+from .utils.uris import HISTORY_BEGIN_MARK
+from .utils.uris import HISTORY_RANGE_START_INCLUSIVE
+from .utils.uris import HISTORY_RANGE_END_EXCLUSIVE
+
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl, unquote
+import gzip
+import json
+import random
+import re
+import threading
+import time
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from typing import Dict, Any, List, Tuple, Union, Callable
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+# the most file records returned by one insertReport or loadHistoryScan response, as the service does
+DEFAULT_PAGE_SIZE = 10000
+
+# matches /v1/data/pipes/{pipe}/{endpoint}, see the endpoint formats in utils/uris.py
+PIPE_ENDPOINT_REGEX = re.compile(r'^/v1/data/pipes/([^/]+)/(insertFiles|insertReport|loadHistoryScan)$')
+
+ENDPOINT_METHODS = {'insertFiles': 'POST', 'insertReport': 'GET', 'loadHistoryScan': 'GET'}
+
+
+class _MockSnowpipeHandler(BaseHTTPRequestHandler):
+    """
+    Reads the request, lets the MockSnowpipeServer answer it and writes the json response
+    """
+    server_version = 'MockSnowpipe/1.0'
+    # keep connections alive so that the client's pooled connections are reused as against the service
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes, without this each response waits for a delayed ack
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method: Text):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if body and self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+
+        status, payload, headers = self.server.mock.handle_request(method, self.path, self.headers, body)
+
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+
+class MockSnowpipeServer(object):
+    """
+    MockSnowpipeServer - answers the Snowpipe REST requests of SimpleIngestManager from a background
+    thread. Every staged file is recorded as loaded the moment insertFiles accepts it. Tokens are not
+    verified, a Bearer authorization header is enough
+    """
+
+    def __init__(self, latency: Union[float, Callable[[], float]] = 0, error_rate: float = 0,
+                 error_status: int = 503, throttle_rate: float = 0, retry_after: int = None,
+                 page_size: int = DEFAULT_PAGE_SIZE, seed: int = None, host: Text = '127.0.0.1', port: int = 0):
+        """
+        :param latency: seconds every response is delayed by, or a callable returning them per request
+        :param error_rate: fraction of the requests answered with error_status
+        :param error_status: the status code of the injected server errors
+        :param throttle_rate: fraction of the requests answered with 429 Too Many Requests
+        :param retry_after: the Retry-After seconds sent along with injected 429 responses, None to leave it out
+        :param page_size: the most file records returned per insertReport or loadHistoryScan response
+        :param seed: seeds the choice of the requests that fail, for reproducible runs
+        :param host: the address to listen on
+        :param port: the port to listen on, 0 picks a free one
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.page_size = page_size
+        self.host = host
+        self._port = port
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._history = defaultdict(list)  # pipe -> file records in the order they were received
+        self._last_insert_time = datetime.min  # lastInsertTime of the most recent record
+        self._scripted_failures = deque()  # statuses the next requests are answered with
+        self.request_counts = defaultdict(int)  # endpoint -> requests received, failed ones included
+        self.injected_failures = defaultdict(int)  # status -> number of injected failures
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def port(self) -> int:
+        return self._server.server_port if self._server is not None else self._port
+
+    def start(self) -> 'MockSnowpipeServer':
+        """
+        start - binds the port and serves requests from a daemon thread
+        :return: the server itself
+        """
+        if self._server is None:
+            self._server = ThreadingHTTPServer((self.host, self._port), _MockSnowpipeHandler)
+            self._server.daemon_threads = True
+            self._server.mock = self
+            self._thread = threading.Thread(target=self._server.serve_forever, name='MockSnowpipeServer',
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        stop - stops serving and closes the port
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+    def make_manager(self, pipe: Text, private_key: Union[Text, bytes, Any], account: Text = 'testaccount',
+                     user: Text = 'testuser', **kwargs) -> SimpleIngestManager:
+        """
+        make_manager - creates a SimpleIngestManager that sends its requests to this server
+        :param pipe: the fully qualified name of the pipe
+        :param private_key: the private key tokens are signed with
+        :param kwargs: any other SimpleIngestManager argument, e.g. restful or retry_policy
+        """
+        return SimpleIngestManager(account, user, pipe, private_key, scheme='http', host=self.host,
+                                   port=self.port, **kwargs)
+
+    def fail_next(self, status: int, count: int = 1):
+        """
+        fail_next - answers the next count requests with status, ahead of the random failures
+        """
+        with self._lock:
+            self._scripted_failures.extend([status] * count)
+
+    def history(self, pipe: Text) -> List[Dict[Text, Any]]:
+        """
+        :return: a copy of the file records of the pipe, oldest first
+        """
+        with self._lock:
+            return list(self._history[pipe])
+
+    def reset(self):
+        """
+        reset - forgets the history of every pipe, the counters and the pending scripted failures
+        """
+        with self._lock:
+            self._history.clear()
+            self._last_insert_time = datetime.min
+            self._scripted_failures.clear()
+            self.request_counts.clear()
+            self.injected_failures.clear()
+
+    def handle_request(self, method: Text, path: Text, headers: Any,
+                       body: bytes) -> Tuple[int, Dict[Text, Any], Dict[Text, Text]]:
+        """
+        handle_request - answers one request, called from the server threads
+        :param method: the http method
+        :param path: the request path including the query string
+        :param headers: the request headers
+        :param body: the request body, decompressed
+        :return: the status code, the json payload and any extra response headers
+        """
+        latency = self.latency() if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+
+        url = urlsplit(path)
+        match = PIPE_ENDPOINT_REGEX.match(url.path)
+        if match is None:
+            return 404, _error_body(404, 'Unknown endpoint {}'.format(url.path)), {}
+        pipe, endpoint = unquote(match.group(1)), match.group(2)
+
+        with self._lock:
+            self.request_counts[endpoint] += 1
+        if method != ENDPOINT_METHODS[endpoint]:
+            return 405, _error_body(405, 'Method {} is not allowed'.format(method)), {}
+        if not (headers.get('Authorization') or '').startswith('Bearer '):
+            return 401, _error_body(390144, 'JWT token is invalid.'), {}
+
+        status = self._next_failure()
+        if status is not None:
+            response_headers = {}
+            if status == 429 and self.retry_after is not None:
+                response_headers['Retry-After'] = str(self.retry_after)
+            return status, _error_body(status, 'Injected failure'), response_headers
+
+        query = dict(parse_qsl(url.query))
+        try:
+            if endpoint == 'insertFiles':
+                return 200, self._insert_files(pipe, query, json.loads(body)), {}
+            elif endpoint == 'insertReport':
+                return 200, self._insert_report(pipe, query), {}
+            return 200, self._load_history_scan(pipe, query), {}
+        except (ValueError, TypeError, KeyError) as e:
+            return 400, _error_body(400, 'Bad request: {}'.format(e)), {}
+
+    def _next_failure(self) -> int:
+        with self._lock:
+            if self._scripted_failures:
+                status = self._scripted_failures.popleft()
+            else:
+                draw = self._rng.random()
+                if draw < self.throttle_rate:
+                    status = 429
+                elif draw < self.throttle_rate + self.error_rate:
+                    status = self.error_status
+                else:
+                    return None
+            self.injected_failures[status] += 1
+            return status
+
+    def _insert_files(self, pipe: Text, query: Dict[Text, Text], body: Dict[Text, Any]) -> Dict[Text, Any]:
+        now = datetime.utcnow()
+        staged_files = body['files']
+
+        with self._lock:
+            # the service loads the files one by one, every record gets its own lastInsertTime a millisecond
+            # apart, so that loadHistoryScan can be paged by time
+            insert_time = max(now - timedelta(milliseconds=len(staged_files) - 1),
+                              self._last_insert_time + timedelta(milliseconds=1))
+            records = []
+            for staged_file in staged_files:
+                records.append({
+                    'path': staged_file['path'],
+                    'stageLocation': 'mock://{}/'.format(pipe),
+                    'fileSize': staged_file.get('size'),
+                    'timeReceived': format_timestamp(now),
+                    'lastInsertTime': format_timestamp(insert_time),
+                    'rowsInserted': 1,
+                    'rowsParsed': 1,
+                    'errorsSeen': 0,
+                    'errorLimit': 1,
+                    'complete': True,
+                    'status': 'LOADED',
+                })
+                self._last_insert_time = insert_time
+                insert_time += timedelta(milliseconds=1)
+            self._history[pipe].extend(records)
+        return {'requestId': query.get(REQUEST_ID_PARAMETER), 'responseCode': 'SUCCESS'}
+
+    def _insert_report(self, pipe: Text, query: Dict[Text, Text]) -> Dict[Text, Any]:
+        # the mark is the position in the pipe's history right after the last record returned
+        begin = int(query.get(HISTORY_BEGIN_MARK, 0))
+        recent_seconds = query.get(RECENT_HISTORY_IN_SECONDS_PARAMETER)
+        oldest = None
+        if recent_seconds is not None:
+            oldest = format_timestamp(datetime.utcnow() - timedelta(seconds=int(recent_seconds)))
+
+        with self._lock:
+            page = self._history[pipe][begin:begin + self.page_size]
+        files = [record for record in page if oldest is None or record['timeReceived'] >= oldest]
+
+        return {
+            'pipe': pipe,
+            'completeResult': True,
+            'nextBeginMark': str(begin + len(page)),
+            'files': files,
+        }
+
+    def _load_history_scan(self, pipe: Text, query: Dict[Text, Text]) -> Dict[Text, Any]:
+        start = format_timestamp(parse_timestamp(query[HISTORY_RANGE_START_INCLUSIVE]))
+        end = query.get(HISTORY_RANGE_END_EXCLUSIVE)
+        end = format_timestamp(parse_timestamp(end)) if end is not None else None
+
+        with self._lock:
+            files = [record for record in self._history[pipe]
+                     if record['lastInsertTime'] >= start and (end is None or record['lastInsertTime'] < end)]
+        complete = len(files) <= self.page_size
+        files = files[:self.page_size]
+
+        response = {'pipe': pipe, 'completeResult': complete, 'files': files}
+        if files:
+            response['rangeStartTime'] = files[0]['lastInsertTime']
+            response['rangeEndTime'] = files[-1]['lastInsertTime']
+        return response
+
+
+def _error_body(code: int, message: Text) -> Dict[Text, Any]:
+    return {'code': str(code), 'success': False, 'message': message, 'data': None}
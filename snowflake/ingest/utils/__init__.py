@@ -1,5 +1,11 @@
 from .tokentools import SecurityManager
 from .uris import URLGenerator
+from .retry import RetryPolicy
+from .resilience import CircuitBreaker
+from .resilience import AdaptiveConcurrencyLimiter
+from .instrumentation import IngestObserver
+from .instrumentation import InMemoryMetricsCollector
 
-# Forward the Security Manager and URLGenerator
-__all__ = [SecurityManager, URLGenerator]
\ No newline at end of file
+# Forward the Security Manager, URLGenerator, RetryPolicy, the per host request guards and the observers
+__all__ = [SecurityManager, URLGenerator, RetryPolicy, CircuitBreaker, AdaptiveConcurrencyLimiter,
+           IngestObserver, InMemoryMetricsCollector]
@@ -0,0 +1,255 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+async_network.py - asyncio counterpart of network.py, built on aiohttp
+"""
+
+import asyncio
+import time
+from functools import lru_cache, partial
+from .network import DEFAULT_POOL_MAXSIZE
+from .network import DEFAULT_CONNECT_TIMEOUT
+from .network import DEFAULT_READ_TIMEOUT
+from .network import SnowflakeRestful
+from .network import CONTENT_TYPE_HEADER
+from .network import DEFAULT_COMPRESS_LEVEL
+from .network import compress_body
+from .codec import JsonCodec
+from .codec import JSON_CONTENT_TYPE
+from .codec import get_codec
+from .retry import RetryPolicy
+from .retry import DEFAULT_RETRY_POLICY
+from .retry import Deadline
+from .instrumentation import IngestObserver
+from .instrumentation import NULL_OBSERVER
+from .instrumentation import endpoint_name
+from ..error import IngestResponseError
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from typing import Dict, Any, Callable, Optional, TYPE_CHECKING
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# seconds an idle pooled connection is kept open
+DEFAULT_KEEPALIVE_TIMEOUT = 15
+
+
+@lru_cache(maxsize=None)
+def ocsp_connector_factory() -> Optional[Callable[..., 'aiohttp.TCPConnector']]:
+    """
+    Looks up the aiohttp connector of the python connector, which checks the certificate of every new TLS
+    connection with OCSP. The async counterpart of inject_ocsp_check, that only covers requests. Runs once per process
+    :return: a callable taking the arguments of aiohttp.TCPConnector, None when the check is not available
+    """
+    try:
+        from snowflake.connector.aio._session_manager import SessionManagerFactory
+        from snowflake.connector.aio._session_manager import SnowflakeSSLConnector
+        from snowflake.connector.constants import OCSPMode
+    except ImportError:
+        logger.warning('snowflake-connector-python with asyncio support is not installed, '
+                       'certificates are not checked with OCSP')
+        return None
+    # fail open, like the connector does by default
+    return partial(SnowflakeSSLConnector, snowflake_ocsp_mode=OCSPMode.FAIL_OPEN,
+                   session_manager=SessionManagerFactory.get_manager())
+
+
+class _BufferedResponse(object):
+    """
+        A fully read aiohttp response exposing the parts of requests.Response that
+        IngestResponseError relies on
+    """
+    def __init__(self, status_code: int, reason: Text, headers: Dict[Text, Text], body: bytes, codec: JsonCodec):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = body
+        self._codec = codec
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self) -> Dict[Text, Any]:
+        return self._codec.loads(self.content)
+
+
+class AsyncSnowflakeRestful(object):
+    """
+        A simple wrapper over aiohttp to handle retry without blocking the event loop.
+        Owns one pooled, keep-alive client session that is created on first use.
+    """
+    def __init__(self, pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT, retry_policy: RetryPolicy = None,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 observer: IngestObserver = None, codec: JsonCodec = None, compress_threshold: int = None,
+                 compress_level: int = DEFAULT_COMPRESS_LEVEL, ocsp_check: bool = True):
+        """
+        :param pool_maxsize: maximum number of connections kept alive per host
+        :param keepalive_timeout: seconds an idle connection is kept in the pool
+        :param retry_policy: the retry policy of requests that do not bring their own
+        :param connect_timeout: seconds to wait for a connection to be established, None to wait forever
+        :param read_timeout: seconds to wait between bytes of the response, None to wait forever
+        :param observer: receives the request, retry and decode events, e.g. an InMemoryMetricsCollector
+        :param codec: encodes request and decodes response bodies, defaults to the fastest json library installed
+        :param compress_threshold: gzip request bodies of at least this many bytes, None to send them as they are
+        :param compress_level: the gzip compression level of request bodies
+        :param ocsp_check: whether new TLS connections are checked with the python connector's OCSP check, it is
+                           skipped with a warning when the connector is not installed
+        """
+        # aiohttp is imported here rather than at module level, importing snowflake.ingest does not pay for it
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError('AsyncSnowflakeRestful requires aiohttp, '
+                              'install it with "pip install snowflake-ingest[async]"')
+        self._aiohttp = aiohttp
+        self.pool_maxsize = pool_maxsize
+        self.keepalive_timeout = keepalive_timeout
+        self.retry_policy = retry_policy if retry_policy is not None else DEFAULT_RETRY_POLICY
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.observer = observer if observer is not None else NULL_OBSERVER
+        self.codec = codec if codec is not None else get_codec()
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.ocsp_check = ocsp_check
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes the client session and its pooled connections
+        """
+        if self._session is not None:
+            session, self._session = self._session, None
+            await session.close()
+
+    def _get_session(self) -> 'aiohttp.ClientSession':
+        if self._session is None or self._session.closed:
+            make_connector = ocsp_connector_factory() if self.ocsp_check else None
+            if make_connector is None:
+                make_connector = self._aiohttp.TCPConnector
+            connector = make_connector(limit_per_host=self.pool_maxsize, keepalive_timeout=self.keepalive_timeout)
+            self._session = self._aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def post(self, url: Text, json: Dict = None, headers: Dict = None, retry_policy: RetryPolicy = None,
+                   idempotent: bool = False, deadline: float = None, data: bytes = None) -> Dict[Text, Any]:
+        """
+        Http POST request
+        :param url: request url,
+        :param json: post request body, encoded with the codec
+        :param data: post request body already encoded as JSON, e.g. by codec.encode_files, instead of json
+        :param headers: request headers, authentication etc
+        :param retry_policy: overrides the retry policy for this request
+        :param idempotent: whether the request is safe to send twice
+        :param deadline: seconds the request may take, retries included, None for no deadline
+        :return: response payload
+        """
+        return await self._exec_request_with_retry(url=url, method='POST', json=json, data=data, headers=headers,
+                                                   retry_policy=retry_policy, idempotent=idempotent,
+                                                   deadline=deadline)
+
+    async def get(self, url: Text, headers: Dict, retry_policy: RetryPolicy = None,
+                  deadline: float = None) -> Dict[Text, Any]:
+        """
+        Http GET request
+        :param url: request url
+        :param headers: request headers, authentication etc
+        :param retry_policy: overrides the retry policy for this request
+        :param deadline: seconds the request may take, retries included, None for no deadline
+        :return: response payload
+        """
+        return await self._exec_request_with_retry(url=url, method='GET', headers=headers,
+                                                   retry_policy=retry_policy, idempotent=True, deadline=deadline)
+
+    async def _exec_request_with_retry(self, url: Text, method: Text, headers: Dict = None, json: Dict = None,
+                                       retry_policy: RetryPolicy = None, idempotent: bool = True,
+                                       deadline: float = None, data: bytes = None) -> Dict[Text, Any]:
+        # Encode and compress the body once, every retry sends the same bytes
+        if json is not None:
+            data = self.codec.dumps(json)
+        if data is not None:
+            headers = dict(headers) if headers else {}
+            headers[CONTENT_TYPE_HEADER] = JSON_CONTENT_TYPE
+            data = compress_body(data, headers, self.compress_threshold, self.compress_level)
+
+        retry_policy = retry_policy if retry_policy is not None else self.retry_policy
+        deadline = Deadline(deadline) if deadline is not None else None
+        retry_context = retry_policy.new_context(deadline)
+        endpoint = endpoint_name(url)
+
+        while True:
+            # Each attempt may only wait for the socket as long as the deadline allows
+            timeout = self._aiohttp.ClientTimeout(total=deadline.clamp(None) if deadline is not None else None,
+                                                  sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+            try:
+                response = await self._exec_observed_request(url=url, method=method, headers=headers, data=data,
+                                                             timeout=timeout, endpoint=endpoint)
+
+                if response.ok:
+                    decode_start = time.monotonic()
+                    response_body = self.codec.loads(response.content)
+                    self.observer.on_response_decode(endpoint, time.monotonic() - decode_start)
+                    return response_body
+                elif retry_policy.can_retry_status(response.status_code, idempotent):
+                    next_sleep_time = retry_context.sleep_time(response.headers.get('Retry-After'))
+                    if next_sleep_time >= 0:
+                        await self._backoff(endpoint, retry_context.retry_count, response.status_code,
+                                            next_sleep_time)
+                        continue
+
+                SnowflakeRestful._raise_if_deadline_exceeded(deadline, 'Http Error: {}'.format(response.status_code))
+                raise IngestResponseError(response)
+
+            except (self._aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error("Request exception occurred: %s", e)
+                # Handle connection-level errors
+                next_sleep_time = retry_context.sleep_time() if retry_policy.can_retry(idempotent) else -1
+                if next_sleep_time >= 0:
+                    logger.debug("Connection error, sleeping for %s seconds before retry", next_sleep_time)
+                    await self._backoff(endpoint, retry_context.retry_count, e, next_sleep_time)
+                    continue
+                else:
+                    logger.error("Maximum retry timeout reached, giving up")
+                    SnowflakeRestful._raise_if_deadline_exceeded(deadline, repr(e))
+                    raise e
+
+    async def _backoff(self, endpoint: Text, retry_count: int, reason, sleep_time: float):
+        self.observer.on_retry(endpoint, retry_count, str(reason))
+        self.observer.on_backoff(endpoint, sleep_time)
+        await asyncio.sleep(sleep_time)
+
+    async def _exec_observed_request(self, url: Text, method: Text, headers: Dict, data: bytes,
+                                     timeout: 'aiohttp.ClientTimeout', endpoint: Text) -> _BufferedResponse:
+        self.observer.on_request_start(endpoint, method)
+        start_time = time.monotonic()
+        try:
+            response = await self._exec_request(url=url, method=method, headers=headers, data=data, timeout=timeout)
+        except Exception as e:
+            self.observer.on_request_end(endpoint, method, time.monotonic() - start_time, error=e)
+            raise
+
+        self.observer.on_request_end(endpoint, method, time.monotonic() - start_time, response.status_code,
+                                     bytes_received=len(response.content))
+        return response
+
+    async def _exec_request(self, url: Text, method: Text, headers: Dict = None,
+                            data: bytes = None, timeout: 'aiohttp.ClientTimeout' = None) -> _BufferedResponse:
+        async with self._get_session().request(method=method, url=url, headers=headers, data=data,
+                                               timeout=timeout) as response:
+            body = await response.read()
+            return _BufferedResponse(response.status, response.reason, response.headers, body, self.codec)
@@ -0,0 +1,98 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+batching.py - splits streams of staged files into insertFiles sized requests
+"""
+
+import json
+from itertools import islice
+
+from typing import Iterable, Iterator, List, Any, Tuple
+try:
+    from typing import Text
+except ImportError:
+    from typing_extensions import Text
+
+# The service accepts at most this many files in a single insertFiles request
+MAX_FILES_PER_REQUEST = 5000
+# Upper bound we keep each insertFiles request body under
+MAX_REQUEST_BYTES = 4 * 1024 * 1024
+
+# bytes of a serialized {"path": , "size": } entry besides the path and size themselves
+FILE_ENTRY_OVERHEAD = len('{"path": , "size": }, ')
+# bytes of the {"files": []} envelope around the entries
+PAYLOAD_OVERHEAD = len('{"files": []}')
+
+
+def estimate_file_entry_bytes(staged_file: Any) -> int:
+    """
+    estimate_file_entry_bytes - the number of bytes a staged file adds to an insertFiles body
+    :param staged_file: a StagedFile
+    :return: the serialized size of the entry
+    """
+    return len(json.dumps(staged_file.path)) + len(json.dumps(staged_file.size)) + FILE_ENTRY_OVERHEAD
+
+
+def iter_batches(staged_files: Iterable[Any], max_files: int = MAX_FILES_PER_REQUEST,
+                 max_bytes: int = MAX_REQUEST_BYTES) -> Iterator[List[Any]]:
+    """
+    iter_batches - lazily groups staged files into batches that fit a single insertFiles request.
+    Only the batch being built is held in memory, so generators of any length can be consumed.
+    :param staged_files: any iterable of StagedFile
+    :param max_files: the maximum number of files in a batch
+    :param max_bytes: the maximum estimated payload size of a batch
+    :return: an iterator over lists of StagedFile
+    """
+    if max_bytes is None:
+        staged_files = iter(staged_files)
+        while True:
+            batch = list(islice(staged_files, max_files))
+            if not batch:
+                return
+            yield batch
+
+    batch = []
+    batch_bytes = PAYLOAD_OVERHEAD
+
+    for staged_file in staged_files:
+        entry_bytes = estimate_file_entry_bytes(staged_file)
+
+        if batch and (len(batch) >= max_files or batch_bytes + entry_bytes > max_bytes):
+            yield batch
+            batch = []
+            batch_bytes = PAYLOAD_OVERHEAD
+
+        batch.append(staged_file)
+        batch_bytes += entry_bytes
+
+    if batch:
+        yield batch
+
+
+def iter_batches_by_pipe(work: Iterable[Tuple[Text, Any]], max_files: int = MAX_FILES_PER_REQUEST,
+                         max_bytes: int = MAX_REQUEST_BYTES) -> Iterator[Tuple[Text, List[Any]]]:
+    """
+    iter_batches_by_pipe - lazily groups a stream of (pipe, staged file) pairs into per pipe batches that fit
+    a single insertFiles request. One batch per pipe is built at a time, a batch is emitted once the next file
+    of its pipe would not fit, and the partial batches are emitted when the stream ends
+    :param work: any iterable of (pipe name, StagedFile) pairs
+    :param max_files: the maximum number of files in a batch
+    :param max_bytes: the maximum estimated payload size of a batch, None to only limit the file count
+    :return: an iterator over (pipe name, list of StagedFile) pairs
+    """
+    batches = {}  # pipe -> [files, estimated bytes]
+
+    for pipe, staged_file in work:
+        entry_bytes = estimate_file_entry_bytes(staged_file) if max_bytes is not None else 0
+        batch = batches.get(pipe)
+        if batch is None:
+            batch = batches[pipe] = [[], PAYLOAD_OVERHEAD]
+        elif len(batch[0]) >= max_files or (max_bytes is not None and batch[1] + entry_bytes > max_bytes):
+            yield pipe, batch[0]
+            batch[0], batch[1] = [], PAYLOAD_OVERHEAD
+
+        batch[0].append(staged_file)
+        batch[1] += entry_bytes
+
+    for pipe, (staged_files, _) in batches.items():
+        if staged_files:
+            yield pipe, staged_files
@@ -0,0 +1,122 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+codec.py - pluggable JSON encoding and decoding of rest request and response bodies
+"""
+
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+import json
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from typing import Any, Iterable, Tuple
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+JSON_CONTENT_TYPE = 'application/json'
+
+
+class JsonCodec(object):
+    """
+        Turns request bodies into bytes and response bodies back into objects, with the standard
+        library json module. Subclasses plug in faster libraries.
+    """
+    name = 'json'
+
+    def dumps(self, obj: Any) -> bytes:
+        """
+        :param obj: a JSON serializable object
+        :return: the UTF-8 encoded JSON document
+        """
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data: bytes) -> Any:
+        """
+        :param data: a UTF-8 encoded JSON document
+        :return: the decoded object
+        """
+        return json.loads(data)
+
+    def encode_files(self, staged_files: Iterable[Tuple[Text, Any]]) -> bytes:
+        """
+        Encodes an insertFiles body straight from (path, size) tuples such as StagedFile,
+        without building a dict per file
+        :param staged_files: the files to ingest
+        :return: the UTF-8 encoded {"files": [{"path": ..., "size": ...}, ...]} document
+        """
+        parts = []
+        for path, size in staged_files:
+            if size is None:
+                size = 'null'
+            elif type(size) is not int:
+                size = self.dumps(size).decode('utf-8')
+            parts.append('{"path":%s,"size":%s}' % (encode_basestring_ascii(path), size))
+        return ('{"files":[%s]}' % ','.join(parts)).encode('utf-8')
+
+
+class OrjsonCodec(JsonCodec):
+    """
+        JSON codec backed by orjson
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._orjson.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self._orjson.loads(data)
+
+
+class UjsonCodec(JsonCodec):
+    """
+        JSON codec backed by ujson
+    """
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._ujson.dumps(obj, escape_forward_slashes=False).encode('utf-8')
+
+    def loads(self, data: bytes) -> Any:
+        return self._ujson.loads(data)
+
+
+CODECS = {codec.name: codec for codec in (OrjsonCodec, UjsonCodec, JsonCodec)}
+
+
+def get_codec(name: Text = None) -> JsonCodec:
+    """
+    :param name: one of orjson, ujson or json, None for the fastest one installed
+    :return: a codec instance, shared by every caller asking for the same name
+    """
+    if name is not None:
+        if name not in CODECS:
+            raise ValueError('Unknown json codec: {}'.format(name))
+        return _make_codec(name)
+    return _default_codec()
+
+
+@lru_cache(maxsize=None)
+def _make_codec(name: Text) -> JsonCodec:
+    return CODECS[name]()
+
+
+@lru_cache(maxsize=None)
+def _default_codec() -> JsonCodec:
+    for name in ('orjson', 'ujson'):
+        try:
+            return _make_codec(name)
+        except ImportError:
+            logger.debug('%s is not installed', name)
+    return _make_codec('json')
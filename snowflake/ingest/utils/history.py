@@ -0,0 +1,117 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+history.py - helpers for consuming insertReport and loadHistoryScan file records
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from typing import Dict, Any, Iterator, Tuple
+try:
+    from typing import Text
+except ImportError:
+    from typing_extensions import Text
+
+# default number of seconds between two history polls
+DEFAULT_POLL_INTERVAL = 10
+# default upper bound of the adaptive poll interval when polls come back empty
+DEFAULT_MAX_POLL_INTERVAL = 120
+# default number of record keys remembered to drop duplicates
+DEFAULT_SEEN_CAPACITY = 100000
+# default length of the sub-windows a loadHistoryScan range is split into
+DEFAULT_SCAN_WINDOW = timedelta(hours=1)
+
+
+def parse_timestamp(timestamp: Text) -> datetime:
+    """
+    parse_timestamp - parses an ISO-8601 timestamp as used by loadHistoryScan
+    :param timestamp: e.g. 2024-01-01T00:00:00.000Z, a timestamp without offset is taken as UTC
+    :return: a naive datetime in UTC
+    """
+    if timestamp.endswith('Z'):
+        timestamp = timestamp[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def format_timestamp(timestamp: datetime) -> Text:
+    """
+    format_timestamp - formats a naive UTC datetime the way loadHistoryScan expects it
+    :param timestamp: a naive datetime in UTC
+    :return: e.g. 2024-01-01T00:00:00.000Z
+    """
+    return timestamp.isoformat(timespec='milliseconds') + 'Z'
+
+
+def split_time_range(start: datetime, end: datetime, window: timedelta) -> Iterator[Tuple[datetime, datetime]]:
+    """
+    split_time_range - splits [start, end) into consecutive windows of at most window length
+    :return: an iterator over (start inclusive, end exclusive) pairs in time order
+    """
+    while start < end:
+        window_end = min(start + window, end)
+        yield start, window_end
+        start = window_end
+
+
+def record_key(record: Dict[Text, Any]) -> Tuple:
+    """
+    record_key - identifies one state of a file in the load history, a file that moves from
+    LOAD_IN_PROGRESS to LOADED yields two different keys
+    :param record: a file record of an insertReport or loadHistoryScan response
+    :return: a hashable key
+    """
+    return record.get('path'), record.get('lastInsertTime'), record.get('status')
+
+
+class RecordDeduplicator(object):
+    """
+    Remembers the keys of the most recent history records to filter out the ones already seen.
+    Bounded: once capacity keys are remembered the least recently seen key is forgotten
+    """
+    def __init__(self, capacity: int = DEFAULT_SEEN_CAPACITY):
+        self.capacity = capacity
+        self._seen = OrderedDict()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def is_new(self, record: Dict[Text, Any]) -> bool:
+        """
+        :param record: a file record of an insertReport or loadHistoryScan response
+        :return: True the first time a record is seen, False afterwards
+        """
+        key = record_key(record)
+        if key in self._seen:
+            self._seen.move_to_end(key)
+            return False
+
+        self._seen[key] = None
+        if len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+        return True
+
+
+class PollBackoff(object):
+    """
+    Adaptive poll interval: doubles after every empty poll up to a maximum, and resets to
+    the base interval as soon as a poll returns something new
+    """
+    def __init__(self, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 max_poll_interval: float = DEFAULT_MAX_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(max_poll_interval, poll_interval)
+        self._next = poll_interval
+
+    def next_sleep_time(self, found_new: bool) -> float:
+        """
+        :param found_new: whether the last poll returned any new record
+        :return: the number of seconds to wait before the next poll
+        """
+        if found_new:
+            self._next = self.poll_interval
+        else:
+            self._next = min(self._next * 2, self.max_poll_interval)
+        return self._next
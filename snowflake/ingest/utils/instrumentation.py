@@ -0,0 +1,296 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+instrumentation.py - observer hooks to measure where the time of ingest requests goes
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from urllib.parse import urlsplit
+import threading
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from typing import Dict, Any, Sequence
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+# latency histogram bucket upper bounds in seconds, the prometheus client defaults
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+def endpoint_name(url: Text) -> Text:
+    """
+    :param url: a request url, e.g. https://host/v1/data/pipes/DB.SCHEMA.PIPE/insertFiles?requestId=...
+    :return: the last path segment naming the rest endpoint, e.g. insertFiles
+    """
+    return urlsplit(url).path.rstrip('/').rsplit('/', 1)[-1]
+
+
+class IngestObserver(object):
+    """
+        Receives the events of ingest requests. Every hook is a no-op, subclasses override the
+        ones they need. Hooks are called on the thread sending the request and must be fast
+        and must not raise.
+    """
+    def on_request_start(self, endpoint: Text, method: Text):
+        """
+        Called before each attempt of a request, retries included
+        :param endpoint: the rest endpoint, e.g. insertFiles, insertReport or loadHistoryScan
+        :param method: the http method
+        """
+
+    def on_request_end(self, endpoint: Text, method: Text, latency: float, status_code: int = None,
+                       bytes_sent: int = None, bytes_received: int = None, error: Exception = None):
+        """
+        Called after each attempt of a request, retries included
+        :param endpoint: the rest endpoint
+        :param method: the http method
+        :param latency: seconds the attempt took
+        :param status_code: the http status code, None if no response was received
+        :param bytes_sent: size of the request body, None if unknown
+        :param bytes_received: size of the response body, None if unknown
+        :param error: the transport error the attempt failed with, if any
+        """
+
+    def on_retry(self, endpoint: Text, retry_count: int, reason: Text):
+        """
+        Called when a failed attempt is going to be retried
+        :param endpoint: the rest endpoint
+        :param retry_count: the number of retries so far, this one included
+        :param reason: the http status code or the error that caused the retry
+        """
+
+    def on_backoff(self, endpoint: Text, sleep_time: float):
+        """
+        Called before sleeping between two attempts
+        :param endpoint: the rest endpoint
+        :param sleep_time: seconds about to be slept
+        """
+
+    def on_response_decode(self, endpoint: Text, duration: float):
+        """
+        Called after a successful response body was decoded
+        :param endpoint: the rest endpoint
+        :param duration: seconds spent decoding
+        """
+
+    def on_token_renewal(self, duration: float):
+        """
+        Called after a new token was signed
+        :param duration: seconds spent loading the key and signing the token
+        """
+
+    def on_files_skipped(self, pipe: Text, count: int):
+        """
+        Called when files already ingested are left out of an insertFiles request
+        :param pipe: the pipe the files were meant for
+        :param count: the number of files left out
+        """
+
+
+NULL_OBSERVER = IngestObserver()
+
+
+class Histogram(object):
+    """
+        Fixed bucket histogram of observed values
+    """
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # the last bucket counts values above every bound
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        :param q: the quantile, between 0 and 1
+        :return: the upper bound of the bucket holding the quantile, None without observations,
+                 infinity if it lies above every bound
+        """
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self) -> Dict[Text, Any]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': dict(zip(self.buckets + (float('inf'),), self.counts)),
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+        }
+
+
+class _EndpointMetrics(object):
+    def __init__(self, buckets: Sequence[float]):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.status_codes = defaultdict(int)
+        self.latency = Histogram(buckets)
+        self.decode = Histogram(buckets)
+
+    def snapshot(self) -> Dict[Text, Any]:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'backoff_seconds': self.backoff_seconds,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'status_codes': dict(self.status_codes),
+            'latency': self.latency.snapshot(),
+            'decode': self.decode.snapshot(),
+        }
+
+
+class InMemoryMetricsCollector(IngestObserver):
+    """
+        Keeps counters and latency histograms per endpoint in memory, read them with snapshot()
+    """
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        """
+        :param buckets: the histogram bucket upper bounds in seconds
+        """
+        self.buckets = buckets
+        self._endpoints = {}  # endpoint -> _EndpointMetrics
+        self._token_renewal = Histogram(buckets)
+        self._files_skipped = defaultdict(int)  # pipe -> files left out as duplicates
+        self._lock = threading.Lock()
+
+    def _metrics(self, endpoint: Text) -> _EndpointMetrics:
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self._endpoints.setdefault(endpoint, _EndpointMetrics(self.buckets))
+        return metrics
+
+    def on_request_end(self, endpoint, method, latency, status_code=None, bytes_sent=None, bytes_received=None,
+                       error=None):
+        with self._lock:
+            metrics = self._metrics(endpoint)
+            metrics.requests += 1
+            metrics.latency.observe(latency)
+            if status_code is not None:
+                metrics.status_codes[status_code] += 1
+            if error is not None or status_code is None or status_code >= 400:
+                metrics.errors += 1
+            metrics.bytes_sent += bytes_sent or 0
+            metrics.bytes_received += bytes_received or 0
+
+    def on_retry(self, endpoint, retry_count, reason):
+        with self._lock:
+            self._metrics(endpoint).retries += 1
+
+    def on_backoff(self, endpoint, sleep_time):
+        with self._lock:
+            self._metrics(endpoint).backoff_seconds += sleep_time
+
+    def on_response_decode(self, endpoint, duration):
+        with self._lock:
+            self._metrics(endpoint).decode.observe(duration)
+
+    def on_token_renewal(self, duration):
+        with self._lock:
+            self._token_renewal.observe(duration)
+
+    def on_files_skipped(self, pipe, count):
+        with self._lock:
+            self._files_skipped[pipe] += count
+
+    def snapshot(self) -> Dict[Text, Any]:
+        """
+        :return: a point in time copy of every metric, keyed by endpoint, plus the token renewals and the
+                 duplicate files skipped per pipe
+        """
+        with self._lock:
+            return {
+                'endpoints': {endpoint: metrics.snapshot() for endpoint, metrics in self._endpoints.items()},
+                'token_renewal': self._token_renewal.snapshot(),
+                'files_skipped': dict(self._files_skipped),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+            self._token_renewal = Histogram(self.buckets)
+            self._files_skipped = defaultdict(int)
+
+
+class PrometheusObserver(IngestObserver):
+    """
+        Exports the events as prometheus metrics. Requires the optional prometheus_client dependency
+    """
+    def __init__(self, registry=None, namespace: Text = 'snowflake_ingest',
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        """
+        :param registry: the prometheus registry to register the metrics with, defaults to the global one
+        :param namespace: prefix of the metric names
+        :param buckets: the histogram bucket upper bounds in seconds
+        """
+        try:
+            import prometheus_client
+        except ImportError:
+            raise ImportError('PrometheusObserver requires prometheus_client, '
+                              'install it with "pip install snowflake-ingest[prometheus]"')
+
+        kwargs = {'namespace': namespace}
+        if registry is not None:
+            kwargs['registry'] = registry
+
+        self._latency = prometheus_client.Histogram('request_seconds', 'Latency of rest request attempts',
+                                                    ['endpoint', 'status'], buckets=buckets, **kwargs)
+        self._retries = prometheus_client.Counter('retries', 'Retried rest requests', ['endpoint'], **kwargs)
+        self._backoff = prometheus_client.Counter('backoff_seconds', 'Time slept between retries',
+                                                  ['endpoint'], **kwargs)
+        self._bytes_sent = prometheus_client.Counter('sent_bytes', 'Request body bytes sent', ['endpoint'], **kwargs)
+        self._bytes_received = prometheus_client.Counter('received_bytes', 'Response body bytes received',
+                                                         ['endpoint'], **kwargs)
+        self._decode = prometheus_client.Histogram('decode_seconds', 'Time spent decoding response bodies',
+                                                   ['endpoint'], buckets=buckets, **kwargs)
+        self._token_renewal = prometheus_client.Histogram('token_renewal_seconds', 'Time spent signing tokens',
+                                                          buckets=buckets, **kwargs)
+        self._files_skipped = prometheus_client.Counter('skipped_files', 'Duplicate files left out of requests',
+                                                        ['pipe'], **kwargs)
+
+    def on_request_end(self, endpoint, method, latency, status_code=None, bytes_sent=None, bytes_received=None,
+                       error=None):
+        status = str(status_code) if status_code is not None else 'error'
+        self._latency.labels(endpoint, status).observe(latency)
+        if bytes_sent:
+            self._bytes_sent.labels(endpoint).inc(bytes_sent)
+        if bytes_received:
+            self._bytes_received.labels(endpoint).inc(bytes_received)
+
+    def on_retry(self, endpoint, retry_count, reason):
+        self._retries.labels(endpoint).inc()
+
+    def on_backoff(self, endpoint, sleep_time):
+        self._backoff.labels(endpoint).inc(sleep_time)
+
+    def on_response_decode(self, endpoint, duration):
+        self._decode.labels(endpoint).observe(duration)
+
+    def on_token_renewal(self, duration):
+        self._token_renewal.observe(duration)
+
+    def on_files_skipped(self, pipe, count):
+        self._files_skipped.labels(pipe).inc(count)
@@ -0,0 +1,53 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+log_sampling.py - thins out per-request log lines on busy clients
+"""
+
+import threading
+import time
+
+from typing import Callable
+
+
+class LogSampler(object):
+    """
+        Decides which requests get their debug log lines. Keeps every every_n-th request and, on top
+        of that, at most max_per_second requests per second. Thread safe.
+    """
+    def __init__(self, every_n: int = 1, max_per_second: float = None, clock: Callable[[], float] = time.monotonic):
+        """
+        :param every_n: log one request out of every_n
+        :param max_per_second: upper bound of logged requests per second, None for no bound
+        :param clock: monotonic time source, in seconds
+        """
+        self.every_n = max(every_n, 1)
+        self.max_per_second = max_per_second
+        self.clock = clock
+        self.suppressed = 0  # the number of requests not logged so far
+        self._calls = 0
+        # token bucket holding at least one token, so rates below one per second still log
+        self._capacity = max(max_per_second, 1) if max_per_second is not None else None
+        self._tokens = self._capacity
+        self._last_refill = clock()
+        self._lock = threading.Lock()
+
+    def should_log(self) -> bool:
+        """
+        :return: whether the current request should be logged
+        """
+        with self._lock:
+            self._calls += 1
+            keep = (self._calls - 1) % self.every_n == 0
+
+            if keep and self.max_per_second is not None:
+                now = self.clock()
+                self._tokens = min(self._tokens + (now - self._last_refill) * self.max_per_second,
+                                   self._capacity)
+                self._last_refill = now
+                keep = self._tokens >= 1
+                if keep:
+                    self._tokens -= 1
+
+            if not keep:
+                self.suppressed += 1
+            return keep
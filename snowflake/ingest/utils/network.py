@@ -1,107 +1,358 @@
-# import python connector to inject ocsp check method into requests library
-import snowflake.connector
-import requests
-from requests import Response
+# requests and the python connector are imported when the first session is created, so that
+# importing snowflake.ingest stays cheap
+from functools import lru_cache
+from urllib.parse import urlsplit
+import gzip
+import threading
 import time
+from .retry import RetryCtx
+from .retry import RetryPolicy
+from .retry import DEFAULT_RETRY_POLICY
+from .retry import DEFAULT_REQUEST_TIMEOUT
+from .retry import Deadline
+from .resilience import CircuitBreaker
+from .resilience import AdaptiveConcurrencyLimiter
+from .resilience import is_overload_status
+from .instrumentation import IngestObserver
+from .instrumentation import NULL_OBSERVER
+from .instrumentation import endpoint_name
+from .codec import JsonCodec
+from .codec import JSON_CONTENT_TYPE
+from .codec import get_codec
 from ..error import IngestResponseError
+from ..error import IngestClientError
+from ..error import IngestTimeoutError
+from ..errorcode import ERR_CIRCUIT_OPEN
 
 from logging import getLogger
 logger = getLogger(__name__)
 
-from typing import Dict, Any
+from typing import Dict, Any, Callable, TYPE_CHECKING
 try:
     from typing import Text
 except ImportError:
     logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
     from typing_extensions import Text
 
-# default timeout in seconds for a rest request
-DEFAULT_REQUEST_TIMEOUT = 1 * 60
+if TYPE_CHECKING:
+    import requests
+    from requests import Response
+
+# default connection pool settings, these mirror the requests library defaults
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+# default socket timeouts in seconds for establishing a connection and waiting for response bytes
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 1 * 60
+
+CONTENT_TYPE_HEADER = 'Content-Type'
+CONTENT_ENCODING_HEADER = 'Content-Encoding'
+
+# default gzip level of compressed request bodies, favours speed over ratio
+DEFAULT_COMPRESS_LEVEL = 6
+
+
+def compress_body(data: bytes, headers: Dict, threshold: int, level: int = DEFAULT_COMPRESS_LEVEL) -> bytes:
+    """
+    Gzips a request body of at least threshold bytes and labels it in the headers
+    :param data: the encoded request body
+    :param headers: the request headers, updated in place when the body is compressed
+    :param threshold: the body size in bytes from which on it is compressed, None to never compress
+    :param level: the gzip compression level
+    :return: the body to send
+    """
+    if threshold is None or len(data) < threshold:
+        return data
+    headers[CONTENT_ENCODING_HEADER] = 'gzip'
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+@lru_cache(maxsize=None)
+def inject_ocsp_check() -> bool:
+    """
+    Imports the python connector, which injects its OCSP certificate revocation check into the
+    requests library. Runs once per process
+    :return: whether the check is in place
+    """
+    try:
+        import snowflake.connector  # noqa: F401
+    except ImportError:
+        logger.warning('snowflake-connector-python is not installed, certificates are not checked with OCSP')
+        return False
+    return True
 
 
 class SnowflakeRestful(object):
     """
-        A simple wrapper over python request library to handle retry
+        A simple wrapper over python request library to handle retry.
+        Keeps one pooled, keep-alive session per host so that consecutive requests reuse
+        the same TCP/TLS connections. An instance can be shared by several ingest managers.
+        Optionally guards every host with a circuit breaker and an adaptive concurrency limit,
+        shared by all threads and managers that use the instance.
     """
-    def post(self, url: Text, json: Dict, headers: Dict) -> Dict[Text, Any]:
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS, pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 pool_block: bool = False, keep_alive: bool = True, retry_policy: RetryPolicy = None,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 circuit_breaker: Callable[[], CircuitBreaker] = None,
+                 concurrency_limiter: Callable[[], AdaptiveConcurrencyLimiter] = None,
+                 observer: IngestObserver = None, codec: JsonCodec = None, compress_threshold: int = None,
+                 compress_level: int = DEFAULT_COMPRESS_LEVEL, ocsp_check: bool = True):
+        """
+        :param pool_connections: number of host connection pools to cache per session
+        :param pool_maxsize: maximum number of connections kept alive per host
+        :param pool_block: whether to block when all pooled connections are in use instead of opening a new one
+        :param keep_alive: whether to keep connections open between requests
+        :param retry_policy: the retry policy of requests that do not bring their own
+        :param connect_timeout: seconds to wait for a connection to be established, None to wait forever
+        :param read_timeout: seconds to wait between bytes of the response, None to wait forever
+        :param circuit_breaker: creates the circuit breaker of each host, e.g. CircuitBreaker, None to disable
+        :param concurrency_limiter: creates the concurrency limiter of each host, e.g. AdaptiveConcurrencyLimiter,
+                                    None to disable
+        :param observer: receives the request, retry and decode events, e.g. an InMemoryMetricsCollector
+        :param codec: encodes request and decodes response bodies, defaults to the fastest json library installed
+        :param compress_threshold: gzip request bodies of at least this many bytes, None to send them as they are
+        :param compress_level: the gzip compression level of request bodies
+        :param ocsp_check: whether to load the python connector's OCSP check into requests before the first
+                           request, it is skipped with a warning when the connector is not installed
+        """
+        self.retry_policy = retry_policy if retry_policy is not None else DEFAULT_RETRY_POLICY
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.circuit_breaker = circuit_breaker
+        self.concurrency_limiter = concurrency_limiter
+        self.observer = observer if observer is not None else NULL_OBSERVER
+        self.codec = codec if codec is not None else get_codec()
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.ocsp_check = ocsp_check
+        self._sessions = {}  # host -> requests.Session
+        self._circuit_breakers = {}  # host -> CircuitBreaker
+        self._concurrency_limiters = {}  # host -> AdaptiveConcurrencyLimiter
+        self._sessions_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Closes every pooled session and its connections. A closed instance can still be
+        used, new sessions are simply created on demand
+        """
+        with self._sessions_lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+
+        for session in sessions:
+            session.close()
+
+    def _get_session(self, url: Text) -> 'requests.Session':
+        """
+        Returns the pooled session for the host of the url, creating it on first use
+        :param url: request url
+        :return: the session bound to the url's host
+        """
+        host = urlsplit(url).netloc
+
+        with self._sessions_lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._make_session()
+                self._sessions[host] = session
+
+        return session
+
+    def _get_host_guard(self, guards: Dict, factory: Callable, host: Text):
+        """
+        Returns the circuit breaker or concurrency limiter of a host, creating it on first use
+        """
+        if factory is None:
+            return None
+
+        with self._sessions_lock:
+            guard = guards.get(host)
+            if guard is None:
+                guard = factory()
+                guards[host] = guard
+        return guard
+
+    def _make_session(self) -> 'requests.Session':
+        if self.ocsp_check:
+            inject_ocsp_check()
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+
+        return session
+
+    def post(self, url: Text, json: Dict = None, headers: Dict = None, retry_policy: RetryPolicy = None,
+             idempotent: bool = False, deadline: float = None, data: bytes = None) -> Dict[Text, Any]:
         """
         Http POST request
         :param url: request url,
-        :param json: post request body
+        :param json: post request body, encoded with the codec
+        :param data: post request body already encoded as JSON, e.g. by codec.encode_files, instead of json
         :param headers: request headers, authentication etc
+        :param retry_policy: overrides the retry policy for this request
+        :param idempotent: whether the request is safe to send twice
+        :param deadline: seconds the request may take, retries included, None for no deadline
         :return: response payload
         """
-        return self._exec_request_with_retry(url=url, method='POST', json=json, headers=headers)
+        return self._exec_request_with_retry(url=url, method='POST', json=json, data=data, headers=headers,
+                                             retry_policy=retry_policy, idempotent=idempotent, deadline=deadline)
 
-    def get(self, url: Text, headers: Dict) -> Dict[Text, Any]:
+    def get(self, url: Text, headers: Dict, retry_policy: RetryPolicy = None,
+            deadline: float = None) -> Dict[Text, Any]:
         """
         Http GET request
-        :param url:
-        :param headers:
-        :return:
-        """
-        return self._exec_request_with_retry(url=url, method='GET', headers=headers)
-
-    def _exec_request_with_retry(self, url: Text, method: Text, headers: Dict = None, json: Dict = None) \
-            -> Dict[Text, Any]:
-
-        class RetryCtx(object):
-            def __init__(self, timeout=None):
-                self.retry_count = 0
-                self.total_timeout = timeout
-                self.next_sleep_time = 1
-                self._request_start_time = time.time()
-
-            def sleep_time(self):
-                """
-                :return: time in seconds to sleep next time, -1 if should not sleep
-                """
-                if time.time() - self._request_start_time > self.total_timeout:
-                    logger.info('Request timeout reached.')
-                    return -1
-                else:
-                    # exponential backoff
-                    this_sleep_time = self.next_sleep_time
-                    self.next_sleep_time = this_sleep_time * 2
-                    self.retry_count += 1
-                    logger.info('Retried request. Backoff time %d, Retry count %d',
-                                this_sleep_time, self.retry_count)
-                    return this_sleep_time
+        :param url: request url
+        :param headers: request headers, authentication etc
+        :param retry_policy: overrides the retry policy for this request
+        :param deadline: seconds the request may take, retries included, None for no deadline
+        :return: response payload
+        """
+        return self._exec_request_with_retry(url=url, method='GET', headers=headers,
+                                             retry_policy=retry_policy, idempotent=True, deadline=deadline)
+
+    def _exec_request_with_retry(self, url: Text, method: Text, headers: Dict = None, json: Dict = None,
+                                 retry_policy: RetryPolicy = None, idempotent: bool = True,
+                                 deadline: float = None, data: bytes = None) -> Dict[Text, Any]:
+        from requests.exceptions import RequestException
 
-        retry_context = RetryCtx(DEFAULT_REQUEST_TIMEOUT)
+        # Encode and compress the body once, every retry sends the same bytes
+        if json is not None:
+            data = self.codec.dumps(json)
+        if data is not None:
+            headers = dict(headers) if headers else {}
+            headers[CONTENT_TYPE_HEADER] = JSON_CONTENT_TYPE
+            data = compress_body(data, headers, self.compress_threshold, self.compress_level)
+
+        retry_policy = retry_policy if retry_policy is not None else self.retry_policy
+        deadline = Deadline(deadline) if deadline is not None else None
+        retry_context = retry_policy.new_context(deadline)
+        endpoint = endpoint_name(url)
 
         while True:
+            # Each attempt may only wait for the socket as long as the deadline allows
+            if deadline is None:
+                timeout = (self.connect_timeout, self.read_timeout)
+            else:
+                timeout = (deadline.clamp(self.connect_timeout), deadline.clamp(self.read_timeout))
+
             try:
-                response = self._exec_request(url=url, method=method, headers=headers, json=json)
+                response = self._exec_guarded_request(url=url, method=method, headers=headers, data=data,
+                                                      timeout=timeout, deadline=deadline, endpoint=endpoint)
 
                 if response.ok:
-                    return response.json()
-                elif self._can_retry(response.status_code):
-                    next_sleep_time = retry_context.sleep_time()
-                    if next_sleep_time > 0:
-                        time.sleep(next_sleep_time)
+                    decode_start = time.monotonic()
+                    response_body = self.codec.loads(response.content)
+                    self.observer.on_response_decode(endpoint, time.monotonic() - decode_start)
+                    return response_body
+                elif retry_policy.can_retry_status(response.status_code, idempotent):
+                    next_sleep_time = retry_context.sleep_time(response.headers.get('Retry-After'))
+                    if next_sleep_time >= 0:
+                        self._backoff(endpoint, retry_context.retry_count, response.status_code, next_sleep_time)
                         continue
 
+                self._raise_if_deadline_exceeded(deadline, 'Http Error: {}'.format(response.status_code))
                 raise IngestResponseError(response)
 
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Request exception occurred: {e}")
+            except RequestException as e:
+                logger.error("Request exception occurred: %s", e)
                 # Handle connection-level errors
-                next_sleep_time = retry_context.sleep_time()
-                if next_sleep_time > 0:
-                    logger.debug(f"Connection error, sleeping for {next_sleep_time} seconds before retry")
-                    time.sleep(next_sleep_time)
+                next_sleep_time = retry_context.sleep_time() if retry_policy.can_retry(idempotent) else -1
+                if next_sleep_time >= 0:
+                    logger.debug("Connection error, sleeping for %s seconds before retry", next_sleep_time)
+                    self._backoff(endpoint, retry_context.retry_count, e, next_sleep_time)
                     continue
                 else:
                     logger.error("Maximum retry timeout reached, giving up")
+                    self._raise_if_deadline_exceeded(deadline, str(e))
                     raise e
 
-    def _exec_request(self, url: Text, method: Text, headers: Dict = None, json: Dict = None) -> Response:
-        return requests.request(method=method,
-                                url=url,
-                                headers=headers,
-                                json=json)
+    def _backoff(self, endpoint: Text, retry_count: int, reason, sleep_time: float):
+        self.observer.on_retry(endpoint, retry_count, str(reason))
+        self.observer.on_backoff(endpoint, sleep_time)
+        time.sleep(sleep_time)
+
+    @staticmethod
+    def _raise_if_deadline_exceeded(deadline: Deadline, last_error: Text):
+        """
+        Raises IngestTimeoutError rather than the last error when the request ran out of time
+        """
+        if deadline is not None and deadline.remaining() <= 0:
+            raise IngestTimeoutError(message='Deadline of {} seconds exceeded, last error: {}'
+                                     .format(deadline.seconds, last_error))
+
+    def _exec_guarded_request(self, url: Text, method: Text, headers: Dict, data: bytes, timeout,
+                              deadline: Deadline, endpoint: Text) -> 'Response':
+        """
+        Sends one attempt through the circuit breaker and concurrency limiter of the url's host,
+        and reports it to the observer
+        """
+        host = urlsplit(url).netloc
+        breaker = self._get_host_guard(self._circuit_breakers, self.circuit_breaker, host)
+        limiter = self._get_host_guard(self._concurrency_limiters, self.concurrency_limiter, host)
+
+        if limiter is not None:
+            limiter.acquire(deadline.clamp(None) if deadline is not None else None)
+        if breaker is not None and not breaker.allow_request():
+            if limiter is not None:
+                limiter.release()
+            raise IngestClientError(code=ERR_CIRCUIT_OPEN,
+                                    message='Circuit breaker of {} is open, failing fast'.format(host))
+
+        self.observer.on_request_start(endpoint, method)
+        start_time = time.monotonic()
+        response = None
+        error = None
+        try:
+            response = self._exec_request(url=url, method=method, headers=headers, data=data, timeout=timeout)
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            latency = time.monotonic() - start_time
+            failed = response is None or is_overload_status(response.status_code)
+            if limiter is not None:
+                limiter.release(latency, failed)
+            if breaker is not None:
+                breaker.record(failed)
+
+            if response is None:
+                self.observer.on_request_end(endpoint, method, latency, error=error)
+            else:
+                request = response.request
+                self.observer.on_request_end(endpoint, method, latency, response.status_code,
+                                             len(request.body) if request is not None and request.body else 0,
+                                             len(response.content), error)
+
+    def _exec_request(self, url: Text, method: Text, headers: Dict = None, data: bytes = None,
+                      timeout=None) -> 'Response':
+        return self._get_session(url).request(method=method,
+                                              url=url,
+                                              headers=headers,
+                                              data=data,
+                                              timeout=timeout)
 
     @staticmethod
     def _can_retry(http_code):
-        return http_code == 408 or 500 <= http_code < 600
+        return DEFAULT_RETRY_POLICY.can_retry_status(http_code)
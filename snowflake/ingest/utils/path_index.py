@@ -0,0 +1,127 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+path_index.py - bounded in-memory sets of recently ingested stage paths
+"""
+
+from collections import OrderedDict
+from datetime import timedelta
+import hashlib
+import math
+import threading
+import time
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from typing import Callable
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+# default number of paths an LRUPathIndex remembers
+DEFAULT_INDEX_CAPACITY = 100000
+# Snowpipe keeps the load metadata of a pipe, and hence skips files it loaded already, for 14 days
+DEFAULT_INDEX_TTL = timedelta(days=14)
+# default number of paths per generation of a BloomPathIndex
+DEFAULT_BLOOM_CAPACITY = 1000000
+# default false positive rate of a BloomPathIndex, every false positive is a new file that is not sent
+DEFAULT_BLOOM_ERROR_RATE = 1e-7
+
+
+class LRUPathIndex(object):
+    """
+        Remembers up to capacity paths for at most ttl each. Once full, the least recently used path
+        is forgotten. Thread safe
+    """
+    def __init__(self, capacity: int = DEFAULT_INDEX_CAPACITY, ttl: timedelta = DEFAULT_INDEX_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param capacity: the number of paths remembered
+        :param ttl: how long a path is remembered after it was added, None for no expiry
+        :param clock: returns the current time in seconds
+        """
+        self.capacity = capacity
+        self.ttl = ttl.total_seconds() if ttl is not None else None
+        self._clock = clock
+        self._expiries = OrderedDict()  # path -> expiry time, least recently used first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expiries)
+
+    def __contains__(self, path: Text) -> bool:
+        with self._lock:
+            expiry = self._expiries.get(path)
+            if expiry is None:
+                return False
+            if self.ttl is not None and expiry <= self._clock():
+                del self._expiries[path]
+                return False
+            self._expiries.move_to_end(path)
+            return True
+
+    def add(self, path: Text):
+        with self._lock:
+            self._expiries[path] = self._clock() + self.ttl if self.ttl is not None else 0
+            self._expiries.move_to_end(path)
+            if len(self._expiries) > self.capacity:
+                self._expiries.popitem(last=False)
+
+
+class BloomPathIndex(object):
+    """
+        Remembers paths in a Bloom filter, a few bytes per path instead of the path itself. It never
+        misses a path it was given but may claim to know a path it was never given, at about error_rate.
+        Paths are kept in two generations of capacity paths each, once the current generation is full
+        the previous one is dropped, so memory stays bounded. Thread safe
+    """
+    def __init__(self, capacity: int = DEFAULT_BLOOM_CAPACITY, error_rate: float = DEFAULT_BLOOM_ERROR_RATE):
+        """
+        :param capacity: the number of paths per generation
+        :param error_rate: the false positive rate of a full generation
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._current = bytearray((self.num_bits + 7) // 8)
+        self._previous = None
+        self._count = 0  # paths added to the current generation
+        self._lock = threading.Lock()
+
+    def __contains__(self, path: Text) -> bool:
+        first, second = self._hashes(path)
+        with self._lock:
+            return self._test(self._current, first, second) or (self._previous is not None and
+                                                                self._test(self._previous, first, second))
+
+    def add(self, path: Text):
+        first, second = self._hashes(path)
+        num_bits = self.num_bits
+        with self._lock:
+            bits = self._current
+            for i in range(self.num_hashes):
+                position = (first + i * second) % num_bits
+                bits[position >> 3] |= 1 << (position & 7)
+            self._count += 1
+            if self._count >= self.capacity:
+                self._previous = self._current
+                self._current = bytearray(len(self._current))
+                self._count = 0
+
+    @staticmethod
+    def _hashes(path: Text):
+        # double hashing, the k positions are derived from the two halves of one digest
+        digest = hashlib.blake2b(path.encode('utf-8'), digest_size=16).digest()
+        return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+    def _test(self, bits: bytearray, first: int, second: int) -> bool:
+        # most unknown paths miss on one of the first positions, so they are probed one at a time
+        num_bits = self.num_bits
+        for i in range(self.num_hashes):
+            position = (first + i * second) % num_bits
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
@@ -0,0 +1,190 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+resilience.py - per host circuit breaker and adaptive concurrency limit for rest requests
+"""
+
+from collections import deque
+import threading
+import time
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from ..error import IngestTimeoutError
+
+from typing import Callable
+
+# Circuit breaker states
+CLOSED = 'closed'  # requests flow, outcomes are recorded
+OPEN = 'open'  # requests fail fast until the open duration elapsed
+HALF_OPEN = 'half_open'  # a few trial requests decide whether to close or open again
+
+
+def is_overload_status(http_code: int) -> bool:
+    """
+    :param http_code: status code of a response
+    :return: whether the status code signals that the service is throttling or failing
+    """
+    return http_code == 429 or 500 <= http_code < 600
+
+
+class CircuitBreaker(object):
+    """
+        Tracks the outcomes of the most recent requests to one host. Once too large a share of
+        them failed the circuit opens and requests fail fast instead of piling more load on the
+        service. After open_duration a few trial requests are let through, if they succeed the
+        circuit closes again, otherwise it stays open for another open_duration.
+    """
+    def __init__(self, failure_ratio: float = 0.5, window_size: int = 20, min_requests: int = 10,
+                 open_duration: float = 30, half_open_max_calls: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param failure_ratio: share of failed requests in the window that opens the circuit
+        :param window_size: number of most recent request outcomes considered
+        :param min_requests: minimum number of outcomes in the window before the circuit may open
+        :param open_duration: seconds the circuit stays open before trial requests are let through
+        :param half_open_max_calls: number of concurrent trial requests while half open
+        :param clock: monotonic time source, in seconds
+        """
+        self.failure_ratio = failure_ratio
+        self.window_size = window_size
+        self.min_requests = min_requests
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+        self._outcomes = deque(maxlen=window_size)  # True for a failed request
+        self._failures = 0
+        self._state = CLOSED
+        self._opened_at = None
+        self._trial_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._update_state()
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        :return: whether a request may be sent now, every allowed request must be followed by record()
+        """
+        with self._lock:
+            self._update_state()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._trial_calls < self.half_open_max_calls:
+                self._trial_calls += 1
+                return True
+            return False
+
+    def record(self, failed: bool):
+        """
+        :param failed: whether the request failed with a connection error or an overload status
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._trial_calls = max(self._trial_calls - 1, 0)
+                if failed:
+                    self._open()
+                else:
+                    logger.info('Circuit breaker closed after a successful trial request')
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    self._failures = 0
+                return
+
+            if self._state == OPEN:
+                # the outcome of a request sent before the circuit opened
+                return
+
+            if len(self._outcomes) == self.window_size:
+                self._failures -= self._outcomes[0]
+            self._outcomes.append(failed)
+            self._failures += failed
+
+            if len(self._outcomes) >= self.min_requests and \
+                    self._failures >= self.failure_ratio * len(self._outcomes):
+                self._open()
+
+    def _open(self):
+        logger.warning('Circuit breaker opened, failing requests fast for %s seconds', self.open_duration)
+        self._state = OPEN
+        self._opened_at = self.clock()
+        self._trial_calls = 0
+
+    def _update_state(self):
+        if self._state == OPEN and self.clock() - self._opened_at >= self.open_duration:
+            self._state = HALF_OPEN
+
+
+class AdaptiveConcurrencyLimiter(object):
+    """
+        Bounds the number of requests in flight to one host with an AIMD limit: every request that
+        completes quickly and successfully grows the limit by about one per limit's worth of requests,
+        every throttled, failed or slow request cuts it by decrease_factor, at most once per cooldown.
+        Callers beyond the limit wait for a slot instead of adding to an overload.
+    """
+    def __init__(self, initial_limit: int = 10, min_limit: int = 1, max_limit: int = 100,
+                 decrease_factor: float = 0.5, latency_threshold: float = None, cooldown: float = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param initial_limit: number of requests allowed in flight at first
+        :param min_limit: the limit never shrinks below this
+        :param max_limit: the limit never grows above this
+        :param decrease_factor: factor the limit is multiplied by on congestion
+        :param latency_threshold: seconds after which a successful request counts as congestion, None to ignore latency
+        :param cooldown: minimum seconds between two decreases, so one burst of failures cuts the limit once
+        :param clock: monotonic time source, in seconds
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_threshold = latency_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._last_decrease = None
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self, timeout: float = None):
+        """
+        Waits for a free slot
+        :param timeout: the maximum number of seconds to wait, None to wait forever
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._in_flight < int(self._limit), timeout):
+                raise IngestTimeoutError(message='No request slot freed up within {} seconds, {} requests in flight'
+                                         .format(timeout, self._in_flight))
+            self._in_flight += 1
+
+    def release(self, latency: float = None, failed: bool = False):
+        """
+        Frees a slot and adapts the limit to the outcome of the request
+        :param latency: seconds the request took, None if it was never sent
+        :param failed: whether the request failed with a connection error or an overload status
+        """
+        with self._condition:
+            self._in_flight -= 1
+
+            if latency is not None:
+                congested = failed or (self.latency_threshold is not None and latency > self.latency_threshold)
+                if congested:
+                    now = self.clock()
+                    if self._last_decrease is None or now - self._last_decrease >= self.cooldown:
+                        self._last_decrease = now
+                        self._limit = max(self._limit * self.decrease_factor, self.min_limit)
+                        logger.info('Congestion detected, concurrency limit lowered to %d', self._limit)
+                else:
+                    self._limit = min(self._limit + 1 / self._limit, self.max_limit)
+
+            self._condition.notify_all()
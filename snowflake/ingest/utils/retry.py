@@ -0,0 +1,224 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+retry.py - configurable retry and backoff policies for rest requests
+"""
+
+from datetime import datetime, timezone
+import random
+import time
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+from ..error import IngestTimeoutError
+
+from typing import Iterable
+try:
+    from typing import Text
+except ImportError:
+    logger.debug('# Python 3.5.0 and 3.5.1 have incompatible typing modules.', exc_info=True)
+    from typing_extensions import Text
+
+# default time budget in seconds for a rest request, retries included
+DEFAULT_REQUEST_TIMEOUT = 1 * 60
+
+# Jitter strategies, see https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+NO_JITTER = 'none'  # sleep exactly the exponential backoff
+FULL_JITTER = 'full'  # sleep a random time between 0 and the exponential backoff
+DECORRELATED_JITTER = 'decorrelated'  # sleep a random time between the base and three times the last sleep
+
+# Http status codes retried by default, on top of every 5xx
+DEFAULT_RETRY_STATUSES = frozenset([408, 429])
+
+
+class RetryPolicy(object):
+    """
+        Decides whether and how long to wait before a failed request is sent again.
+        The default policy doubles a 1 second backoff until the 60 second budget is spent,
+        as the client always did, and additionally retries 429 honouring Retry-After.
+    """
+    def __init__(self, base_backoff: float = 1, multiplier: float = 2, max_backoff: float = None,
+                 deadline: float = DEFAULT_REQUEST_TIMEOUT, jitter: Text = NO_JITTER,
+                 retry_statuses: Iterable[int] = DEFAULT_RETRY_STATUSES, retry_server_errors: bool = True,
+                 respect_retry_after: bool = True, idempotent_only: bool = False, max_retries: int = None,
+                 rng: random.Random = None):
+        """
+        :param base_backoff: seconds to sleep before the first retry
+        :param multiplier: factor the backoff grows by after every retry
+        :param max_backoff: upper bound of a single sleep in seconds, None for no bound
+        :param deadline: total time budget in seconds after which we stop retrying
+        :param jitter: one of NO_JITTER, FULL_JITTER or DECORRELATED_JITTER
+        :param retry_statuses: http status codes that are retried
+        :param retry_server_errors: whether every 5xx status code is retried as well
+        :param respect_retry_after: whether to sleep as long as the Retry-After header asks
+        :param idempotent_only: whether to only retry requests that are safe to send twice
+        :param max_retries: maximum number of retries, None to only limit by deadline
+        :param rng: random number generator used for jitter
+        """
+        if jitter not in (NO_JITTER, FULL_JITTER, DECORRELATED_JITTER):
+            raise ValueError('Unknown jitter strategy: {}'.format(jitter))
+
+        self.base_backoff = base_backoff
+        self.multiplier = multiplier
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_server_errors = retry_server_errors
+        self.respect_retry_after = respect_retry_after
+        self.idempotent_only = idempotent_only
+        self.max_retries = max_retries
+        self.rng = rng if rng is not None else random.Random()
+
+    def can_retry(self, idempotent: bool = True) -> bool:
+        """
+        :param idempotent: whether the request is safe to send twice
+        :return: whether the request may be retried at all
+        """
+        return idempotent or not self.idempotent_only
+
+    def can_retry_status(self, http_code: int, idempotent: bool = True) -> bool:
+        """
+        :param http_code: status code of the failed response
+        :param idempotent: whether the request is safe to send twice
+        :return: whether a request that failed with this http status code should be retried
+        """
+        if not self.can_retry(idempotent):
+            return False
+        return http_code in self.retry_statuses or (self.retry_server_errors and 500 <= http_code < 600)
+
+    def backoff(self, retry_count: int, last_sleep_time: float) -> float:
+        """
+        :param retry_count: the number of retries so far
+        :param last_sleep_time: the previous sleep time, None before the first retry
+        :return: seconds to sleep before the next attempt, before applying the deadline
+        """
+        if self.jitter == DECORRELATED_JITTER:
+            upper = self.base_backoff if last_sleep_time is None else last_sleep_time * 3
+            sleep_time = self.rng.uniform(self.base_backoff, max(upper, self.base_backoff))
+        else:
+            sleep_time = self.base_backoff * (self.multiplier ** retry_count)
+
+        if self.max_backoff is not None:
+            sleep_time = min(sleep_time, self.max_backoff)
+
+        if self.jitter == FULL_JITTER:
+            sleep_time = self.rng.uniform(0, sleep_time)
+        return sleep_time
+
+    def new_context(self, deadline: 'Deadline' = None) -> 'RetryCtx':
+        """
+        :param deadline: the deadline of the call, the retry budget never extends past it
+        :return: the retry state of a new request
+        """
+        timeout = self.deadline
+        if deadline is not None:
+            timeout = deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+        return RetryCtx(timeout=timeout, policy=self)
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class Deadline(object):
+    """
+        The point in time by which a call, retries included, must have completed
+    """
+    def __init__(self, seconds: float):
+        """
+        :param seconds: the time budget of the call, counted from now
+        """
+        self.seconds = seconds
+        self._expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """
+        :return: seconds left before the deadline, negative once it passed
+        """
+        return self._expires_at - time.monotonic()
+
+    def clamp(self, timeout: float) -> float:
+        """
+        :param timeout: a socket timeout in seconds, None for no timeout
+        :return: the timeout shortened to the time left before the deadline
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise IngestTimeoutError(message='Deadline of {} seconds exceeded'.format(self.seconds))
+        return remaining if timeout is None else min(timeout, remaining)
+
+
+def parse_retry_after(value: Text) -> float:
+    """
+    :param value: a Retry-After header, either delay seconds or an http date
+    :return: the number of seconds to wait, None if the header is missing or malformed
+    """
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    from email.utils import parsedate_to_datetime
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+class RetryCtx(object):
+    """
+        Tracks the backoff state of a single request across its retries
+    """
+    def __init__(self, timeout=None, policy: RetryPolicy = None):
+        self.policy = policy if policy is not None else DEFAULT_RETRY_POLICY
+        self.retry_count = 0
+        self.total_timeout = timeout if timeout is not None else self.policy.deadline
+        self._last_sleep_time = None
+        self._request_start_time = time.monotonic()
+
+    def remaining_time(self) -> float:
+        """
+        :return: seconds left of the time budget, None if there is no budget
+        """
+        if self.total_timeout is None:
+            return None
+        return self.total_timeout - (time.monotonic() - self._request_start_time)
+
+    def sleep_time(self, retry_after: Text = None):
+        """
+        :param retry_after: the Retry-After header of the failed response, if any
+        :return: time in seconds to sleep next time, -1 if should not sleep
+        """
+        remaining = self.remaining_time()
+        if remaining is not None and remaining <= 0:
+            logger.info('Request timeout reached.')
+            return -1
+        if self.policy.max_retries is not None and self.retry_count >= self.policy.max_retries:
+            logger.info('Maximum number of retries reached.')
+            return -1
+
+        this_sleep_time = self.policy.backoff(self.retry_count, self._last_sleep_time)
+
+        requested_delay = parse_retry_after(retry_after) if self.policy.respect_retry_after else None
+        if requested_delay is not None:
+            if remaining is not None and requested_delay > remaining:
+                logger.info('Retry-After of %.3f seconds exceeds the remaining time budget.', requested_delay)
+                return -1
+            this_sleep_time = max(this_sleep_time, requested_delay)
+
+        # never sleep past the time budget
+        if remaining is not None:
+            this_sleep_time = min(this_sleep_time, remaining)
+
+        self._last_sleep_time = this_sleep_time
+        self.retry_count += 1
+        logger.info('Retried request. Backoff time %.3f, Retry count %d',
+                    this_sleep_time, self.retry_count)
+        return this_sleep_time
@@ -7,21 +7,20 @@ JWT tokens for authenticating to Snowflake
 
 from datetime import timedelta, datetime
 from logging import getLogger
-from cryptography.exceptions import UnsupportedAlgorithm
-from cryptography.hazmat.primitives.serialization import load_pem_private_key
-from cryptography.hazmat.primitives.serialization import Encoding
-from cryptography.hazmat.primitives.serialization import PublicFormat
-from cryptography.hazmat.backends import default_backend
-from snowflake.connector.util_text import parse_account
 from ..error import IngestClientError
 from ..errorcode import ERR_INVALID_PRIVATE_KEY
+from .instrumentation import IngestObserver
+from .instrumentation import NULL_OBSERVER
 import base64
 import hashlib
+import threading
+import time
 
-import jwt
+# jwt and cryptography take a while to import, they are loaded the first time a token is signed
 
 logger = getLogger(__name__)
 
+from typing import Any, Union
 try:
     from typing import Text
 except ImportError:
@@ -42,15 +41,19 @@ class SecurityManager(object):
     RENEWAL_DELTA = timedelta(minutes=54)  # Tokens will be renewed after 54 minutes
     ALGORITHM = "RS256"  # Tokens will be generated using RSA with SHA256
 
-    def __init__(self, account: Text, user: Text, private_key: Text,
-                 lifetime: timedelta = LIFETIME, renewal_delay: timedelta = RENEWAL_DELTA):
+    def __init__(self, account: Text, user: Text, private_key: Union[Text, bytes, Any],
+                 lifetime: timedelta = LIFETIME, renewal_delay: timedelta = RENEWAL_DELTA,
+                 private_key_passphrase: bytes = None, observer: IngestObserver = None):
         """
         __init__ creates a security manager with the specified context arguments
         :param account: the account in which data is being loaded
         :param user: The user who is loading these files
-        :param private_key: the private key we'll use for signing tokens
+        :param private_key: the private key we'll use for signing tokens, either PEM text or bytes,
+                            or an already loaded cryptography private key object
         :param lifetime: how long this key will live (in minutes)
         :param renewal_delay: how long until the security manager should renew the key
+        :param private_key_passphrase: the passphrase of an encrypted PEM private key
+        :param observer: is told how long each token renewal took
         """
 
         logger.info(
@@ -65,31 +68,114 @@ class SecurityManager(object):
         self.lifetime = lifetime  # the timedelta until our tokens expire
         self.renewal_delay = renewal_delay  # the timedelta until we renew the token
         self.private_key = private_key  # stash the private key
+        self.private_key_passphrase = private_key_passphrase
+        self.observer = observer if observer is not None else NULL_OBSERVER
+        self._signing_key = None  # The parsed private key, loaded once on first use
+        self._issuer = None  # The issuer claim, derived once from the public key fingerprint
         self.renew_time = datetime.utcnow()  # We need to renew the token NOW
         self.token = None  # We initially have no token
+        self.expire_time = None  # The time after which the current token is rejected
+        self._renew_lock = threading.Lock()  # Only one thread signs a new token at a time
+        self._refresher = None  # The optional background refresh thread
+        self._stop_refresh = threading.Event()
 
     def get_token(self) -> Text:
         """
         Regenerates the current token if and only if we have exceeded the renewal time
-        bounds set
+        bounds set. Safe to call from many threads: a single thread renews the token while the
+        others keep using the current one as long as it has not expired
         :return: the new token
         """
         now = datetime.utcnow()  # Fetch the current time
+        token = self.token
+
+        if token is not None and self.renew_time > now:
+            return token
+
+        if token is not None and self.expire_time > now:
+            # Still valid, renew only if no other thread is already doing it
+            if not self._renew_lock.acquire(blocking=False):
+                return token
+        else:
+            # No usable token, wait for whoever is renewing it
+            self._renew_lock.acquire()
+
+        try:
+            return self._renew_token()
+        finally:
+            self._renew_lock.release()
+
+    def get_cached_token(self) -> Text:
+        """
+        Returns the current token if it is not due for renewal yet, without ever signing a token or waiting
+        for another thread that does. For callers that must not block, e.g. an asyncio event loop
+        :return: the token, None when get_token has to be called
+        """
+        token = self.token
+        if token is not None and self.renew_time > datetime.utcnow():
+            return token
+        return None
+
+    def start_background_refresh(self, refresh_ahead: timedelta = timedelta(minutes=1)):
+        """
+        Starts a daemon thread renewing the token refresh_ahead before its renewal time, so that
+        get_token never has to sign a token on the caller's thread
+        :param refresh_ahead: how long before the renewal time the token is renewed
+        """
+        if self._refresher is not None:
+            return
+
+        self._stop_refresh.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, args=(refresh_ahead,),
+                                           name='SecurityManagerRefresh', daemon=True)
+        self._refresher.start()
+
+    def stop_background_refresh(self):
+        """
+        Stops the background refresh thread, if any
+        """
+        if self._refresher is None:
+            return
+
+        self._stop_refresh.set()
+        self._refresher.join()
+        self._refresher = None
+
+    def _refresh_loop(self, refresh_ahead: timedelta):
+        while not self._stop_refresh.is_set():
+            with self._renew_lock:
+                if self.token is None or self.renew_time - refresh_ahead <= datetime.utcnow():
+                    try:
+                        self._renew_token(force=True)
+                    except Exception:
+                        # leave it to get_token to surface the error to callers
+                        logger.warning('Background token renewal failed', exc_info=True)
+                        return
+                wait_time = self.renew_time - refresh_ahead - datetime.utcnow()
+
+            self._stop_refresh.wait(max(wait_time.total_seconds(), 1))
+
+    def _renew_token(self, force: bool = False) -> Text:
+        """
+        Signs a new token unless another thread already renewed it, callers must hold the renewal lock
+        :param force: renew the token even though its renewal time has not come yet
+        :return: the current token
+        """
+        now = datetime.utcnow()  # Fetch the current time
 
         # If the token has expired, or doesn't exist, regenerate it
-        if self.token is None or self.renew_time <= now:
-            logger.info("Renewing token because renewal time (%s) is eclipsed by present time (%s)",
-                        self.renew_time, now)
-            # Calculate the next time we need to renew the token
-            self.renew_time = now + self.renewal_delay
+        if self.token is None or self.renew_time <= now or force:
+            logger.debug("Renewing token because renewal time (%s) is eclipsed by present time (%s)",
+                         self.renew_time, now)
+            start_time = time.monotonic()
 
-            public_key_fp = self.calculate_public_key_fingerprint(self.private_key)
+            signing_key = self._get_signing_key()
 
             # Create our payload
             payload = {
 
                 # The issuer is the public key fingerprint
-                ISSUER: self.qualified_username + '.' + public_key_fp,
+                ISSUER: self._issuer,
 
                 # subject is user's fully qualified username
                 SUBJECT: self.qualified_username,
@@ -102,23 +188,42 @@ class SecurityManager(object):
             }
 
             # Regenerate the actual token
-            self.token = jwt.encode(payload, self.private_key, algorithm=SecurityManager.ALGORITHM)
-            logger.info("New Token created")
+            import jwt
+            token = jwt.encode(payload, signing_key, algorithm=SecurityManager.ALGORITHM)
+
+            # Publish the expiry before the token so lock free readers never see a new token with an old expiry
+            self.expire_time = now + SecurityManager.LIFETIME
+            self.token = token.decode('utf-8') if isinstance(token, bytes) else token
+            # Calculate the next time we need to renew the token
+            self.renew_time = now + self.renewal_delay
+            logger.debug("New Token created")
+            self.observer.on_token_renewal(time.monotonic() - start_time)
 
-        return self.token.decode('utf-8') if isinstance(self.token, bytes) else self.token
+        return self.token
 
-    def calculate_public_key_fingerprint(self, private_key: Text) -> Text:
+    def _get_signing_key(self) -> Any:
+        """
+        Parses the private key and derives the issuer claim the first time a token is signed,
+        callers must hold the renewal lock
+        :return: the loaded private key object
+        """
+        if self._signing_key is None:
+            signing_key = load_private_key(self.private_key, self.private_key_passphrase)
+            self._issuer = self.qualified_username + '.' + self.calculate_public_key_fingerprint(signing_key)
+            self._signing_key = signing_key
+
+        return self._signing_key
+
+    def calculate_public_key_fingerprint(self, private_key: Union[Text, bytes, Any]) -> Text:
         """
         Given a private key in pem format, return the public key fingerprint
-        :param private_key: private key string
+        :param private_key: private key string, PEM bytes or loaded private key object
         :return: public key fingerprint
         """
-        try:
-            private_key = load_pem_private_key(private_key.encode(), None, default_backend())
-        except (ValueError,  UnsupportedAlgorithm) as e:
-            raise IngestClientError(
-                    code=ERR_INVALID_PRIVATE_KEY,
-                    message='Invalid private key. {}'.format(e))
+        from cryptography.hazmat.primitives.serialization import Encoding
+        from cryptography.hazmat.primitives.serialization import PublicFormat
+
+        private_key = load_private_key(private_key, self.private_key_passphrase)
 
         # get the raw bytes of public key
         public_key_raw = private_key.public_key().public_bytes(Encoding.DER, PublicFormat.SubjectPublicKeyInfo)
@@ -128,9 +233,50 @@ class SecurityManager(object):
         sha256hash.update(public_key_raw)
 
         public_key_fp = 'SHA256:' + base64.b64encode(sha256hash.digest()).decode('utf-8')
-        logger.info("Public key fingerprint is %s", public_key_fp)
+        logger.debug("Public key fingerprint is %s", public_key_fp)
 
         return public_key_fp
 
     def get_account(self) -> Text:
         return self.account
+
+
+def load_private_key(private_key: Union[Text, bytes, Any], passphrase: bytes = None) -> Any:
+    """
+    Loads a PEM encoded private key, objects that are already loaded are returned as is
+    :param private_key: private key string, PEM bytes or loaded private key object
+    :param passphrase: the passphrase of an encrypted PEM private key
+    :return: the loaded private key object
+    """
+    if isinstance(private_key, str):
+        private_key = private_key.encode()
+    elif not isinstance(private_key, bytes):
+        return private_key
+
+    from cryptography.exceptions import UnsupportedAlgorithm
+    from cryptography.hazmat.primitives.serialization import load_pem_private_key
+    from cryptography.hazmat.backends import default_backend
+
+    try:
+        return load_pem_private_key(private_key, passphrase, default_backend())
+    except (ValueError, TypeError, UnsupportedAlgorithm) as e:
+        raise IngestClientError(
+                code=ERR_INVALID_PRIVATE_KEY,
+                message='Invalid private key. {}'.format(e))
+
+
+def parse_account(account: Text) -> Text:
+    """
+    Trims an account name that was given with its region or organization suffix, the same
+    way the python connector does
+    :param account: the account name, e.g. ACCOUNT.us-east-1 or ACCOUNT-ID.global
+    :return: the account locator, e.g. ACCOUNT
+    """
+    url_parts = account.split('.')
+    if len(url_parts) > 1:
+        if url_parts[1] == 'global':
+            # remove external ID from account
+            return url_parts[0][0:url_parts[0].rfind('-')]
+        # remove region subdomain
+        return url_parts[0]
+    return account
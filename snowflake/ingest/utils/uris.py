@@ -6,8 +6,10 @@ requests and history requests
 """
 
 from uuid import uuid4, UUID
-from furl import furl
+from urllib.parse import quote, quote_plus, unquote
+from functools import lru_cache
 from logging import getLogger
+import re
 
 # Create a logger for this module
 logger = getLogger(__name__)
@@ -39,6 +41,35 @@ HISTORY_BEGIN_MARK = 'beginMark'
 HISTORY_RANGE_START_INCLUSIVE = 'startTimeInclusive'
 HISTORY_RANGE_END_EXCLUSIVE = 'endTimeExclusive'
 
+# Ports that are implied by the scheme and therefore left out of the URL
+DEFAULT_SCHEME_PORTS = {"http": 80, "https": 443}
+# Characters left unescaped in a path segment (RFC 3986 pchar), everything else is percent encoded
+SAFE_SEGMENT_CHARS = ":@-._~!$&'()*+,;="
+# Matches a path segment that is already percent encoded and is decoded before being re-encoded
+ENCODED_SEGMENT_REGEX = re.compile(r'^([\w%s]|(\%%[a-fA-F\d][a-fA-F\d]))*$' % re.escape(SAFE_SEGMENT_CHARS))
+
+
+def _encode_query_value(value: Text) -> Text:
+    """
+    _encode_query_value - form encodes a query parameter value, spaces become '+'
+    """
+    return quote_plus(value, safe='')
+
+
+@lru_cache(maxsize=1024)
+def _encode_path(path: Text) -> Text:
+    """
+    _encode_path - percent encodes every segment of an endpoint path. Segments that are already
+    encoded are decoded first so that they are not encoded twice
+    """
+    segments = []
+    for segment in path.split('/'):
+        if ENCODED_SEGMENT_REGEX.match(segment) is not None:
+            segment = unquote(segment)
+        segments.append(quote(segment, SAFE_SEGMENT_CHARS))
+    return '/'.join(segments)
+
+
 # Method to generate an the URL for an ingest request for a given table, and stage
 class URLGenerator(object):
     """
@@ -48,31 +79,42 @@ class URLGenerator(object):
     def __init__(self, host: Text, scheme: Text = DEFAULT_SCHEME, port: int = DEFAULT_PORT):
         """
         This constructor simply stashes the basic portions of the request URL such that the user
-        doesn't have to repeatedly provide them
+        doesn't have to repeatedly provide them, and precomputes the scheme://host:port prefix
         """
         self.scheme = scheme
         self.host = host
         self.port = port
 
-    def _make_base_url(self, uuid: UUID = None) -> furl:
+        scheme = scheme.lower()
+        netloc = host.lower()
+        if not netloc.isascii():
+            netloc = netloc.encode('idna').decode('ascii')
+        if port is not None and int(port) != DEFAULT_SCHEME_PORTS.get(scheme):
+            netloc += ':' + str(int(port))
+        self._prefix = scheme + '://' + netloc
+
+    def _make_url(self, endpoint_format: Text, pipe: Text, uuid: UUID = None, *params) -> Text:
         """
-        _makeBaseURL - generates the common base URL for all of our requests
-        :param uuid: a UUID we want to attach to the
-        :return: the furl wrapper around our unfinished base url
+        _make_url - generates the complete URL of an endpoint
+        :param endpoint_format: the endpoint path template
+        :param pipe: the pipe the request targets
+        :param uuid: a UUID we want to attach to the request, one is generated if omitted
+        :param params: additional (name, value) query parameters, those with a None value are skipped
+        :return: the completed URL
         """
-        base = furl()  # Create an uninitialized base URI object
-        base.host = self.host  # set the host name
-        base.port = self.port  # set the port number
-        base.scheme = self.scheme  # set the access scheme
-
         # if we have no uuid to attach to this request, generate one
         if uuid is None:
             uuid = uuid4()
 
         # Set the request id parameter uuid
-        base.args[REQUEST_ID_PARAMETER] = str(uuid)
+        url = [self._prefix, _encode_path(endpoint_format.format(pipe)),
+               '?', REQUEST_ID_PARAMETER, '=', _encode_query_value(str(uuid))]
 
-        return base
+        for name, value in params:
+            if value is not None:
+                url += ('&', name, '=', _encode_query_value(str(value)))
+
+        return ''.join(url)
 
     def make_ingest_url(self, pipe: Text, uuid: UUID = None) -> Text:
         """
@@ -82,14 +124,7 @@ class URLGenerator(object):
         :param uuid: an optional UUID argument to tag this request
         :return: the completed URL
         """
-
-        # Compute the base url
-        builder = self._make_base_url(uuid)
-
-        # Set the path for the ingest url
-        builder.path = INGEST_ENDPOINT_FORMAT.format(pipe)
-
-        return builder.url
+        return self._make_url(INGEST_ENDPOINT_FORMAT, pipe, uuid)
 
     def make_history_url(self, pipe: Text, recent_seconds: int = None,
             begin_mark: Text = None, uuid: UUID = None) -> Text:
@@ -103,20 +138,9 @@ class URLGenerator(object):
                            return
         :return: the completed URL
         """
-
-        # Compute the base url
-        builder = self._make_base_url(uuid)
-
-        # Set the path for the history url
-        builder.path = HISTORY_ENDPOINT_FORMAT.format(pipe)
-        
-        if recent_seconds is not None:
-            builder.args[RECENT_HISTORY_IN_SECONDS_PARAMETER] = str(recent_seconds)
-
-        if begin_mark is not None:
-            builder.args[HISTORY_BEGIN_MARK] = str(begin_mark)
-
-        return builder.url
+        return self._make_url(HISTORY_ENDPOINT_FORMAT, pipe, uuid,
+                              (RECENT_HISTORY_IN_SECONDS_PARAMETER, recent_seconds),
+                              (HISTORY_BEGIN_MARK, begin_mark))
 
     def make_history_range_url(self, pipe: Text, start_time_inclusive: Text,
             end_time_exclusive: Text = None, uuid: UUID = None) -> Text:
@@ -130,16 +154,6 @@ class URLGenerator(object):
                                     If omitted, then CURRENT_TIMESTAMP() is used as the end of the range.
         :return: the completed URL
         """
-
-        # Compute the base url
-        builder = self._make_base_url(uuid)
-
-        # Set the path for the history url
-        builder.path = HISTORY_SCAN_ENDPOINT_FORMAT.format(pipe)
-
-        builder.args[HISTORY_RANGE_START_INCLUSIVE] = start_time_inclusive
-
-        if end_time_exclusive is not None:
-            builder.args[HISTORY_RANGE_END_EXCLUSIVE] = end_time_exclusive
-
-        return builder.url
+        return self._make_url(HISTORY_SCAN_ENDPOINT_FORMAT, pipe, uuid,
+                              (HISTORY_RANGE_START_INCLUSIVE, start_time_inclusive),
+                              (HISTORY_RANGE_END_EXCLUSIVE, end_time_exclusive))
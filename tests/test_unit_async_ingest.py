@@ -0,0 +1,159 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_async_ingest.py - Tests AsyncSimpleIngestManager against a local http stub
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+import asyncio
+import threading
+import json
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from snowflake.ingest import AsyncSimpleIngestManager
+from snowflake.ingest import StagedFile
+from snowflake.ingest.error import IngestResponseError
+from snowflake.ingest.testing import MockSnowpipeServer
+from snowflake.ingest.utils.async_network import AsyncSnowflakeRestful
+from snowflake.ingest.utils.async_network import ocsp_connector_factory
+from snowflake.ingest.utils.codec import JsonCodec
+from snowflake.ingest.utils.retry import RetryPolicy
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """
+    Fails the first request with a 503, then answers every call with a canned body
+    """
+    calls = []
+
+    def _reply(self):
+        self.calls.append(self.path)
+        if len(self.calls) == 1:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        body = {'responseCode': 'SUCCESS'} if 'insertFiles' in self.path else \
+            {'files': [], 'nextBeginMark': '1_0'}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self._reply()
+
+    def do_GET(self):
+        self._reply()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_async_ingest_with_retry(test_util):
+    """
+    Tests that async calls retry retryable errors and update the history cursor
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    private_key, _ = test_util.generate_key_pair()
+
+    async def run():
+        async with AsyncSimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key,
+                                            scheme='http', host='127.0.0.1',
+                                            port=server.server_port,
+                                            retry_policy=RetryPolicy(base_backoff=0.01)) as manager:
+            ingest_resp = await manager.ingest_files([StagedFile('a.csv', None)])
+            history_resp = await manager.get_history()
+            return manager, ingest_resp, history_resp
+
+    try:
+        manager, ingest_resp, history_resp = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    assert ingest_resp['responseCode'] == 'SUCCESS'
+    assert history_resp['files'] == []
+    assert manager._next_begin_mark == '1_0'
+    assert len(_StubHandler.calls) == 3
+
+
+class _CountingCodec(JsonCodec):
+    def __init__(self):
+        self.decoded = 0
+
+    def loads(self, data):
+        self.decoded += 1
+        return super().loads(data)
+
+
+def test_async_error_body_decoded_with_codec(test_util):
+    """
+    Tests that the body of a failed request is decoded by the codec of the restful
+    """
+    private_key, _ = test_util.generate_key_pair()
+    codec = _CountingCodec()
+
+    async def run():
+        async with AsyncSimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key,
+                                            scheme='http', host='127.0.0.1', port=server.port,
+                                            restful=AsyncSnowflakeRestful(codec=codec)) as manager:
+            await manager.ingest_files([StagedFile('a.csv', None)])
+
+    with MockSnowpipeServer() as server:
+        server.fail_next(400)
+        with pytest.raises(IngestResponseError) as error:
+            asyncio.run(run())
+
+    assert error.value.http_error_code == 400 and error.value.code == '400'
+    assert codec.decoded == 1
+
+
+def test_token_signed_off_the_event_loop(test_util):
+    """
+    Tests that a token is signed in the executor and the cached token is then read on the loop
+    """
+    private_key, _ = test_util.generate_key_pair()
+    signing_threads = []
+
+    async def run():
+        async with AsyncSimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key,
+                                            scheme='http', host='127.0.0.1', port=server.port) as manager:
+            get_token = manager.sec_manager.get_token
+
+            def recording_get_token():
+                signing_threads.append(threading.current_thread())
+                return get_token()
+
+            manager.sec_manager.get_token = recording_get_token
+            await manager.ingest_files([StagedFile('a.csv', None)])
+            await manager.ingest_files([StagedFile('b.csv', None)])
+
+    with MockSnowpipeServer() as server:
+        asyncio.run(run())
+
+    assert len(signing_threads) == 1 and signing_threads[0] is not threading.main_thread()
+
+
+def test_ocsp_connector():
+    """
+    Tests that the pooled connections check certificates with the connector's OCSP check unless disabled
+    """
+    pytest.importorskip('snowflake.connector.aio')
+
+    async def connectors():
+        checked, unchecked = AsyncSnowflakeRestful(), AsyncSnowflakeRestful(ocsp_check=False)
+        try:
+            return type(checked._get_session().connector), type(unchecked._get_session().connector)
+        finally:
+            await checked.close()
+            await unchecked.close()
+
+    checked, unchecked = asyncio.run(connectors())
+    assert checked is ocsp_connector_factory().func
+    assert unchecked.__name__ == 'TCPConnector'
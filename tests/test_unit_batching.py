@@ -0,0 +1,76 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_batching.py - Tests splitting staged files into insertFiles requests
+"""
+
+from snowflake.ingest import SimpleIngestManager
+from snowflake.ingest import StagedFile
+from snowflake.ingest.utils.batching import iter_batches
+from snowflake.ingest.utils.batching import iter_batches_by_pipe
+from snowflake.ingest.utils.batching import estimate_file_entry_bytes
+from snowflake.ingest.utils.batching import PAYLOAD_OVERHEAD
+import json
+import threading
+
+
+def test_batches_by_count_and_bytes():
+    """
+    Tests that batches respect both the file count and payload size limits
+    """
+    files = (StagedFile('dir/file_{}.csv'.format(i), 100) for i in range(25))
+    assert [len(b) for b in iter_batches(files, max_files=10, max_bytes=None)] == [10, 10, 5]
+
+    files = [StagedFile('dir/file_{}.csv'.format(i), 100) for i in range(25)]
+    max_bytes = PAYLOAD_OVERHEAD + 4 * estimate_file_entry_bytes(files[0])
+    batches = list(iter_batches(files, max_files=10, max_bytes=max_bytes))
+
+    assert [f for b in batches for f in b] == files
+    for batch in batches:
+        assert len(json.dumps({'files': [x._asdict() for x in batch]})) <= max_bytes
+
+
+def test_batches_by_pipe():
+    """
+    Tests that a mixed stream is split into full batches per pipe, with the partial ones at the end
+    """
+    work = [('PIPE{}'.format(i % 2), StagedFile('dir/file_{:02d}.csv'.format(i), 100)) for i in range(11)]
+    batches = [(pipe, [f.path for f in batch]) for pipe, batch in iter_batches_by_pipe(work, max_files=2)]
+
+    assert batches == [
+        ('PIPE0', ['dir/file_00.csv', 'dir/file_02.csv']),
+        ('PIPE1', ['dir/file_01.csv', 'dir/file_03.csv']),
+        ('PIPE0', ['dir/file_04.csv', 'dir/file_06.csv']),
+        ('PIPE1', ['dir/file_05.csv', 'dir/file_07.csv']),
+        ('PIPE0', ['dir/file_08.csv', 'dir/file_10.csv']),
+        ('PIPE1', ['dir/file_09.csv']),
+    ]
+
+    max_bytes = PAYLOAD_OVERHEAD + 3 * estimate_file_entry_bytes(work[0][1])
+    assert [len(batch) for _, batch in iter_batches_by_pipe(work, max_bytes=max_bytes)] == [3, 3, 3, 2]
+
+
+def test_ingest_files_in_batches(test_util, monkeypatch):
+    """
+    Tests that every file is mapped to the response of the request that carried it
+    """
+    private_key, _ = test_util.generate_key_pair()
+    manager = SimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key)
+    lock = threading.Lock()
+    requests = []
+
+    def fake_ingest_files(staged_files, request_id=None):
+        with lock:
+            requests.append(list(staged_files))
+            return {'requestId': str(len(requests)), 'responseCode': 'SUCCESS'}
+
+    monkeypatch.setattr(manager, 'ingest_files', fake_ingest_files)
+
+    for max_workers in (1, 3):
+        requests.clear()
+        files = (StagedFile('file_{}.csv'.format(i), None) for i in range(12))
+        results = manager.ingest_files_in_batches(files, max_files=5, max_workers=max_workers)
+
+        assert len(results) == 12
+        assert sorted(len(b) for b in requests) == [2, 5, 5]
+        for batch in requests:
+            assert len({results[f.path]['requestId'] for f in batch}) == 1
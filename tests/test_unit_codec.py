@@ -0,0 +1,65 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_codec.py - Tests the JSON codecs used for request and response bodies
+"""
+
+from snowflake.ingest import SimpleIngestManager
+from snowflake.ingest import StagedFile
+from snowflake.ingest.utils.codec import CODECS
+from snowflake.ingest.utils.codec import get_codec
+from requests import Response
+import json
+import pytest
+
+STAGED_FILES = [StagedFile('a.csv', 10), StagedFile('dir/"quoted" \\ é.csv', None), StagedFile('b.csv', 2.5)]
+
+
+def available_codecs():
+    codecs = []
+    for name in CODECS:
+        try:
+            codecs.append(get_codec(name))
+        except ImportError:
+            pass
+    return codecs
+
+
+@pytest.mark.parametrize('codec', available_codecs(), ids=lambda codec: codec.name)
+def test_encode_files_matches_asdict(codec):
+    """
+    Tests that the direct encoding produces the same document as the per-file dicts did
+    """
+    expected = {'files': [x._asdict() for x in STAGED_FILES]}
+
+    assert json.loads(codec.encode_files(STAGED_FILES)) == expected
+    assert codec.loads(codec.dumps(expected)) == expected
+    assert codec.encode_files([]) == b'{"files":[]}'
+
+
+def test_get_codec():
+    assert get_codec() is get_codec()
+    assert get_codec('json').name == 'json'
+    with pytest.raises(ValueError):
+        get_codec('yaml')
+
+
+def test_manager_sends_encoded_files(test_util, monkeypatch):
+    """
+    Tests that insertFiles sends the encoded bytes with a JSON content type
+    """
+    private_key, _ = test_util.generate_key_pair()
+    manager = SimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key)
+    sent = []
+
+    def send(**kwargs):
+        sent.append(kwargs)
+        response = Response()
+        response.status_code = 200
+        response._content = b'{"responseCode": "SUCCESS"}'
+        return response
+
+    monkeypatch.setattr(manager.restful, '_exec_request', send)
+
+    assert manager.ingest_files(STAGED_FILES) == {'responseCode': 'SUCCESS'}
+    assert sent[0]['headers']['Content-Type'] == 'application/json'
+    assert json.loads(sent[0]['data']) == {'files': [x._asdict() for x in STAGED_FILES]}
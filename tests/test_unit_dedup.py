@@ -0,0 +1,72 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_dedup.py - Tests the path indexes and skipping already ingested files
+"""
+
+from snowflake.ingest import IngestDeduplicator
+from snowflake.ingest import StagedFile
+from snowflake.ingest.testing import MockSnowpipeServer
+from snowflake.ingest.utils import InMemoryMetricsCollector
+from snowflake.ingest.utils.network import SnowflakeRestful
+from snowflake.ingest.utils.path_index import LRUPathIndex
+from snowflake.ingest.utils.path_index import BloomPathIndex
+from datetime import timedelta
+
+PIPE = 'TESTDB.TESTSCHEMA.TESTPIPE'
+
+
+class _FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_index():
+    clock = _FakeClock()
+    index = LRUPathIndex(capacity=2, ttl=timedelta(seconds=10), clock=clock)
+    index.add('a')
+    index.add('b')
+    assert 'a' in index  # and a is now the most recently used
+    index.add('c')
+    assert 'b' not in index
+    assert 'a' in index and 'c' in index
+
+    clock.now = 10
+    assert 'a' not in index
+    assert len(index) == 1
+
+
+def test_bloom_index():
+    index = BloomPathIndex(capacity=1000, error_rate=1e-4)
+    for i in range(1000):
+        index.add('known/{}'.format(i))
+
+    # a full generation is kept as the previous one
+    assert all('known/{}'.format(i) in index for i in range(1000))
+    assert sum('other/{}'.format(i) in index for i in range(10000)) <= 5
+
+    for i in range(1000):
+        index.add('newer/{}'.format(i))
+    assert 'known/0' not in index
+    assert 'newer/0' in index
+
+
+def test_skip_submitted_and_loaded_files(test_util):
+    private_key, _ = test_util.generate_key_pair()
+    metrics = InMemoryMetricsCollector()
+    with MockSnowpipeServer() as server, \
+            server.make_manager(PIPE, private_key, restful=SnowflakeRestful(observer=metrics)) as manager:
+        # another client already loaded b
+        server.make_manager(PIPE, private_key).ingest_files([StagedFile('b', 1)])
+        deduplicator = IngestDeduplicator(manager)
+        deduplicator.get_history()
+
+        deduplicator.ingest_files([StagedFile('a', 1), StagedFile('b', 1), StagedFile('a', 1)])
+        assert deduplicator.ingest_files([StagedFile('a', 1)]) is None
+
+        assert [record['path'] for record in server.history(PIPE)] == ['b', 'a']
+        assert server.request_counts['insertFiles'] == 2
+        assert deduplicator.skipped == 3
+        assert metrics.snapshot()['files_skipped'] == {PIPE: 3}
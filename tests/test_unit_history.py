@@ -0,0 +1,102 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_history.py - Tests streaming the ingest history
+"""
+
+from snowflake.ingest import SimpleIngestManager
+from snowflake.ingest import simple_ingest_manager
+from snowflake.ingest import StagedFile
+from snowflake.ingest.error import IngestClientError
+from snowflake.ingest.testing import MockSnowpipeServer
+from snowflake.ingest.utils.history import PollBackoff
+from snowflake.ingest.utils.history import format_timestamp
+from datetime import datetime, timedelta
+import pytest
+
+
+def test_poll_backoff():
+    backoff = PollBackoff(poll_interval=1, max_poll_interval=5)
+    assert [backoff.next_sleep_time(False) for _ in range(4)] == [2, 4, 5, 5]
+    assert backoff.next_sleep_time(True) == 1
+
+
+def test_iter_history(test_util, monkeypatch):
+    """
+    Tests that iter_history follows its own cursor, drops duplicates and backs off on empty polls
+    """
+    private_key, _ = test_util.generate_key_pair()
+    manager = SimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key)
+
+    pages = {
+        None: {'files': [{'path': 'a', 'status': 'LOAD_IN_PROGRESS', 'lastInsertTime': 't1'}],
+               'nextBeginMark': '1'},
+        '1': {'files': [{'path': 'a', 'status': 'LOAD_IN_PROGRESS', 'lastInsertTime': 't1'},
+                        {'path': 'a', 'status': 'LOADED', 'lastInsertTime': 't1'}],
+              'nextBeginMark': '2'},
+        '2': {'files': [], 'nextBeginMark': '2'},
+    }
+    begin_marks = []
+    sleeps = []
+
+    def fake_get_history(recent_seconds=None, begin_mark=None, request_id=None):
+        begin_marks.append(begin_mark)
+        return pages[begin_mark]
+
+    monkeypatch.setattr(manager, '_get_history', fake_get_history)
+    monkeypatch.setattr(simple_ingest_manager.time, 'sleep', sleeps.append)
+
+    records = list(manager.iter_history(poll_interval=1, stop_when=lambda: len(begin_marks) >= 4))
+
+    assert [r['status'] for r in records] == ['LOAD_IN_PROGRESS', 'LOADED']
+    assert begin_marks == [None, '1', '2', '2']
+    assert sleeps == [1, 1, 2]
+    assert manager._next_begin_mark is None
+
+
+def test_scan_history_range(test_util, monkeypatch):
+    """
+    Tests that a range is fetched window by window, retried per window and merged in time order
+    """
+    private_key, _ = test_util.generate_key_pair()
+    manager = SimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key)
+    calls = []
+
+    def fake_get_history_range(start_time_inclusive, end_time_exclusive=None, request_id=None):
+        calls.append((start_time_inclusive, end_time_exclusive))
+        if start_time_inclusive == '2024-01-01T01:00:00.000Z' and calls.count(calls[-1]) == 1:
+            raise ValueError('transient')
+        hour = start_time_inclusive[11:13]
+        return {'files': [{'path': 'f' + hour + 'b', 'lastInsertTime': start_time_inclusive[:14] + '30'},
+                          {'path': 'f' + hour + 'a', 'lastInsertTime': start_time_inclusive[:14] + '10'},
+                          {'path': 'f00a', 'lastInsertTime': '2024-01-01T00:10'}]}
+
+    monkeypatch.setattr(manager, 'get_history_range', fake_get_history_range)
+    records = manager.scan_history_range('2024-01-01T00:00:00Z', '2024-01-01T03:30:00+00:00',
+                                         window=timedelta(hours=1), max_workers=2)
+
+    assert [r['path'] for r in records] == ['f00a', 'f00b', 'f01a', 'f01b', 'f02a', 'f02b', 'f03a', 'f03b']
+    assert sorted(set(calls)) == [('2024-01-01T00:00:00.000Z', '2024-01-01T01:00:00.000Z'),
+                                  ('2024-01-01T01:00:00.000Z', '2024-01-01T02:00:00.000Z'),
+                                  ('2024-01-01T02:00:00.000Z', '2024-01-01T03:00:00.000Z'),
+                                  ('2024-01-01T03:00:00.000Z', '2024-01-01T03:30:00.000Z')]
+    assert len(calls) == 5
+
+
+def test_scan_history_range_pages_incomplete_windows(test_util, monkeypatch):
+    """
+    Tests that a window holding more records than one response is fetched page by page
+    """
+    private_key, _ = test_util.generate_key_pair()
+    with MockSnowpipeServer(page_size=100) as server, server.make_manager('DB.SCHEMA.PIPE', private_key) as manager:
+        manager.ingest_files([StagedFile('file_{:03d}'.format(i), 1) for i in range(250)])
+        start = format_timestamp(datetime.utcnow() - timedelta(hours=1))
+        records = list(manager.scan_history_range(start, window=timedelta(hours=2)))
+
+        assert [record['path'] for record in records] == ['file_{:03d}'.format(i) for i in range(250)]
+        assert server.request_counts['loadHistoryScan'] == 3
+
+        # a page that does not move past its start cannot be continued
+        monkeypatch.setattr(manager, 'get_history_range', lambda start_time_inclusive, end_time_exclusive=None: {
+            'completeResult': False, 'rangeEndTime': start_time_inclusive, 'files': []})
+        with pytest.raises(IngestClientError):
+            list(manager.scan_history_range(start, window=timedelta(hours=2)))
@@ -0,0 +1,46 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_import_time.py - Checks that importing snowflake.ingest leaves the heavy dependencies
+to be loaded on first use, with the import time profile of a fresh interpreter
+"""
+
+import subprocess
+import sys
+
+# top level packages that are only needed once a request is sent or a token is signed, and the ones only
+# the async manager and the journal need
+LAZY_DEPENDENCIES = ('snowflake.connector', 'requests', 'jwt', 'cryptography', 'aiohttp', 'asyncio', 'sqlite3')
+
+
+def import_profile(statement):
+    """
+    :return: the cumulative import time in microseconds of every module imported by statement
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        profile[module.strip()] = int(cumulative)
+    return profile
+
+
+def test_import_defers_heavy_dependencies():
+    profile = import_profile('import snowflake.ingest')
+
+    assert 'snowflake.ingest' in profile
+    loaded = [module for module in profile
+              if any(module == name or module.startswith(name + '.') for name in LAZY_DEPENDENCIES)]
+    assert loaded == []
+
+
+def test_lazy_exports():
+    import snowflake.ingest
+    from snowflake.ingest.async_ingest_manager import AsyncSimpleIngestManager
+    from snowflake.ingest.journal import IngestJournal
+
+    assert snowflake.ingest.AsyncSimpleIngestManager is AsyncSimpleIngestManager
+    assert snowflake.ingest.IngestJournal is IngestJournal
+    assert 'IngestJournal' in dir(snowflake.ingest)
@@ -0,0 +1,115 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_ingest_buffer.py - Tests micro-batching of files submitted from many threads
+"""
+
+from snowflake.ingest import IngestBuffer
+from snowflake.ingest import StagedFile
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import pytest
+
+
+class _FakeManager(object):
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def ingest_files(self, staged_files, request_id=None):
+        with self._lock:
+            self.requests.append(list(staged_files))
+            if self.fail:
+                raise ValueError('boom')
+            return {'requestId': str(len(self.requests)), 'responseCode': 'SUCCESS'}
+
+
+def test_flush_on_count():
+    """
+    Tests that files submitted from several threads are sent in full batches
+    """
+    manager = _FakeManager()
+    with IngestBuffer(manager, max_files=10, max_age=60) as buffer:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = list(executor.map(lambda i: buffer.submit(StagedFile('f{}'.format(i), None)), range(30)))
+
+        responses = [f.result(timeout=5) for f in futures]
+
+    assert [len(b) for b in manager.requests] == [10, 10, 10]
+    assert len({r['requestId'] for r in responses}) == 3
+    assert sorted(r['file']['path'] for r in responses) == sorted('f{}'.format(i) for i in range(30))
+    assert responses[0] == {'requestId': responses[0]['requestId'], 'responseCode': 'SUCCESS',
+                            'file': {'path': responses[0]['file']['path'], 'size': None}}
+
+
+def test_flush_on_age_and_close():
+    """
+    Tests that a partial batch is sent once it is old enough, and the rest on close
+    """
+    manager = _FakeManager()
+    buffer = IngestBuffer(manager, max_files=100, max_age=0.1)
+    first = buffer.submit(StagedFile('a', None))
+    assert first.result(timeout=5)['requestId'] == '1'
+
+    second = buffer.submit(StagedFile('b', None))
+    buffer.close()
+    assert second.done()
+
+    with pytest.raises(RuntimeError):
+        buffer.submit(StagedFile('c', None))
+
+
+def test_failure_propagates_to_futures():
+    """
+    Tests that a failed request fails the futures of every file it carried
+    """
+    with IngestBuffer(_FakeManager(fail=True), max_age=60) as buffer:
+        future = buffer.submit(StagedFile('a', None))
+        buffer.flush(timeout=5)
+
+    with pytest.raises(ValueError):
+        future.result()
+
+
+def test_cancelled_future():
+    """
+    Tests that a file whose future was cancelled is not sent and the buffer keeps working
+    """
+    manager = _FakeManager()
+    with IngestBuffer(manager, max_age=60) as buffer:
+        cancelled = buffer.submit(StagedFile('a', None))
+        kept = buffer.submit(StagedFile('b', None))
+        assert cancelled.cancel()
+        buffer.flush(timeout=5)
+
+        later = buffer.submit(StagedFile('c', None))
+        buffer.flush(timeout=5)
+
+    assert kept.result(0)['requestId'] == '1'
+    assert later.result(0)['requestId'] == '2'
+    assert manager.requests == [[StagedFile('b', None)], [StagedFile('c', None)]]
+
+
+def test_submit_racing_close():
+    """
+    Tests that every file accepted while another thread closes the buffer is resolved
+    """
+    for _ in range(20):
+        buffer = IngestBuffer(_FakeManager(), max_files=5, max_age=60)
+        accepted = []
+
+        def produce():
+            try:
+                while True:
+                    accepted.append(buffer.submit(StagedFile('f', None)))
+            except RuntimeError:
+                pass
+
+        producers = [threading.Thread(target=produce) for _ in range(4)]
+        for producer in producers:
+            producer.start()
+        buffer.close()
+        for producer in producers:
+            producer.join()
+
+        assert all(future.done() for future in accepted)
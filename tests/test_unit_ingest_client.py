@@ -0,0 +1,68 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_ingest_client.py - Tests the multi-pipe IngestClient
+"""
+
+from snowflake.ingest import IngestClient
+from snowflake.ingest import StagedFile
+from snowflake.ingest.error import IngestResponseError
+from snowflake.ingest.utils import InMemoryMetricsCollector
+from snowflake.ingest.utils.retry import RetryPolicy
+from requests import Response
+import threading
+import pytest
+
+
+def make_response(status_code, body):
+    response = Response()
+    response.status_code = status_code
+    response._content = body
+    return response
+
+
+def test_pipes_share_state(test_util):
+    private_key, _ = test_util.generate_key_pair()
+    with IngestClient('testaccount', 'snowman', private_key) as client:
+        first = client.pipe('DB.SCHEMA.PIPE1')
+        second = client.pipe('DB.SCHEMA.PIPE2')
+
+        assert client.pipe('DB.SCHEMA.PIPE1') is first
+        assert first.sec_manager is second.sec_manager is client.sec_manager
+        assert first.restful is second.restful is client.restful
+        assert first.url_engine is second.url_engine
+        assert (first.pipe, second.pipe) == ('DB.SCHEMA.PIPE1', 'DB.SCHEMA.PIPE2')
+
+        # closing a pipe leaves the shared pool open
+        session = client.restful._get_session('https://testaccount.snowflakecomputing.com')
+        first.close()
+        assert client.restful._sessions['testaccount.snowflakecomputing.com'] is session
+
+
+def test_ingest_files_to_pipes(test_util, monkeypatch):
+    """
+    Tests that the requests fan out concurrently, with a single token for every pipe
+    """
+    private_key, _ = test_util.generate_key_pair()
+    collector = InMemoryMetricsCollector()
+    client = IngestClient('testaccount', 'snowman', private_key, observer=collector, max_workers=4,
+                          retry_policy=RetryPolicy(max_retries=0))
+    barrier = threading.Barrier(4, timeout=5)
+
+    def send(url, **kwargs):
+        if 'BROKEN' in url:
+            return make_response(400, b'{}')
+        barrier.wait()  # only returns once four requests are in flight together
+        return make_response(200, b'{"responseCode": "SUCCESS"}')
+
+    monkeypatch.setattr(client.restful, '_exec_request', send)
+    files = {'DB.SCHEMA.PIPE{}'.format(i): [StagedFile('{}.csv'.format(i), None)] for i in range(8)}
+
+    results = client.ingest_files_to_pipes(files)
+    assert set(results) == set(files)
+    assert all(result['responseCode'] == 'SUCCESS' for result in results.values())
+    assert collector.snapshot()['token_renewal']['count'] == 1
+
+    results = client.ingest_files_to_pipes({'DB.SCHEMA.BROKEN': []}, return_exceptions=True)
+    assert isinstance(results['DB.SCHEMA.BROKEN'], IngestResponseError)
+    with pytest.raises(IngestResponseError):
+        client.ingest_files_to_pipes({'DB.SCHEMA.BROKEN': []})
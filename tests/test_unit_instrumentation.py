@@ -0,0 +1,67 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_instrumentation.py - Tests the observer hooks and the in-memory metrics collector
+"""
+
+from snowflake.ingest import SimpleIngestManager
+from snowflake.ingest import StagedFile
+from snowflake.ingest.utils import InMemoryMetricsCollector
+from snowflake.ingest.utils import network
+from snowflake.ingest.utils.instrumentation import Histogram
+from snowflake.ingest.utils.instrumentation import endpoint_name
+from snowflake.ingest.utils.retry import RetryPolicy
+from requests import Response
+
+
+def make_response(status_code, body=b'{"responseCode": "SUCCESS", "files": [], "nextBeginMark": "1_0"}'):
+    response = Response()
+    response.status_code = status_code
+    response._content = body
+    return response
+
+
+def test_endpoint_name():
+    assert endpoint_name('https://host:443/v1/data/pipes/DB.S.P/insertFiles?requestId=1') == 'insertFiles'
+    assert endpoint_name('https://host/v1/data/pipes/DB.S.P/loadHistoryScan?startTimeInclusive=x') == \
+        'loadHistoryScan'
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(1, 2, 4))
+    for value in (0.5, 1.5, 1.5, 3, 10):
+        histogram.observe(value)
+
+    assert histogram.count == 5 and histogram.sum == 16.5
+    assert histogram.quantile(0.5) == 2
+    assert histogram.quantile(1) == float('inf')
+    assert Histogram().quantile(0.5) is None
+
+
+def test_collector_per_endpoint(test_util, monkeypatch):
+    """
+    Tests that requests, retries, backoff, decode and token renewals are recorded per endpoint
+    """
+    private_key, _ = test_util.generate_key_pair()
+    collector = InMemoryMetricsCollector()
+    manager = SimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key, observer=collector,
+                                  retry_policy=RetryPolicy(base_backoff=0.5))
+    responses = [make_response(503, b'{}'), make_response(200), make_response(200)]
+    monkeypatch.setattr(manager.restful, '_exec_request', lambda **kwargs: responses.pop(0))
+    monkeypatch.setattr(network.time, 'sleep', lambda seconds: None)
+
+    manager.ingest_files([StagedFile('a.csv', None)])
+    manager.get_history()
+
+    snapshot = collector.snapshot()
+    insert_files = snapshot['endpoints']['insertFiles']
+    assert insert_files['requests'] == 2 and insert_files['errors'] == 1 and insert_files['retries'] == 1
+    assert insert_files['backoff_seconds'] == 0.5
+    assert insert_files['status_codes'] == {503: 1, 200: 1}
+    assert insert_files['latency']['count'] == 2 and insert_files['decode']['count'] == 1
+    assert insert_files['bytes_received'] == len(b'{}') + len(make_response(200).content)
+
+    assert snapshot['endpoints']['insertReport']['requests'] == 1
+    assert snapshot['token_renewal']['count'] == 1
+
+    collector.reset()
+    assert collector.snapshot()['endpoints'] == {}
@@ -0,0 +1,89 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_journal.py - Tests journaling submitted files and recovering after a crash
+"""
+
+from snowflake.ingest import IngestJournal
+from snowflake.ingest import StagedFile
+from snowflake.ingest.results import FileLoadStatus
+from datetime import timedelta
+from uuid import uuid4
+import pytest
+
+
+class _FakeManager(object):
+    pipe = 'DB.SCHEMA.PIPE'
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.requests = []
+
+    def ingest_files(self, staged_files, request_id=None, **kwargs):
+        self.requests.append((list(staged_files), request_id))
+        if self.fail:
+            raise ConnectionError('process crashed')
+        return {'requestId': str(request_id), 'responseCode': 'SUCCESS'}
+
+
+def test_submit_and_load(tmp_path):
+    manager = _FakeManager()
+    with IngestJournal(manager, str(tmp_path / 'journal.db')) as journal:
+        journal.ingest_files([StagedFile('a', 1), StagedFile('b', 2)])
+        assert journal.counts() == {'SUBMITTED': 2}
+        assert sorted(journal.submitted()) == [StagedFile('a', 1), StagedFile('b', 2)]
+
+        assert journal.record_history([{'path': 'a', 'status': 'LOADED'},
+                                       FileLoadStatus.from_record({'path': 'b', 'status': 'LOAD_IN_PROGRESS'})]) == 1
+        assert journal.state('a') == 'LOADED'
+        assert journal.state('b') == 'SUBMITTED'
+        assert journal.state('c') is None
+
+        assert journal.prune(timedelta(hours=1)) == 0
+        assert journal.prune(timedelta(seconds=-1)) == 1
+        assert journal.counts() == {'SUBMITTED': 1}
+
+
+def test_recover_after_crash(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    request_id = uuid4()
+    with IngestJournal(_FakeManager(fail=True), path) as journal:
+        with pytest.raises(ConnectionError):
+            journal.ingest_files([StagedFile('a', 1), StagedFile('b', 2)], request_id)
+        assert journal.counts() == {'PENDING': 2}
+
+    # a restarted process resends the files with the request id they were first sent with
+    manager = _FakeManager()
+    with IngestJournal(manager, path) as journal:
+        assert journal.pending() == {str(request_id): [StagedFile('a', 1), StagedFile('b', 2)]}
+        assert journal.recover() == 2
+        assert manager.requests == [([StagedFile('a', 1), StagedFile('b', 2)], str(request_id))]
+        assert journal.pending() == {}
+        assert journal.counts() == {'SUBMITTED': 2}
+
+
+def test_pipes_share_database(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    other = _FakeManager()
+    other.pipe = 'DB.SCHEMA.OTHER'
+    with IngestJournal(_FakeManager(), path) as journal, IngestJournal(other, path) as other_journal:
+        journal.ingest_files([StagedFile('a', 1)])
+        assert other_journal.state('a') is None
+        assert other_journal.counts() == {}
+
+
+def test_invalid_synchronous_mode(tmp_path):
+    with pytest.raises(ValueError):
+        IngestJournal(_FakeManager(), str(tmp_path / 'journal.db'), synchronous='SOMETIMES')
+
+
+def test_recover_request_id_that_is_not_a_uuid(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    with IngestJournal(_FakeManager(fail=True), path) as journal:
+        with pytest.raises(ConnectionError):
+            journal.ingest_files([StagedFile('a', 1)], 'batch-42')
+
+    manager = _FakeManager()
+    with IngestJournal(manager, path) as journal:
+        assert journal.pending() == {'batch-42': [StagedFile('a', 1)]}
+        assert journal.recover() == 1
+        assert manager.requests == [([StagedFile('a', 1)], 'batch-42')]
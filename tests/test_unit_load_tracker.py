@@ -0,0 +1,129 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_load_tracker.py - Tests waiting for submitted files to finish loading
+"""
+
+from snowflake.ingest import LoadTracker
+from snowflake.ingest import StagedFile
+from snowflake.ingest.load_tracker import SCAN_CLOCK_SKEW
+from snowflake.ingest.testing import MockSnowpipeServer
+from snowflake.ingest.utils.history import format_timestamp
+from snowflake.ingest.utils.history import parse_timestamp
+from datetime import datetime, timedelta
+
+
+class _FakeManager(object):
+    def __init__(self, pages, scan_files):
+        self.pages = pages
+        self.scan_files = scan_files
+        self.begin_marks = []
+        self.scans = []
+
+    def ingest_files(self, staged_files, request_id=None):
+        return {'responseCode': 'SUCCESS'}
+
+    def _get_history(self, recent_seconds=None, begin_mark=None, request_id=None):
+        self.begin_marks.append(begin_mark)
+        return self.pages.get(begin_mark, {'files': [], 'nextBeginMark': begin_mark})
+
+    def scan_history_range(self, start_time_inclusive, end_time_exclusive=None, **kwargs):
+        self.scans.append(start_time_inclusive)
+        return iter(self.scan_files)
+
+
+def test_wait_all():
+    """
+    Tests that files resolve from insertReport pages and pending ones stay pending
+    """
+    manager = _FakeManager({
+        None: {'files': [{'path': 'a', 'status': 'LOAD_IN_PROGRESS'}, {'path': 'other', 'status': 'LOADED'}],
+               'nextBeginMark': '1'},
+        '1': {'files': [{'path': 'a', 'status': 'LOADED'}, {'path': 'b', 'status': 'LOAD_FAILED'}],
+              'nextBeginMark': '2'},
+    }, scan_files=[])
+    tracker = LoadTracker(manager, poll_interval=0.01)
+    futures = tracker.ingest_files([StagedFile('a', None), StagedFile('b', None)])
+    c = tracker.register(['c'])['c']
+
+    assert not tracker.wait_all(timeout=0.2)
+    assert futures['a'].result(0)['status'] == 'LOADED'
+    assert futures['b'].result(0)['status'] == 'LOAD_FAILED'
+    assert not c.done()
+    assert len(tracker) == 1
+    assert manager.begin_marks[:3] == [None, '1', '2']
+    assert manager.scans == []
+
+
+def test_scan_fallback_for_old_files():
+    """
+    Tests that files pending longer than insertReport keeps history are looked up with loadHistoryScan
+    """
+    manager = _FakeManager({}, scan_files=[{'path': 'old', 'status': 'PARTIALLY_LOADED'}])
+    tracker = LoadTracker(manager, poll_interval=0.01, scan_after=timedelta(minutes=5))
+    future = tracker.register(['old'], submitted_at=datetime.utcnow() - timedelta(minutes=10))['old']
+
+    assert tracker.wait_all(timeout=1)
+    assert future.result(0)['status'] == 'PARTIALLY_LOADED'
+    assert len(manager.scans) == 1
+
+
+def test_scan_fallback_resumes_from_last_scan():
+    """
+    Tests that a file that never resolves does not make every scan start at its submit time
+    """
+    manager = _FakeManager({}, scan_files=[])
+    tracker = LoadTracker(manager, scan_after=timedelta(minutes=5), scan_interval=timedelta(0))
+    submitted_at = datetime.utcnow() - timedelta(days=1)
+    tracker.register(['stuck'], submitted_at=submitted_at)
+
+    tracker.poll()
+    tracker.poll()
+
+    first, second = [parse_timestamp(start) for start in manager.scans]
+    assert first == parse_timestamp(format_timestamp(submitted_at - SCAN_CLOCK_SKEW))
+    assert datetime.utcnow() - second < timedelta(minutes=2)
+
+
+def test_scan_fallback_pages(test_util):
+    """
+    Tests that the loadHistoryScan fallback reads every page of the range
+    """
+    private_key, _ = test_util.generate_key_pair()
+    with MockSnowpipeServer(page_size=100) as server, server.make_manager('DB.SCHEMA.PIPE', private_key) as manager:
+        staged_files = [StagedFile('file_{:03d}'.format(i), 1) for i in range(250)]
+        manager.ingest_files(staged_files)
+        tracker = LoadTracker(manager, scan_after=timedelta(minutes=5))
+        futures = tracker.register(staged_files, submitted_at=datetime.utcnow() - timedelta(minutes=10))
+
+        # insertReport returns the first 100 files, the scan the others
+        assert tracker.poll() == 250
+        assert all(future.done() for future in futures.values())
+        assert server.request_counts['loadHistoryScan'] == 3
+
+
+def test_cancelled_future():
+    """
+    Tests that cancelling one future neither breaks resolving the others nor keeps the file pending
+    """
+    manager = _FakeManager({None: {'files': [{'path': 'a', 'status': 'LOADED'}, {'path': 'b', 'status': 'LOADED'}],
+                                   'nextBeginMark': '1'}}, scan_files=[])
+    tracker = LoadTracker(manager, poll_interval=0.01)
+    futures = tracker.register(['a', 'b', 'c'])
+    assert futures['a'].cancel() and futures['c'].cancel()
+
+    assert tracker.wait_all(timeout=1)
+    assert futures['b'].result(0)['status'] == 'LOADED'
+    assert len(tracker) == 0
+
+
+def test_background_poller():
+    manager = _FakeManager({None: {'files': [{'path': 'a', 'status': 'LOADED'}], 'nextBeginMark': '1'}},
+                           scan_files=[])
+    tracker = LoadTracker(manager, poll_interval=0.01)
+    future = tracker.register(['a'])['a']
+    tracker.start()
+    try:
+        assert tracker.wait_all(timeout=5)
+        assert future.done()
+    finally:
+        tracker.stop()
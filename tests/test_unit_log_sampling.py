@@ -0,0 +1,72 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_log_sampling.py - Tests the sampling of per-request log lines
+"""
+
+from snowflake.ingest import SimpleIngestManager
+from snowflake.ingest import StagedFile
+from snowflake.ingest.utils.log_sampling import LogSampler
+from snowflake.ingest.utils.codec import JsonCodec
+import logging
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRestful(object):
+    codec = JsonCodec()
+
+    def __init__(self, response_body):
+        self.response_body = response_body
+
+    def post(self, url, headers=None, **kwargs):
+        return self.response_body
+
+
+class StrCounter(object):
+    """
+    A response body that counts how often it was turned into a string
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return 'response'
+
+
+def test_sampler_every_n_and_rate():
+    sampler = LogSampler(every_n=3)
+    assert [sampler.should_log() for _ in range(6)] == [True, False, False, True, False, False]
+    assert sampler.suppressed == 4
+
+    clock = FakeClock()
+    sampler = LogSampler(max_per_second=2, clock=clock)
+    assert [sampler.should_log() for _ in range(3)] == [True, True, False]
+    clock.now = 0.5
+    assert sampler.should_log() and not sampler.should_log()
+
+
+def test_response_only_formatted_when_logged(test_util, caplog):
+    """
+    Tests that the response body is not stringified unless its log line is emitted
+    """
+    private_key, _ = test_util.generate_key_pair()
+    response_body = StrCounter()
+    manager = SimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key,
+                                  restful=FakeRestful(response_body), request_log_sampler=LogSampler(every_n=2))
+
+    with caplog.at_level(logging.INFO, logger='snowflake.ingest'):
+        manager.ingest_files([StagedFile('a.csv', None)])
+    assert response_body.calls == 0
+
+    with caplog.at_level(logging.DEBUG, logger='snowflake.ingest'):
+        for _ in range(4):
+            manager.ingest_files([StagedFile('a.csv', None)])
+    assert len([record for record in caplog.records if record.msg.startswith('Ingest response')]) == 2
+    assert manager.request_log_sampler.suppressed == 2
@@ -0,0 +1,79 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_mock_server.py - Tests SimpleIngestManager end to end against the in-process MockSnowpipeServer
+"""
+
+from snowflake.ingest import StagedFile
+from snowflake.ingest.error import IngestResponseError
+from snowflake.ingest.testing import MockSnowpipeServer
+from snowflake.ingest.utils import InMemoryMetricsCollector
+from snowflake.ingest.utils.network import SnowflakeRestful
+from snowflake.ingest.utils.retry import RetryPolicy
+from datetime import datetime, timedelta
+import pytest
+
+PIPE = 'TESTDB.TESTSCHEMA.TESTPIPE'
+FAST_RETRY = RetryPolicy(base_backoff=0.01, max_retries=5)
+
+
+@pytest.fixture
+def server():
+    with MockSnowpipeServer(page_size=3) as server:
+        yield server
+
+
+def test_ingest_then_page_history(server, test_util):
+    private_key, _ = test_util.generate_key_pair()
+    with server.make_manager(PIPE, private_key) as manager:
+        response = manager.ingest_files([StagedFile('data/file_{}.csv'.format(i), 10) for i in range(5)])
+        assert response['responseCode'] == 'SUCCESS'
+
+        first = manager.get_history()
+        second = manager.get_history()
+        third = manager.get_history()
+
+    assert [record['path'] for record in first['files']] == ['data/file_0.csv', 'data/file_1.csv',
+                                                             'data/file_2.csv']
+    assert [record['path'] for record in second['files']] == ['data/file_3.csv', 'data/file_4.csv']
+    assert third['files'] == []
+    assert second['nextBeginMark'] == third['nextBeginMark'] == '5'
+    assert server.history(PIPE)[0]['status'] == 'LOADED'
+
+
+def test_history_range(server, test_util):
+    private_key, _ = test_util.generate_key_pair()
+    with server.make_manager(PIPE, private_key) as manager:
+        start = datetime.utcnow() - timedelta(seconds=1)
+        manager.ingest_files([StagedFile('data/file.csv', 10)])
+
+        response = manager.get_history_range(start.isoformat() + 'Z')
+        assert [record['path'] for record in response['files']] == ['data/file.csv']
+        assert manager.get_history_range((start + timedelta(hours=1)).isoformat() + 'Z')['files'] == []
+
+
+def test_injected_failures_are_retried(server, test_util):
+    private_key, _ = test_util.generate_key_pair()
+    metrics = InMemoryMetricsCollector()
+    server.retry_after = 0
+    server.fail_next(429)
+    server.fail_next(503)
+
+    with server.make_manager(PIPE, private_key, retry_policy=FAST_RETRY,
+                             restful=SnowflakeRestful(observer=metrics)) as manager:
+        assert manager.ingest_files([StagedFile('data/file.csv', 10)])['responseCode'] == 'SUCCESS'
+
+    assert server.request_counts['insertFiles'] == 3
+    assert dict(server.injected_failures) == {429: 1, 503: 1}
+    assert metrics.snapshot()['endpoints']['insertFiles']['retries'] == 2
+    assert len(server.history(PIPE)) == 1
+
+
+def test_error_rate(test_util):
+    private_key, _ = test_util.generate_key_pair()
+    with MockSnowpipeServer(error_rate=1, error_status=500) as server:
+        with server.make_manager(PIPE, private_key, retry_policy=RetryPolicy(max_retries=0)) as manager:
+            with pytest.raises(IngestResponseError) as excinfo:
+                manager.get_history()
+
+    assert excinfo.value.http_error_code == 500
+    assert excinfo.value.message == 'Http Error: 500, Vender Code: 500, Message: Injected failure'
@@ -0,0 +1,65 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_network.py - Tests the pooled session handling of SnowflakeRestful
+"""
+
+from snowflake.ingest import SimpleIngestManager
+from snowflake.ingest.utils.network import SnowflakeRestful
+from requests import Response
+import gzip
+import json
+
+
+def test_session_per_host():
+    """
+    Tests that requests to the same host share one pooled session
+    """
+    restful = SnowflakeRestful(pool_maxsize=4)
+    session = restful._get_session('https://a.snowflakecomputing.com:443/v1/data/pipes/P/insertFiles')
+
+    assert session is restful._get_session('https://a.snowflakecomputing.com:443/v1/data/pipes/P/insertReport')
+    assert session is not restful._get_session('https://b.snowflakecomputing.com:443/v1/data/pipes/P/insertFiles')
+    assert session.get_adapter('https://a.snowflakecomputing.com')._pool_maxsize == 4
+
+    restful.close()
+    assert session is not restful._get_session('https://a.snowflakecomputing.com:443/v1/data/pipes/P/insertFiles')
+
+
+def test_shared_restful_is_not_closed_by_manager(test_util):
+    """
+    Tests that managers sharing a pool leave it open when they are closed
+    """
+    private_key, _ = test_util.generate_key_pair()
+    with SnowflakeRestful() as restful:
+        session = restful._get_session('https://testaccount.snowflakecomputing.com')
+
+        with SimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key, restful=restful) as manager:
+            assert manager.restful is restful
+
+        assert restful._sessions['testaccount.snowflakecomputing.com'] is session
+
+
+def test_request_body_compression(monkeypatch):
+    """
+    Tests that only bodies above the threshold are gzipped, and labelled as such
+    """
+    sent = []
+
+    def send(**kwargs):
+        sent.append(kwargs)
+        response = Response()
+        response.status_code = 200
+        response._content = b'{}'
+        return response
+
+    restful = SnowflakeRestful(compress_threshold=1024)
+    monkeypatch.setattr(restful, '_exec_request', send)
+    files = {'files': [{'path': 'data/file_{}.csv'.format(i), 'size': None} for i in range(100)]}
+
+    restful.post('https://host/insertFiles', json=files, headers={})
+    restful.post('https://host/insertFiles', json={'files': []}, headers={})
+
+    assert sent[0]['headers']['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(sent[0]['data'])) == files
+    assert 'Content-Encoding' not in sent[1]['headers']
+    assert json.loads(sent[1]['data']) == {'files': []}
@@ -0,0 +1,52 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_process_driver.py - Tests sending ingest requests from worker processes
+"""
+
+from snowflake.ingest import StagedFile
+from snowflake.ingest.error import IngestResponseError
+from snowflake.ingest.process_driver import ProcessIngestDriver
+from snowflake.ingest.testing import MockSnowpipeServer
+from snowflake.ingest.utils.retry import RetryPolicy
+from requests import Response
+import pickle
+
+
+def test_ingest_from_processes(test_util):
+    private_key, _ = test_util.generate_key_pair()
+    work = [('DB.SCHEMA.PIPE{}'.format(i % 3), StagedFile('data/file_{}.csv'.format(i), 10)) for i in range(30)]
+
+    with MockSnowpipeServer() as server, \
+            ProcessIngestDriver('testaccount', 'snowman', private_key, processes=2, max_files=4, scheme='http',
+                                host=server.host, port=server.port) as driver:
+        results = list(driver.ingest(iter(work)))
+
+    assert sorted(len(result.staged_files) for result in results) == [2, 2, 2] + [4] * 6
+    assert all(result.error is None and result.response['responseCode'] == 'SUCCESS' for result in results)
+    for i in range(3):
+        pipe = 'DB.SCHEMA.PIPE{}'.format(i)
+        assert sorted(record['path'] for record in server.history(pipe)) == \
+            sorted(staged_file.path for p, staged_file in work if p == pipe)
+
+
+def test_errors_come_back(test_util):
+    private_key, _ = test_util.generate_key_pair()
+    with MockSnowpipeServer(error_rate=1) as server, \
+            ProcessIngestDriver('testaccount', 'snowman', private_key, processes=1, scheme='http',
+                                host=server.host, port=server.port, retry_policy=RetryPolicy(max_retries=0)) as driver:
+        results = list(driver.ingest([('DB.SCHEMA.PIPE', StagedFile('data/file.csv', 10))], return_exceptions=True))
+
+    assert len(results) == 1
+    assert results[0].response is None
+    assert isinstance(results[0].error, IngestResponseError)
+    assert results[0].error.http_error_code == 503
+
+
+def test_response_error_pickles():
+    response = Response()
+    response.status_code = 429
+    response._content = b'{"code": "429", "success": false, "message": "slow down", "data": null}'
+    error = pickle.loads(pickle.dumps(IngestResponseError(response)))
+
+    assert error.http_error_code == 429
+    assert str(error) == 'Http Error: 429, Vender Code: 429, Message: slow down'
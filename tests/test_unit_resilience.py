@@ -0,0 +1,110 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_resilience.py - Tests the circuit breaker and adaptive concurrency limiter
+"""
+
+from snowflake.ingest.error import IngestClientError
+from snowflake.ingest.error import IngestTimeoutError
+from snowflake.ingest.errorcode import ERR_CIRCUIT_OPEN
+from snowflake.ingest.utils import CircuitBreaker
+from snowflake.ingest.utils import AdaptiveConcurrencyLimiter
+from snowflake.ingest.utils.network import SnowflakeRestful
+from snowflake.ingest.utils.resilience import CLOSED, OPEN, HALF_OPEN
+from snowflake.ingest.utils.retry import RetryPolicy
+from requests import Response
+import functools
+import pytest
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_response(status_code):
+    response = Response()
+    response.status_code = status_code
+    response._content = b'{}'
+    return response
+
+
+def test_circuit_breaker_states():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_ratio=0.5, window_size=4, min_requests=4, open_duration=10, clock=clock)
+
+    for failed in (True, False, True):
+        assert breaker.allow_request()
+        breaker.record(failed)
+    assert breaker.state == CLOSED
+
+    breaker.record(True)
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+    # a failed trial request opens the circuit again, a successful one closes it
+    clock.now = 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record(True)
+    assert breaker.state == OPEN
+
+    clock.now = 20
+    assert breaker.allow_request()
+    breaker.record(False)
+    assert breaker.state == CLOSED
+
+
+def test_limiter_aimd():
+    clock = FakeClock()
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, max_limit=9, latency_threshold=1, cooldown=5, clock=clock)
+
+    limiter.acquire()
+    limiter.release(0.1, failed=True)
+    assert limiter.limit == 4
+
+    # within the cooldown, further congestion does not cut the limit again
+    limiter.acquire()
+    limiter.release(2.0)
+    assert limiter.limit == 4
+
+    for _ in range(40):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert 8 <= limiter.limit <= 9
+
+    clock.now = 10
+    for _ in range(limiter.limit):
+        limiter.acquire()
+    with pytest.raises(IngestTimeoutError):
+        limiter.acquire(timeout=0.01)
+
+
+def test_restful_fails_fast_when_open(monkeypatch):
+    """
+    Tests that once the circuit of a host opened no more requests reach it and no retries happen
+    """
+    calls = []
+
+    def fail(**kwargs):
+        calls.append(kwargs['url'])
+        return make_response(503)
+
+    restful = SnowflakeRestful(retry_policy=RetryPolicy(base_backoff=0),
+                               circuit_breaker=functools.partial(CircuitBreaker, window_size=3, min_requests=3),
+                               concurrency_limiter=AdaptiveConcurrencyLimiter)
+    monkeypatch.setattr(restful, '_exec_request', fail)
+
+    with pytest.raises(IngestClientError) as e:
+        restful.get('https://host/insertReport', headers={})
+    assert e.value.code == ERR_CIRCUIT_OPEN
+    assert len(calls) == 3
+
+    # other hosts have their own circuit, and the limiter slots were all given back
+    monkeypatch.setattr(restful, '_exec_request', lambda **kwargs: make_response(200))
+    assert restful.get('https://other/insertReport', headers={}) == {}
+    assert restful._concurrency_limiters['host'].in_flight == 0
+    assert restful._concurrency_limiters['host'].limit < 10
@@ -0,0 +1,102 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_results.py - Tests the typed result objects
+"""
+
+from snowflake.ingest import SimpleIngestManager
+from snowflake.ingest import StagedFile
+from snowflake.ingest import IngestResponse, HistoryPage, FileLoadStatus
+from snowflake.ingest.utils.codec import JsonCodec
+from snowflake.ingest.utils.history import record_key
+from datetime import datetime
+import pytest
+
+RECORD = {
+    'path': 'a.csv', 'stageLocation': 's3://bucket/', 'fileSize': 10, 'timeReceived': '2024-01-01T00:00:00.000Z',
+    'lastInsertTime': '2024-01-01T00:00:01.500Z', 'rowsInserted': 3, 'rowsParsed': 3, 'errorsSeen': 0,
+    'errorLimit': 1, 'complete': True, 'status': 'LOADED',
+}
+
+
+class FakeRestful(object):
+    codec = JsonCodec()
+
+    def post(self, url, headers=None, **kwargs):
+        return {'requestId': 'r1', 'responseCode': 'SUCCESS'}
+
+    def get(self, url, headers=None, **kwargs):
+        return {'pipe': 'DB.SCHEMA.PIPE', 'completeResult': True, 'nextBeginMark': '1_1', 'files': [RECORD]}
+
+
+def test_file_load_status():
+    status = FileLoadStatus.from_record(dict(RECORD, unknown='dropped'))
+
+    assert status.path == 'a.csv' and status.rows_inserted == 3 and status.first_error is None
+    assert status.status is FileLoadStatus.from_record(RECORD).status
+    assert status['lastInsertTime'] == '2024-01-01T00:00:01.500Z'
+    assert status.last_insert_time == datetime(2024, 1, 1, 0, 0, 1, 500000)
+    assert status.get('lastInsertTime') == '2024-01-01T00:00:01.500Z'
+    assert status.get('firstError', 'none') == 'none' and 'firstError' not in status
+    assert record_key(status) == record_key(RECORD)
+    assert status.to_dict() == RECORD
+    with pytest.raises(KeyError):
+        status['unknown']
+
+    # reading the parsed timestamps leaves the strings as the service sent them
+    received = dict(RECORD, timeReceived='2024-01-01T00:00:00.5Z', lastInsertTime='2024-01-01T00:00:01.123456Z')
+    status = FileLoadStatus.from_record(received)
+    assert status.time_received == datetime(2024, 1, 1, 0, 0, 0, 500000)
+    assert status.last_insert_time == datetime(2024, 1, 1, 0, 0, 1, 123456)
+    assert status['timeReceived'] == '2024-01-01T00:00:00.5Z'
+    assert status.to_dict() == received
+    with pytest.raises(AttributeError):
+        status.extra = 1
+
+
+def test_history_page_parses_files_lazily():
+    page = HistoryPage.from_response({'nextBeginMark': '1_1', 'files': [RECORD]})
+
+    assert page['nextBeginMark'] == '1_1' and page.complete_result is None
+    assert isinstance(page._files[0], dict)
+    assert page.files[0].status == 'LOADED'
+    assert page.files is page.get('files')
+    assert page.to_dict() == {'nextBeginMark': '1_1', 'files': [RECORD]}
+
+
+def test_responses_round_trip():
+    """
+    Tests that the documented response shapes, and keys the client does not know yet, survive to_dict
+    """
+    insert_report = {'pipe': 'DB.SCHEMA.PIPE', 'completeResult': True, 'nextBeginMark': '1_1', 'files': [RECORD],
+                     'statistics': {'activeFilesCount': 0}}
+    history_scan = {'pipe': 'DB.SCHEMA.PIPE', 'completeResult': False, 'startTimeInclusive': '2024-01-01T00:00:00.000Z',
+                    'endTimeExclusive': '2024-01-02T00:00:00.000Z', 'rangeStartTime': '2024-01-01T00:00:01.500Z',
+                    'rangeEndTime': '2024-01-01T00:00:01.500Z', 'files': [RECORD], 'newKey': [1]}
+    insert_files = {'requestId': 'r1', 'responseCode': 'SUCCESS', 'newKey': 'x'}
+
+    page = HistoryPage.from_response(insert_report)
+    assert page['statistics'] == {'activeFilesCount': 0} and page.statistics['activeFilesCount'] == 0
+    assert page.to_dict() == insert_report
+
+    page = HistoryPage.from_response(history_scan)
+    assert page.start_time_inclusive == '2024-01-01T00:00:00.000Z' and page['newKey'] == [1]
+    assert page.to_dict() == history_scan
+
+    response = IngestResponse.from_response(insert_files)
+    assert response['newKey'] == 'x' and 'statistics' not in response
+    assert response.to_dict() == insert_files
+
+
+def test_manager_typed_results(test_util):
+    private_key, _ = test_util.generate_key_pair()
+    manager = SimpleIngestManager('testaccount', 'snowman', 'DB.SCHEMA.PIPE', private_key,
+                                  restful=FakeRestful(), typed_results=True)
+
+    response = manager.ingest_files([StagedFile('a.csv', 10)])
+    assert isinstance(response, IngestResponse) and response.response_code == 'SUCCESS'
+
+    page = manager.get_history()
+    assert isinstance(page, HistoryPage) and manager._next_begin_mark == '1_1'
+    assert [record.path for record in page.files] == ['a.csv']
+
+    assert isinstance(manager.get_history_range('2024-01-01T00:00:00.000Z'), HistoryPage)
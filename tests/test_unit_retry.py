@@ -0,0 +1,128 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_retry.py - Tests retry policies and their use by SnowflakeRestful
+"""
+
+from snowflake.ingest.error import IngestResponseError
+from snowflake.ingest.error import IngestTimeoutError
+from snowflake.ingest.utils import network
+from snowflake.ingest.utils import retry
+from snowflake.ingest.utils.network import SnowflakeRestful
+from snowflake.ingest.utils.retry import RetryPolicy
+from snowflake.ingest.utils.retry import FULL_JITTER
+from snowflake.ingest.utils.retry import DECORRELATED_JITTER
+from snowflake.ingest.utils.retry import parse_retry_after
+from snowflake.ingest.utils.retry import Deadline
+from requests import Response
+from requests.exceptions import ConnectionError
+import random
+import pytest
+
+
+def make_response(status_code, headers=None):
+    response = Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = b'{"files": []}'
+    return response
+
+
+def test_default_backoff_doubles():
+    context = RetryPolicy().new_context()
+    assert [context.sleep_time() for _ in range(4)] == [1, 2, 4, 8]
+
+
+def test_jitter_and_max_backoff():
+    rng = random.Random(7)
+    context = RetryPolicy(max_backoff=3, jitter=FULL_JITTER, rng=rng).new_context()
+    assert all(0 <= context.sleep_time() <= 3 for _ in range(10))
+
+    context = RetryPolicy(base_backoff=0.5, max_backoff=4, jitter=DECORRELATED_JITTER, rng=rng).new_context()
+    assert all(0.5 <= context.sleep_time() <= 4 for _ in range(10))
+
+
+def test_deadline_and_max_retries():
+    context = RetryPolicy(deadline=0.5).new_context()
+    assert context.sleep_time() <= 0.5
+
+    context = RetryPolicy(max_retries=2).new_context()
+    assert [context.sleep_time() for _ in range(3)] == [1, 2, -1]
+
+    context = RetryPolicy(deadline=10).new_context()
+    assert context.sleep_time(retry_after='30') == -1
+
+
+def test_deadline_ignores_wall_clock_steps(monkeypatch):
+    context = RetryPolicy(deadline=10).new_context()
+    # the system clock jumps an hour ahead, e.g. after an NTP correction
+    monkeypatch.setattr(retry.time, 'time', lambda: 3600.0 + 1e9)
+    assert 9 < context.remaining_time() <= 10
+
+
+def test_retryable_statuses():
+    policy = RetryPolicy(idempotent_only=True)
+    assert policy.can_retry_status(429) and policy.can_retry_status(503) and policy.can_retry_status(408)
+    assert not policy.can_retry_status(400)
+    assert not policy.can_retry_status(503, idempotent=False)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('garbage') is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+
+
+def test_restful_honours_retry_after(monkeypatch):
+    """
+    Tests that a throttled request sleeps as long as Retry-After asks, and that the per call policy wins
+    """
+    responses = [make_response(429, {'Retry-After': '2'}), make_response(200)]
+    sleeps = []
+    restful = SnowflakeRestful(retry_policy=RetryPolicy(base_backoff=0.1))
+    monkeypatch.setattr(restful, '_exec_request', lambda **kwargs: responses.pop(0))
+    monkeypatch.setattr(network.time, 'sleep', sleeps.append)
+
+    assert restful.get('https://host/insertReport', headers={}) == {'files': []}
+    assert sleeps == [2]
+
+    responses[:] = [make_response(503)]
+    with pytest.raises(IngestResponseError):
+        restful.post('https://host/insertFiles', json={}, headers={},
+                     retry_policy=RetryPolicy(idempotent_only=True))
+    assert sleeps == [2]
+
+
+def test_deadline_clamps_socket_timeouts():
+    deadline = Deadline(5)
+    assert 4 < deadline.clamp(None) <= 5
+    assert deadline.clamp(1) == 1
+
+    with pytest.raises(IngestTimeoutError):
+        Deadline(-1).clamp(1)
+
+
+def test_restful_deadline(monkeypatch):
+    """
+    Tests that every attempt gets connect/read timeouts bounded by the deadline, and that running
+    out of time raises IngestTimeoutError rather than the last connection error
+    """
+    timeouts = []
+
+    def fail(timeout, **kwargs):
+        timeouts.append(timeout)
+        raise ConnectionError('unreachable')
+
+    restful = SnowflakeRestful(retry_policy=RetryPolicy(base_backoff=0.05), connect_timeout=3, read_timeout=30)
+    monkeypatch.setattr(restful, '_exec_request', fail)
+
+    with pytest.raises(IngestTimeoutError):
+        restful.get('https://host/insertReport', headers={}, deadline=0.2)
+    assert len(timeouts) > 1
+    assert all(connect <= 0.2 and read <= 0.2 for connect, read in timeouts)
+
+    timeouts[:] = []
+    with pytest.raises(ConnectionError):
+        restful.post('https://host/insertFiles', json={}, headers={},
+                     retry_policy=RetryPolicy(max_retries=0))
+    assert timeouts == [(3, 30)]
@@ -0,0 +1,69 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_stage_scanner.py - Tests discovering the files of a stage and ingesting them as they are listed
+"""
+
+from snowflake.ingest import StagedFile
+from snowflake.ingest.stage_scanner import LocalDirectoryLister
+from snowflake.ingest.stage_scanner import StageLister
+from snowflake.ingest.stage_scanner import scan_stage
+from snowflake.ingest.testing import MockSnowpipeServer
+import pytest
+
+PIPE = 'TESTDB.TESTSCHEMA.TESTPIPE'
+
+
+@pytest.fixture
+def stage(tmp_path):
+    for day in range(3):
+        for hour in range(4):
+            directory = tmp_path / 'events' / 'day={}'.format(day) / 'hour={}'.format(hour)
+            directory.mkdir(parents=True)
+            (directory / 'part-0.csv').write_bytes(b'x' * (day * 10 + hour))
+            (directory / '_SUCCESS').write_bytes(b'')
+    (tmp_path / 'README').write_bytes(b'hello')
+    return tmp_path
+
+
+def test_scan_stage(stage):
+    lister = LocalDirectoryLister(str(stage))
+    staged_files = set(scan_stage(lister, max_workers=4))
+
+    assert len(staged_files) == 3 * 4 * 2 + 1
+    assert StagedFile('events/day=2/hour=3/part-0.csv', 23) in staged_files
+    assert StagedFile('README', 5) in staged_files
+
+    csv_files = set(scan_stage(lister, 'events/day=1/', include=lambda path: path.endswith('.csv')))
+    assert csv_files == {StagedFile('events/day=1/hour={}/part-0.csv'.format(hour), 10 + hour) for hour in range(4)}
+
+    unsized = set(scan_stage(LocalDirectoryLister(str(stage), sizes=False), 'events/day=0/hour=0/'))
+    assert unsized == {StagedFile('events/day=0/hour=0/part-0.csv', None),
+                       StagedFile('events/day=0/hour=0/_SUCCESS', None)}
+
+
+def test_scan_stage_errors(stage):
+    with pytest.raises(FileNotFoundError):
+        list(scan_stage(LocalDirectoryLister(str(stage)), 'missing/'))
+
+    class IncompleteLister(StageLister):
+        pass
+
+    # a lister without list_dir fails when it is created, not in the middle of a scan
+    with pytest.raises(TypeError):
+        IncompleteLister()
+
+    # stopping early leaves no listing behind
+    files = scan_stage(LocalDirectoryLister(str(stage)), max_workers=2)
+    next(files)
+    files.close()
+
+
+def test_ingest_while_listing(stage, test_util):
+    private_key, _ = test_util.generate_key_pair()
+    with MockSnowpipeServer() as server, server.make_manager(PIPE, private_key) as manager:
+        files = scan_stage(LocalDirectoryLister(str(stage)), 'events/', include=lambda path: path.endswith('.csv'))
+        results = manager.ingest_files_in_batches(files, max_files=5, max_workers=2)
+
+        assert len(results) == 12
+        assert server.request_counts['insertFiles'] == 3
+        assert sorted(record['path'] for record in server.history(PIPE)) == sorted(results)
@@ -5,10 +5,15 @@ capable of renewing JWT tokens
 """
 
 from snowflake.ingest.utils import SecurityManager
+from snowflake.ingest.utils import tokentools
 from snowflake.ingest.error import IngestClientError
 from snowflake.ingest.errorcode import ERR_INVALID_PRIVATE_KEY
-from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, datetime
 from time import sleep
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+import jwt
 import os
 import pytest
 
@@ -53,3 +58,104 @@ def test_invalid_private_key():
         sec_man.get_token()
 
     assert client_error.value.code == ERR_INVALID_PRIVATE_KEY
+
+
+def test_single_flight_renewal(test_util, monkeypatch):
+    """
+    Tests that concurrent callers sign only one token when renewal is due
+    """
+    private_key, _ = test_util.generate_key_pair()
+    sec_man = SecurityManager("testaccount", "snowman", private_key,
+                              renewal_delay=timedelta(minutes=3))
+    sec_man.get_token()
+    sec_man.renew_time = datetime.utcnow()
+
+    signed = []
+    real_encode = jwt.encode
+
+    def slow_encode(*args, **kwargs):
+        signed.append(1)
+        sleep(0.5)
+        return real_encode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, 'encode', slow_encode)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tokens = list(executor.map(lambda _: sec_man.get_token(), range(8)))
+
+    assert len(signed) == 1
+    assert all(tokens)
+
+
+def test_background_refresh(test_util):
+    """
+    Tests that the background refresher renews the token ahead of its renewal time
+    """
+    private_key, _ = test_util.generate_key_pair()
+    sec_man = SecurityManager("testaccount", "snowman", private_key,
+                              renewal_delay=timedelta(seconds=3))
+    old_token = sec_man.get_token()
+    sec_man.start_background_refresh(refresh_ahead=timedelta(seconds=2))
+    try:
+        sleep(2)
+        assert sec_man.renew_time > datetime.utcnow()
+        assert old_token != sec_man.get_token()
+    finally:
+        sec_man.stop_background_refresh()
+
+
+def test_private_key_parsed_once(test_util, monkeypatch):
+    """
+    Tests that the private key is only parsed on the first renewal
+    """
+    private_key, _ = test_util.generate_key_pair()
+    sec_man = SecurityManager("testaccount", "snowman", private_key,
+                              renewal_delay=timedelta(seconds=0))
+    loads = []
+    real_load = serialization.load_pem_private_key
+
+    def counting_load(*args, **kwargs):
+        loads.append(1)
+        return real_load(*args, **kwargs)
+
+    monkeypatch.setattr(serialization, 'load_pem_private_key', counting_load)
+    for _ in range(3):
+        sec_man.renew_time = datetime.utcnow()
+        sec_man.get_token()
+
+    assert len(loads) == 1
+
+
+def test_private_key_formats(test_util):
+    """
+    Tests that loaded key objects and encrypted PEM bytes sign tokens with the same issuer as PEM text
+    """
+    with open(os.path.join(test_util.get_data_dir(), 'test_rsa_key'), 'r') as key_file:
+        private_key = key_file.read()
+
+    key_object = serialization.load_pem_private_key(private_key.encode(), None, default_backend())
+    encrypted_key = key_object.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                             serialization.BestAvailableEncryption(b'secret'))
+    expected_issuer = 'TESTACCOUNT.SNOWMAN.SHA256:QKX8hnXHVAVXp7mLdCAF+vjU2A8RBuRSpgdRjPHhVWY='
+
+    for key, passphrase in ((private_key, None), (key_object, None), (encrypted_key, b'secret')):
+        sec_man = SecurityManager("testaccount", "snowman", key, private_key_passphrase=passphrase)
+        token = sec_man.get_token()
+        assert jwt.decode(token, options={'verify_signature': False})['iss'] == expected_issuer
+
+    sec_man = SecurityManager("testaccount", "snowman", encrypted_key)
+    with pytest.raises(IngestClientError) as client_error:
+        sec_man.get_token()
+    assert client_error.value.code == ERR_INVALID_PRIVATE_KEY
+
+
+@pytest.mark.parametrize('account, expected', [
+    ('testaccount', 'testaccount'),
+    ('testaccount.us-east-1', 'testaccount'),
+    ('testaccount.us-east-1.aws', 'testaccount'),
+    ('testaccount-abc123.global', 'testaccount'),
+])
+def test_parse_account(account, expected):
+    """
+    Tests that region and external id suffixes are trimmed as the python connector does
+    """
+    assert tokentools.parse_account(account) == expected
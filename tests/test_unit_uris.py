@@ -0,0 +1,46 @@
+# Copyright (c) 2012-2024 Snowflake Computing Inc. All rights reserved.
+"""
+test_unit_uris.py - Tests that URLGenerator builds the same URLs furl used to build
+"""
+
+from snowflake.ingest.utils.uris import URLGenerator
+from snowflake.ingest.utils.uris import INGEST_ENDPOINT_FORMAT
+from snowflake.ingest.utils.uris import HISTORY_ENDPOINT_FORMAT
+from snowflake.ingest.utils.uris import HISTORY_SCAN_ENDPOINT_FORMAT
+from uuid import uuid4
+import pytest
+
+furl = pytest.importorskip('furl').furl
+
+PIPES = ['DB.SCHEMA.PIPE', '"my db"."my schema"."p?#%é"', 'db.s.p%41', 'a/b c']
+HOSTS = [('Account.snowflakecomputing.com', 'https', 443), ('localhost', 'http', 8080), ('localhost', 'HTTP', 80)]
+
+
+def furl_url(host, scheme, port, path, **args):
+    builder = furl()
+    builder.host = host
+    builder.port = port
+    builder.scheme = scheme
+    for key, value in args.items():
+        builder.args[key] = value
+    builder.path = path
+    return builder.url
+
+
+@pytest.mark.parametrize('pipe', PIPES)
+@pytest.mark.parametrize('host, scheme, port', HOSTS)
+def test_urls_match_furl(pipe, host, scheme, port):
+    generator = URLGenerator(host, scheme=scheme, port=port)
+    request_id = uuid4()
+
+    assert generator.make_ingest_url(pipe, request_id) == \
+        furl_url(host, scheme, port, INGEST_ENDPOINT_FORMAT.format(pipe), requestId=str(request_id))
+
+    assert generator.make_history_url(pipe, 60, '1_2 +/&=', request_id) == \
+        furl_url(host, scheme, port, HISTORY_ENDPOINT_FORMAT.format(pipe), requestId=str(request_id),
+                 recentSeconds='60', beginMark='1_2 +/&=')
+
+    assert generator.make_history_range_url(pipe, '2024-01-01T00:00:00.000Z', '2024-01-02T00:00:00+01:00',
+                                            request_id) == \
+        furl_url(host, scheme, port, HISTORY_SCAN_ENDPOINT_FORMAT.format(pipe), requestId=str(request_id),
+                 startTimeInclusive='2024-01-01T00:00:00.000Z', endTimeExclusive='2024-01-02T00:00:00+01:00')